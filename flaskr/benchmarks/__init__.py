@@ -0,0 +1,4 @@
+"""
+Benchmark scripts for measuring how the app scales with data volume.
+Run them from the flaskr directory, e.g. ``python -m benchmarks.bench_indexes``.
+"""
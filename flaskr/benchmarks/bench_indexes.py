@@ -0,0 +1,154 @@
+"""
+Benchmark for the hot-path lookup indexes declared in models.py.
+
+Builds a throwaway SQLite database at benchmark scale, runs every hot lookup
+with the indexes dropped and then with them created, and prints the SQLite
+query plan and average latency for both runs.
+
+Usage (from the flaskr directory):
+    python -m benchmarks.bench_indexes --students 10000 --prescriptions 100000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+
+from website.models import db
+
+from .seed import DRUG_NAMES, seed as seed_cohort
+
+# (label, SQL, params) for each lookup the views run on every request
+HOT_QUERIES = [
+    (
+        "StudentScenario by (student_id, scenario_id)",
+        "SELECT * FROM student_scenarios WHERE student_id = :student_id AND scenario_id = :scenario_id",
+        lambda s: {"student_id": s["student_id"], "scenario_id": s["scenario_id"]},
+    ),
+    (
+        "StudentScenario by (scenario_id, status)",
+        "SELECT count(*) FROM student_scenarios WHERE scenario_id = :scenario_id AND status IN ('submitted', 'graded')",
+        lambda s: {"scenario_id": s["scenario_id"]},
+    ),
+    (
+        "ScenarioPatient by (scenario_id, student_id)",
+        "SELECT * FROM scenario_patients WHERE scenario_id = :scenario_id AND student_id = :student_id",
+        lambda s: {"student_id": s["student_id"], "scenario_id": s["scenario_id"]},
+    ),
+    (
+        "Latest Submission by student_scenario_id",
+        "SELECT * FROM submissions WHERE student_scenario_id = :ss_id ORDER BY submitted_at DESC LIMIT 1",
+        lambda s: {"ss_id": s["ss_id"]},
+    ),
+    (
+        "Prescription by (patient_id, DSPID)",
+        "SELECT * FROM prescriptions WHERE patient_id = :patient_id AND DSPID = 'asl'",
+        lambda s: {"patient_id": s["patient_id"]},
+    ),
+    (
+        "Prescription by (patient_id, drug_name, DSPID)",
+        "SELECT * FROM prescriptions WHERE patient_id = :patient_id AND drug_name = :drug_name AND DSPID = 'alr' LIMIT 1",
+        lambda s: {"patient_id": s["patient_id"], "drug_name": s["drug_name"]},
+    ),
+    (
+        "Patient by medicare",
+        "SELECT * FROM patients WHERE medicare = :medicare LIMIT 1",
+        lambda s: {"medicare": s["medicare"]},
+    ),
+    (
+        "Prescriber by prescriber_id",
+        "SELECT * FROM prescribers WHERE prescriber_id = :prescriber_id LIMIT 1",
+        lambda s: {"prescriber_id": s["prescriber_id"]},
+    ),
+]
+
+def _hot_path_indexes():
+    """Every non-unique index declared on the models (the ones under test)."""
+    return [
+        index
+        for table in db.metadata.sorted_tables
+        for index in table.indexes
+        if not index.unique
+    ]
+
+
+def seed(engine, students, prescriptions, rng):
+    """Seed the synthetic cohort and pick the lookup parameters"""
+    cohort = seed_cohort(engine, students, prescriptions, rng=rng)
+    student_id = cohort.student_ids[len(cohort.student_ids) // 2]
+    ss_id = cohort.assignments // 2
+    with engine.connect() as conn:
+        scenario_id = conn.execute(
+            text("SELECT scenario_id FROM student_scenarios WHERE id = :id"),
+            {"id": ss_id},
+        ).scalar()
+    return {
+        "student_id": student_id,
+        "scenario_id": scenario_id,
+        "ss_id": ss_id,
+        "patient_id": cohort.patients // 2,
+        "drug_name": DRUG_NAMES[0],
+        "medicare": f"{40000000000 + cohort.patients // 2}",
+        "prescriber_id": 100000 + cohort.prescribers // 2,
+    }
+
+
+def measure(engine, sample, repeat):
+    """Return {label: (plan, avg_ms)} for every hot query."""
+    results = {}
+    with engine.connect() as conn:
+        for label, sql, params in HOT_QUERIES:
+            bound = params(sample)
+            plan = conn.execute(text("EXPLAIN QUERY PLAN " + sql), bound).fetchall()
+            start = time.perf_counter()
+            for _ in range(repeat):
+                conn.execute(text(sql), bound).fetchall()
+            elapsed_ms = (time.perf_counter() - start) * 1000 / repeat
+            results[label] = (" / ".join(row[-1] for row in plan), elapsed_ms)
+    return results
+
+
+def run(students, prescriptions, repeat, seed_value):
+    fd, path = tempfile.mkstemp(suffix=".db", prefix="bench_indexes_")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        db.metadata.create_all(engine)
+        indexes = _hot_path_indexes()
+        for index in indexes:
+            index.drop(engine)
+
+        print(f"Seeding {students} students and {prescriptions} prescriptions...")
+        sample = seed(engine, students, prescriptions, random.Random(seed_value))
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        before = measure(engine, sample, repeat)
+
+        for index in indexes:
+            index.create(engine)
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        after = measure(engine, sample, repeat)
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+    for label, _, _ in HOT_QUERIES:
+        plan_before, ms_before = before[label]
+        plan_after, ms_after = after[label]
+        print(f"\n{label}")
+        print(f"  without indexes: {ms_before:8.3f} ms  {plan_before}")
+        print(f"  with indexes:    {ms_after:8.3f} ms  {plan_after}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--prescriptions", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.students, args.prescriptions, args.repeat, args.seed)
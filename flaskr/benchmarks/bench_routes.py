@@ -0,0 +1,221 @@
+"""
+Latency and query-count benchmark for the hot routes.
+
+Seeds a synthetic cohort (see seed.py), then drives the real routes through
+the Flask test client as the appropriate teacher or student and reports
+latency percentiles and SQL statement counts per route. Statement counts come
+from the ``X-DB-Query-Count`` header added by query_stats.py.
+
+Usage (from the flaskr directory):
+    python -m benchmarks.bench_routes --students 10000 --prescriptions 100000
+    python -m benchmarks.bench_routes --routes asl dispense --requests 200
+"""
+
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from .seed import seed
+
+
+def _dispense(ctx):
+    patient_id, prescription_id = ctx["dispensable"].pop()
+    return (
+        ctx["teacher_id"],
+        "POST",
+        f"/api/dispense/{patient_id}",
+        {
+            "prescription_ids": str(prescription_id),
+            "dispensed_by": "Benchmark",
+            "dispensed_date": "18/10/2026",
+        },
+    )
+
+
+# name -> ctx -> (user_id, method, url, form data)
+ROUTES = {
+    "teacher_dashboard": lambda ctx: (
+        ctx["teacher_id"], "GET", "/teacher/dashboard", None
+    ),
+    "student_dashboard": lambda ctx: (
+        ctx["rng"].choice(ctx["cohort"].student_ids), "GET", "/student/dashboard", None
+    ),
+    "asl": lambda ctx: (
+        ctx["teacher_id"], "GET", f"/asl/{ctx['rng'].randint(1, ctx['cohort'].patients)}", None
+    ),
+    "dispense": _dispense,
+    "scenario_submissions": lambda ctx: (
+        ctx["teacher_id"], "GET", f"/scenarios/{ctx['scenario_id']}/submissions", None
+    ),
+    "export_asl": lambda ctx: (
+        ctx["teacher_id"],
+        "GET",
+        f"/api/export-asl/{ctx['rng'].randint(1, ctx['cohort'].patients)}",
+        None,
+    ),
+    "export_marks": lambda ctx: (
+        ctx["teacher_id"], "GET", f"/api/export-marks/{ctx['scenario_id']}", None
+    ),
+    "export_scenario_students": lambda ctx: (
+        ctx["teacher_id"],
+        "GET",
+        f"/api/export-scenario-students/{ctx['scenario_id']}",
+        None,
+    ),
+    "export_students": lambda ctx: (
+        ctx["teacher_id"], "GET", "/api/export-students", None
+    ),
+    "patient_dashboard": lambda ctx: (
+        ctx["teacher_id"],
+        "GET",
+        "/patients?sort={}&dir={}&page={}".format(
+            ctx["rng"].choice(["name", "dob", "medicare", "status"]),
+            ctx["rng"].choice(["asc", "desc"]),
+            ctx["rng"].randint(1, max(ctx["cohort"].patients // 50, 1)),
+        ),
+        None,
+    ),
+}
+
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def _login(client, user_id):
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+
+
+def build_app(database_url):
+    os.environ["DATABASE_URL"] = database_url
+
+    from website import create_app
+
+    app = create_app()
+    app.config["TESTING"] = True
+    app.config["WTF_CSRF_ENABLED"] = False
+    app.config["SQL_QUERY_HEADERS"] = True
+    # N+1 warnings would drown the report; the query column shows them
+    app.logger.setLevel(logging.ERROR)
+    return app
+
+
+def prepare(app, students, prescriptions, requests, rng):
+    """Seed the database and pick the ids each route is driven with"""
+    from website.models import db
+
+    with app.app_context():
+        engine = db.engine
+        print(f"Seeding {students} students and {prescriptions} prescriptions...")
+        started = time.perf_counter()
+        cohort = seed(engine, students, prescriptions, rng=rng)
+        print(
+            f"  {cohort.assignments} assignments, {cohort.submissions} submissions "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+        with engine.begin() as conn:
+            if engine.dialect.name == "sqlite":
+                conn.execute(text("ANALYZE"))
+            teacher_id, _, scenario_id, _ = cohort.sample(rng)
+            dispensable = conn.execute(
+                text(
+                    "SELECT patient_id, id FROM prescriptions "
+                    "WHERE DSPID = 'asl' AND status = 1 ORDER BY id LIMIT :n"
+                ),
+                {"n": requests + 1},
+            ).fetchall()
+
+    return {
+        "rng": rng,
+        "cohort": cohort,
+        "teacher_id": teacher_id,
+        "scenario_id": scenario_id,
+        "dispensable": [tuple(row) for row in reversed(dispensable)],
+    }
+
+
+def run_route(app, name, ctx, requests):
+    """Return (latencies_ms, query_counts, failures) for ``requests`` calls"""
+    client = app.test_client()
+    latencies, queries, failures = [], [], 0
+
+    for i in range(requests + 1):  # first call warms caches and is discarded
+        user_id, method, url, data = ROUTES[name](ctx)
+        _login(client, user_id)
+        started = time.perf_counter()
+        response = client.open(url, method=method, data=data)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if i == 0:
+            continue
+        if response.status_code != 200:
+            failures += 1
+        latencies.append(elapsed_ms)
+        queries.append(int(response.headers.get("X-DB-Query-Count", 0)))
+    return sorted(latencies), queries, failures
+
+
+def report(results):
+    header = (
+        f"{'route':28} {'n':>5} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} "
+        f"{'max ms':>9} {'queries':>9} {'max q':>6} {'fail':>5}"
+    )
+    print("\n" + header)
+    print("-" * len(header))
+    for name, (latencies, queries, failures) in results.items():
+        mean_queries = sum(queries) / len(queries) if queries else 0
+        print(
+            f"{name:28} {len(latencies):5d} "
+            f"{_percentile(latencies, 50):9.2f} {_percentile(latencies, 90):9.2f} "
+            f"{_percentile(latencies, 99):9.2f} {latencies[-1] if latencies else 0:9.2f} "
+            f"{mean_queries:9.1f} {max(queries, default=0):6d} {failures:5d}"
+        )
+
+
+def run(args):
+    path = None
+    database_url = args.database_url
+    if not database_url:
+        fd, path = tempfile.mkstemp(suffix=".db", prefix="bench_routes_")
+        os.close(fd)
+        database_url = f"sqlite:///{path}"
+
+    try:
+        app = build_app(database_url)
+        ctx = prepare(
+            app, args.students, args.prescriptions, args.requests, random.Random(args.seed)
+        )
+        results = {}
+        for name in args.routes:
+            print(f"Running {name}...")
+            results[name] = run_route(app, name, ctx, args.requests)
+        report(results)
+    finally:
+        if path:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--prescriptions", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=50, help="requests per route")
+    parser.add_argument("--routes", nargs="+", choices=list(ROUTES), default=list(ROUTES))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--database-url",
+        help="empty database to seed instead of a throwaway SQLite file",
+    )
+    run(parser.parse_args())
@@ -0,0 +1,157 @@
+"""
+FTS5 vs ILIKE prescription search.
+
+Seeds a synthetic cohort (see seed.py) and runs the same random queries (drug
+name prefixes and prescriber surnames, and drug code prefixes) through the FTS index and the
+original ``ILIKE '%q%'`` scan, both for one patient (the ASL search box) and
+across every patient (first ``--limit`` results). Reports latency percentiles and how many FTS results the
+ILIKE scan also returned. ``search_prescriptions`` uses FTS only across
+patients; within one patient it keeps the ILIKE scan. Then times the teachers'
+omnibox (``/api/search``) over the cohort's students, patients and scenarios.
+
+Usage (from the flaskr directory):
+    python -m benchmarks.bench_search --students 10000 --prescriptions 100000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from .bench_routes import _percentile, build_app
+from .seed import DRUG_NAMES, LAST_NAMES, seed
+
+
+def _queries(rng, cohort, codes, count):
+    """(kind, query, patient_id) triples.
+
+    "broad" queries (drug name prefixes, prescriber surnames) match a large
+    share of the synthetic data; "selective" ones (a real drug code prefix)
+    match a handful of rows, which is where a scan hurts most.
+    """
+    queries = []
+    for _ in range(count):
+        patient_id = rng.randint(1, cohort.patients)
+        if rng.random() < 0.5:
+            queries.append(("selective", rng.choice(codes)[:4], patient_id))
+        elif rng.random() < 0.5:
+            word = rng.choice(DRUG_NAMES).split()[0]
+            queries.append(("broad", word[: rng.randint(3, len(word))], patient_id))
+        else:
+            queries.append(("broad", rng.choice(LAST_NAMES), patient_id))
+    return queries
+
+
+def _time(fn, queries, patient_scoped, limit):
+    latencies, results = [], []
+    for _, q, patient_id in queries:
+        started = time.perf_counter()
+        if patient_scoped:
+            rows = fn(q, patient_id)
+        else:
+            rows = fn(q, None, limit)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append({prescription.id for prescription, _ in rows})
+    return sorted(latencies), results
+
+
+def run(args):
+    fd, path = tempfile.mkstemp(suffix=".db", prefix="bench_search_")
+    os.close(fd)
+    try:
+        app = build_app(f"sqlite:///{path}")
+
+        from website.models import db
+        from website.search import (
+            fts_available,
+            omnibox_search,
+            rebuild_entries,
+            search_prescriptions_fts,
+            search_prescriptions_like,
+        )
+
+        rng = random.Random(args.seed)
+        with app.app_context():
+            print(f"Seeding {args.students} students and {args.prescriptions} prescriptions...")
+            cohort = seed(db.engine, args.students, args.prescriptions, rng=rng)
+            if not fts_available():
+                raise SystemExit("FTS5 index missing; is this SQLite with FTS5?")
+            codes = (
+                db.session.execute(
+                    text("SELECT DISTINCT drug_code FROM prescriptions LIMIT 5000")
+                )
+                .scalars()
+                .all()
+            )
+            queries = _queries(rng, cohort, codes, args.queries)
+
+            print(
+                f"\n{'scope':8} {'queries':10} {'engine':7} {'p50 ms':>9} {'p95 ms':>9} "
+                f"{'max ms':>9} {'rows':>7} {'agree':>7}"
+            )
+            for scope, patient_scoped in (("patient", True), ("global", False)):
+                for kind in ("broad", "selective"):
+                    subset = [query for query in queries if query[0] == kind]
+                    like_ms, like_rows = _time(
+                        search_prescriptions_like, subset, patient_scoped, args.limit
+                    )
+                    fts_ms, fts_rows = _time(
+                        search_prescriptions_fts, subset, patient_scoped, args.limit
+                    )
+                    found = sum(len(r) for r in fts_rows)
+                    # FTS matches are prefix matches, so a subset of the substring
+                    # scan; limited global searches may pick different rows
+                    agree = sum(len(f & l) for f, l in zip(fts_rows, like_rows))
+                    for engine, latencies, rows, agreement in (
+                        ("ilike", like_ms, like_rows, ""),
+                        ("fts5", fts_ms, fts_rows, f"{agree / found * 100 if found else 100:.1f}%"),
+                    ):
+                        print(
+                            f"{scope:8} {kind:10} {engine:7} "
+                            f"{_percentile(latencies, 50):9.2f} "
+                            f"{_percentile(latencies, 95):9.2f} {latencies[-1]:9.2f} "
+                            f"{sum(len(r) for r in rows) / len(rows):7.1f} {agreement:>7}"
+                        )
+
+            # seed() bulk-inserts past the ORM, so build the omnibox entries once
+            rebuild_entries(db.session.connection())
+            db.session.commit()
+            words = [w.lower()[:4] for w in LAST_NAMES] + ["patient", "scen", "example"]
+            latencies, ranked = [], 0
+            for _ in range(args.queries):
+                started = time.perf_counter()
+                found = omnibox_search(
+                    rng.choice(words),
+                    owner_id=rng.choice(cohort.teacher_ids),
+                    budget_ms=args.budget,
+                )
+                latencies.append((time.perf_counter() - started) * 1000)
+                ranked += found["ranked"]
+            latencies.sort()
+            print(
+                f"\nomnibox  p50 {_percentile(latencies, 50):.2f} ms  "
+                f"p95 {_percentile(latencies, 95):.2f} ms  max {latencies[-1]:.2f} ms  "
+                f"ranked {ranked}/{args.queries} (budget {args.budget} ms)"
+            )
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--prescriptions", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument(
+        "--limit", type=int, default=50, help="result limit for global searches"
+    )
+    parser.add_argument(
+        "--budget", type=float, default=250, help="omnibox latency budget (ms)"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    run(parser.parse_args())
@@ -0,0 +1,142 @@
+"""
+Query-count check for the student dashboard.
+
+Seeds a throwaway SQLite database with one student holding a growing number of
+scenario assignments (each with an assigned patient and a few submissions),
+requests /student/dashboard through the Flask test client and counts the SQL
+statements issued. The count must not grow with the number of assignments;
+the script exits non-zero if it does.
+
+Usage (from the flaskr directory):
+    python -m benchmarks.bench_student_dashboard --sizes 1 10 50 200
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert
+
+
+def seed(db, models, assignments):
+    """Insert one teacher, one student and ``assignments`` scenarios for them."""
+    now = datetime.now()
+    with db.engine.begin() as conn:
+        conn.execute(
+            insert(models.User),
+            [
+                {"id": 1, "email": "teacher@example.com", "password_hash": "x", "role": "teacher"},
+                {"id": 2, "email": "student@example.com", "password_hash": "x", "role": "student"},
+            ],
+        )
+        conn.execute(
+            insert(models.Patient),
+            [
+                {"id": i, "medicare": f"{40000000000 + i}", "name": f"Patient {i}"}
+                for i in range(1, assignments + 1)
+            ],
+        )
+        conn.execute(
+            insert(models.Scenario),
+            [
+                {"id": i, "name": f"Scenario {i}", "teacher_id": 1, "active_patient_id": i}
+                for i in range(1, assignments + 1)
+            ],
+        )
+        conn.execute(
+            insert(models.StudentScenario),
+            [
+                {
+                    "id": i,
+                    "student_id": 2,
+                    "scenario_id": i,
+                    "status": "submitted" if i % 2 else "assigned",
+                }
+                for i in range(1, assignments + 1)
+            ],
+        )
+        conn.execute(
+            insert(models.ScenarioPatient),
+            [
+                {"scenario_id": i, "student_id": 2, "patient_id": i}
+                for i in range(1, assignments + 1)
+            ],
+        )
+        conn.execute(
+            insert(models.Submission),
+            [
+                {
+                    "student_scenario_id": i,
+                    "patient_id": i,
+                    "submitted_at": now - timedelta(hours=n),
+                }
+                for i in range(1, assignments + 1, 2)
+                for n in range(3)
+            ],
+        )
+
+
+def measure(assignments):
+    """Return (query_count, elapsed_ms) for one dashboard request."""
+    fd, path = tempfile.mkstemp(suffix=".db", prefix="bench_student_dash_")
+    os.close(fd)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    from website import create_app
+    from website import models
+
+    app = create_app()
+    app.config["TESTING"] = True
+    try:
+        with app.app_context():
+            seed(models.db, models, assignments)
+            engine = models.db.engine
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = "2"
+            session["_fresh"] = True
+
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            start = time.perf_counter()
+            response = client.get("/student/dashboard")
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+
+        if response.status_code != 200:
+            raise RuntimeError(f"dashboard returned {response.status_code}")
+        with app.app_context():
+            models.db.engine.dispose()
+    finally:
+        os.remove(path)
+    return len(statements), elapsed_ms
+
+
+def run(sizes):
+    results = [(size, *measure(size)) for size in sizes]
+    for size, queries, elapsed_ms in results:
+        print(f"{size:6d} assignments: {queries:3d} queries  {elapsed_ms:8.1f} ms")
+
+    counts = {queries for _, queries, _ in results}
+    if len(counts) != 1:
+        print("FAIL: query count grows with the number of assignments")
+        return 1
+    print("OK: query count is constant")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50, 200])
+    args = parser.parse_args()
+    sys.exit(run(args.sizes))
@@ -0,0 +1,195 @@
+"""
+Contracts per second through pt_data validation.
+
+Generates synthetic pt_data contracts and times turning each one into
+Patient/Prescription field values, which is all the work ingest does before
+it touches the database: the compiled PT_DATA_SCHEMA validator plus the
+builders in converters.py. With ``--baseline REV`` the same contracts also go
+through converters.py as of that git revision, for a before/after.
+
+Both versions run with the model classes swapped for SimpleNamespace:
+building SQLAlchemy instances costs the same either way and only adds noise.
+
+Usage (from the flaskr directory):
+    python -m benchmarks.bench_validation --contracts 2000 --items 20
+    python -m benchmarks.bench_validation --baseline HEAD~1
+"""
+
+import argparse
+import gc
+import random
+import subprocess
+import sys
+import time
+import types
+
+from website import converters
+
+from .seed import DRUG_NAMES, GIVEN_NAMES, LAST_NAMES
+
+
+def _prescriber(rng):
+    number = rng.randint(1, 500)
+    return {
+        "fname": rng.choice(GIVEN_NAMES),
+        "lname": rng.choice(LAST_NAMES),
+        "title": "Dr",
+        "address-1": f"{number} Clinic Rd",
+        "address-2": "MELBOURNE VIC 3000",
+        "id": str(100000 + number),
+        "hpii": str(8003610000000000 + number),
+        "hpio": str(8003620000000000 + number),
+        "phone": "0800 000 000",
+        "fax": "",
+    }
+
+
+def _item(rng, alr):
+    item = {
+        "DSPID": "alr" if alr else "asl",
+        "status": "Available",
+        "drug-name": rng.choice(DRUG_NAMES),
+        "drug-code": f"{rng.randint(1000, 99999):05d}",
+        "dose-instr": "ONE TABLET DAILY",
+        "dose-qty": str(rng.randint(10, 60)),
+        "dose-rpt": str(rng.randint(0, 5)),
+        "prescribed-date": f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2025",
+        "paperless": rng.choice(["true", "false", True]),
+        "brand-sub-not-prmt": rng.choice(["false", False]),
+        "prescriber": _prescriber(rng),
+    }
+    if alr:
+        item["dispensed-date"] = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2026"
+        item["remaining-repeats"] = str(rng.randint(1, 5))
+    return item
+
+
+def make_contracts(count, items, rng):
+    contracts = []
+    for i in range(count):
+        alr = items // 4
+        contracts.append(
+            {
+                "medicare": f"{20000000000 + i}",
+                "pharmaceut-ben-entitlement-no": f"NA{i:08d}",
+                "sfty-net-entitlement-cardholder": rng.choice([True, "false"]),
+                "rpbs-ben-entitlement-cardholder": "false",
+                "name": f"{rng.choice(GIVEN_NAMES)} {rng.choice(LAST_NAMES)}",
+                "dob": f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1940, 2010)}",
+                "preferred-contact": "0400 000 000",
+                "address-1": f"{i} Example St",
+                "address-2": "MELBOURNE VIC 3000",
+                "script-date": "18/10/2026",
+                "pbs": None,
+                "rpbs": None,
+                "consent-status": {
+                    "is-registered": "true",
+                    "status": "Granted",
+                    "last-updated": "13/10/2026 11:59 AM",
+                },
+                "asl-data": [_item(rng, False) for _ in range(items - alr)],
+                "alr-data": [_item(rng, True) for _ in range(alr)],
+            }
+        )
+    return contracts
+
+
+def load_converters(rev=None):
+    """converters.py from the working tree, or as of git revision ``rev``"""
+    if rev is None:
+        with open(converters.__file__) as f:
+            source = f.read()
+    else:
+        source = subprocess.run(
+            ["git", "show", f"{rev}:./website/converters.py"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+    module = types.ModuleType(f"website._bench_converters_{rev or 'current'}")
+    module.__package__ = "website"
+    sys.modules[module.__name__] = module
+    exec(compile(source, f"{rev or 'current'}:converters.py", "exec"), module.__dict__)
+    module.Patient = module.Prescription = types.SimpleNamespace
+    return module
+
+
+def contract_models(module):
+    """contract -> (patient, prescriptions) through ``module``'s code path.
+
+    Revisions without validate_pt_data validate inside the builders.
+    """
+    validate = getattr(module, "validate_pt_data", None)
+
+    def models(contract):
+        data = validate(contract) if validate else contract
+        patient = module._build_patient(data)
+        prescriptions = []
+        for key, build in (
+            ("asl-data", module._build_prescription_from_asl),
+            ("alr-data", module._build_prescription_from_alr),
+        ):
+            for item in data.get(key) or []:
+                module._prescriber_values(item["prescriber"])
+                prescriptions.append(build(item, patient, None))
+        return patient, prescriptions
+
+    return models
+
+
+def _rate(models, contracts, rounds):
+    best = None
+    for _ in range(rounds):
+        # As timeit does: collections over every contract held would dominate
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            for contract in contracts:
+                models(contract)
+            elapsed = time.perf_counter() - started
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return len(contracts) / best
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    contracts = make_contracts(args.contracts, args.items, rng)
+    print(
+        f"{args.contracts} contracts x {args.items} items, best of {args.rounds} rounds"
+    )
+    engines = [("compiled schema", contract_models(load_converters()))]
+    if args.baseline:
+        engines.insert(
+            0,
+            (f"baseline {args.baseline}", contract_models(load_converters(args.baseline))),
+        )
+    rates = {}
+    for name, models in engines:
+        rates[name] = _rate(models, contracts, args.rounds)
+        print(f"{name:24} {rates[name]:10.0f} contracts/s")
+    if args.baseline:
+        print(f"speed-up {rates['compiled schema'] / rates[engines[0][0]]:.2f}x")
+
+    # A contract with an error in every item
+    broken = make_contracts(1, args.items, rng)[0]
+    for item in broken["asl-data"]:
+        item["drug-code"] = "?"
+    try:
+        converters.validate_pt_data(broken)
+    except converters.ContractValidationError as e:
+        print(f"broken contract: {len(e.errors)} errors, first {e.errors[0]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--contracts", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=20, help="ASL/ALR items each")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument(
+        "--baseline", help="git revision whose converters.py to compare against"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    run(parser.parse_args())
@@ -0,0 +1,284 @@
+"""
+Seeded synthetic data generator for the benchmarks.
+
+Bulk-inserts teachers, students, scenarios, patients, prescribers,
+prescriptions, assignments and submissions with core executemany, so a
+10k-student / 100k-prescription cohort takes seconds rather than minutes.
+The same ``seed`` value always produces the same data.
+
+Usage (from the flaskr directory) to fill a standalone database:
+    python -m benchmarks.seed sqlite:////tmp/bench.db --students 10000 --prescriptions 100000
+"""
+
+import argparse
+import random
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+
+from website.models import (
+    db,
+    Patient,
+    PrescriptionStatus,
+    Prescriber,
+    Prescription,
+    Scenario,
+    ScenarioPatient,
+    StudentScenario,
+    Submission,
+    User,
+)
+
+DRUG_NAMES = [
+    "Amoxicillin 500mg capsule",
+    "Atorvastatin 40mg tablet",
+    "Metformin 500mg tablet",
+    "Perindopril 5mg tablet",
+    "Salbutamol 100mcg inhaler",
+    "Esomeprazole 20mg tablet",
+    "Sertraline 50mg tablet",
+    "Paracetamol 500mg tablet",
+]
+
+GIVEN_NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Casey", "Morgan", "Riley", "Jamie"]
+LAST_NAMES = ["Nguyen", "Smith", "Chen", "Williams", "Brown", "Singh", "Wilson", "Taylor"]
+
+
+@dataclass
+class Cohort:
+    """Row counts and id ranges of a seeded database"""
+
+    teachers: int
+    students: int
+    scenarios: int
+    patients: int
+    prescribers: int
+    prescriptions: int
+    assignments: int
+    submissions: int
+    teacher_ids: list = field(default_factory=list)
+    student_ids: list = field(default_factory=list)
+    # scenario id -> owning teacher id
+    scenario_teachers: dict = field(default_factory=dict)
+
+    def sample(self, rng):
+        """A random (teacher_id, student_id, scenario_id, patient_id) tuple"""
+        scenario_id = rng.randint(1, self.scenarios)
+        return (
+            self.scenario_teachers[scenario_id],
+            rng.choice(self.student_ids),
+            scenario_id,
+            rng.randint(1, self.patients),
+        )
+
+
+def seed(
+    engine,
+    students=10000,
+    prescriptions=100000,
+    teachers=None,
+    scenarios=None,
+    patients=None,
+    assignments_per_student=3,
+    rng=None,
+):
+    """Fill an empty schema on ``engine`` and return a ``Cohort``
+
+    Unspecified sizes scale with ``students``: one teacher per 250 students,
+    one scenario per 250 students (at least 40), one patient per 10 students.
+    """
+    rng = rng or random.Random(42)
+    teachers = teachers or max(students // 250, 1)
+    scenarios = scenarios or max(students // 250, 40)
+    patients = patients or max(students // 10, 1)
+    prescribers = max(patients // 20, 1)
+    assignments_per_student = min(assignments_per_student, scenarios)
+    now = datetime.now()
+
+    teacher_ids = list(range(1, teachers + 1))
+    student_ids = list(range(teachers + 1, teachers + students + 1))
+    scenario_teachers = {
+        scenario_id: teacher_ids[(scenario_id - 1) % teachers]
+        for scenario_id in range(1, scenarios + 1)
+    }
+
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User),
+            [
+                {
+                    "id": user_id,
+                    "email": f"teacher{user_id}@example.com",
+                    "password_hash": "x",
+                    "role": "teacher",
+                    "first_name": rng.choice(GIVEN_NAMES),
+                    "last_name": rng.choice(LAST_NAMES),
+                }
+                for user_id in teacher_ids
+            ]
+            + [
+                {
+                    "id": user_id,
+                    "email": f"student{user_id}@example.com",
+                    "password_hash": "x",
+                    "role": "student",
+                    "first_name": rng.choice(GIVEN_NAMES),
+                    "last_name": rng.choice(LAST_NAMES),
+                    "studentnumber": 20000000 + user_id,
+                }
+                for user_id in student_ids
+            ],
+        )
+        conn.execute(
+            insert(Patient),
+            [
+                {
+                    "id": i,
+                    "medicare": f"{40000000000 + i}",
+                    "name": f"Patient {i}",
+                    "given_name": rng.choice(GIVEN_NAMES),
+                    "last_name": rng.choice(LAST_NAMES),
+                    "dob": date(1940, 1, 1) + timedelta(days=rng.randint(0, 30000)),
+                    "script_date": date(2024, 1, 1) + timedelta(days=rng.randint(0, 600)),
+                    "address": f"{i} Example St, Perth",
+                }
+                for i in range(1, patients + 1)
+            ],
+        )
+        conn.execute(
+            insert(Prescriber),
+            [
+                {
+                    "id": i,
+                    "fname": rng.choice(GIVEN_NAMES),
+                    "lname": rng.choice(LAST_NAMES),
+                    "title": "Dr",
+                    "prescriber_id": 100000 + i,
+                    "hpii": 8003610000000000 + i,
+                    "hpio": 8003620000000000 + i,
+                    "phone": "0800000000",
+                }
+                for i in range(1, prescribers + 1)
+            ],
+        )
+        conn.execute(
+            insert(Scenario),
+            [
+                {
+                    "id": scenario_id,
+                    "name": f"Scenario {scenario_id}",
+                    "teacher_id": teacher_id,
+                    "active_patient_id": rng.randint(1, patients),
+                }
+                for scenario_id, teacher_id in scenario_teachers.items()
+            ],
+        )
+
+        rows = []
+        for i in range(1, prescriptions + 1):
+            dspid = rng.choice(("asl", "alr"))
+            prescribed = date(2024, 1, 1) + timedelta(days=rng.randint(0, 600))
+            rows.append(
+                {
+                    "id": i,
+                    "patient_id": rng.randint(1, patients),
+                    "prescriber_id": rng.randint(1, prescribers),
+                    "DSPID": dspid,
+                    "status": PrescriptionStatus.AVAILABLE.value
+                    if dspid == "asl"
+                    else PrescriptionStatus.DISPENSED.value,
+                    "drug_name": rng.choice(DRUG_NAMES),
+                    "drug_code": f"{rng.randint(10000, 99999)}",
+                    "dose_instr": "1 daily",
+                    "dose_qty": 30,
+                    "dose_rpt": 5,
+                    "prescribed_date": prescribed,
+                    "dispensed_date": None
+                    if dspid == "asl"
+                    else prescribed + timedelta(days=1),
+                    "remaining_repeats": None if dspid == "asl" else 4,
+                }
+            )
+            if len(rows) == 10000:
+                conn.execute(insert(Prescription), rows)
+                rows = []
+        if rows:
+            conn.execute(insert(Prescription), rows)
+
+        assignments = []
+        scenario_patients = []
+        submissions = []
+        for student_id in student_ids:
+            for scenario_id in rng.sample(range(1, scenarios + 1), assignments_per_student):
+                ss_id = len(assignments) + 1
+                status = rng.choice(("assigned", "submitted", "graded"))
+                patient_id = rng.randint(1, patients)
+                assignments.append(
+                    {
+                        "id": ss_id,
+                        "student_id": student_id,
+                        "scenario_id": scenario_id,
+                        "status": status,
+                        "score": rng.randint(40, 100) if status == "graded" else None,
+                    }
+                )
+                scenario_patients.append(
+                    {
+                        "scenario_id": scenario_id,
+                        "student_id": student_id,
+                        "patient_id": patient_id,
+                    }
+                )
+                if status != "assigned":
+                    for n in range(rng.randint(1, 3)):
+                        submissions.append(
+                            {
+                                "student_scenario_id": ss_id,
+                                "patient_id": patient_id,
+                                "submitted_at": now - timedelta(hours=n),
+                                "submission_data": {"patient_id": patient_id},
+                            }
+                        )
+        conn.execute(insert(StudentScenario), assignments)
+        conn.execute(insert(ScenarioPatient), scenario_patients)
+        if submissions:
+            conn.execute(insert(Submission), submissions)
+
+    return Cohort(
+        teachers=teachers,
+        students=students,
+        scenarios=scenarios,
+        patients=patients,
+        prescribers=prescribers,
+        prescriptions=prescriptions,
+        assignments=len(assignments),
+        submissions=len(submissions),
+        teacher_ids=teacher_ids,
+        student_ids=student_ids,
+        scenario_teachers=scenario_teachers,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("url", help="SQLAlchemy URL of an empty database")
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--prescriptions", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    # Also creates the FTS search index when website.search is imported
+    import website.search  # noqa: F401
+
+    db.metadata.create_all(engine)
+    cohort = seed(
+        engine, args.students, args.prescriptions, rng=random.Random(args.seed)
+    )
+    print(
+        f"Seeded {cohort.teachers} teachers, {cohort.students} students, "
+        f"{cohort.scenarios} scenarios, {cohort.patients} patients, "
+        f"{cohort.prescriptions} prescriptions, {cohort.assignments} assignments, "
+        f"{cohort.submissions} submissions"
+    )
@@ -3,7 +3,7 @@ Script to create dummy patient records for testing purposes.
 Run this script to populate the database with sample patient data.
 """
 
-from datetime import datetime
+from datetime import date, datetime
 import random
 
 
@@ -95,12 +95,12 @@ def create_dummy_patients():
             birth_year = random.randint(current_year - 90, current_year - 18)
             birth_month = random.randint(1, 12)
             birth_day = random.randint(1, 28)
-            dob = f"{birth_day:02d}/{birth_month:02d}/{birth_year}"
+            dob = date(birth_year, birth_month, birth_day)
 
             # Generate script date (recent dates - current year)
             script_month = random.randint(1, 12)
             script_day = random.randint(1, 28)
-            script_date = f"{script_day:02d}/{script_month:02d}/{current_year}"
+            script_date = date(current_year, script_month, script_day)
 
             # Medicare expiry (future date)
             medicare_valid_to = f"{random.randint(1, 12):02d}/{random.randint(current_year + 1, current_year + 5)}"
@@ -193,7 +193,7 @@ def create_dummy_patients():
                 consented_to_asl=True,
                 consented_to_upload=True,
                 asl_status=1,
-                consent_last_updated=datetime.now().strftime("%d/%m/%Y %I:%M %p"),
+                consent_last_updated=datetime.now(),
                 is_registered=True,
             )
 
@@ -0,0 +1,22 @@
+"""
+gunicorn settings, picked up automatically when started from this directory:
+    gunicorn "website:create_app()"
+
+Workers share request metrics through METRICS_DIR (see website/metrics.py).
+"""
+
+import os
+import shutil
+import tempfile
+
+workers = int(os.environ.get("WEB_CONCURRENCY") or 4)
+
+
+def on_starting(server):
+    # Give workers a shared metrics directory and drop snapshots from earlier runs
+    metrics_dir = os.environ.get("METRICS_DIR")
+    if not metrics_dir:
+        metrics_dir = tempfile.mkdtemp(prefix="asl-metrics-")
+        os.environ["METRICS_DIR"] = metrics_dir
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
@@ -1,6 +1,7 @@
 def init_asl_database():
     """Initialize DB with ASL data"""
     from website import create_app
+    from website.converters import parse_date
 
     # Import ASLStatus for creating different scenarios
     from website.models import (
@@ -26,10 +27,10 @@ def init_asl_database():
             sfty_net_entitlement_cardholder=True,
             rpbs_ben_entitlement_cardholder=False,
             name="Draga Diaz",
-            dob="26/01/1998",
+            dob=parse_date("26/01/1998"),
             preferred_contact=401234567,
             address="33 JIT DR CHARAM VIC 3318",
-            script_date="30/11/2020",
+            script_date=parse_date("30/11/2020"),
             pbs=None,
             rpbs=None,
             is_registered=True,  # Added
@@ -43,10 +44,10 @@ def init_asl_database():
             sfty_net_entitlement_cardholder=False,
             rpbs_ben_entitlement_cardholder=True,
             name="John Smith",
-            dob="15/03/1985",
+            dob=parse_date("15/03/1985"),
             preferred_contact=412345678,
             address="123 Main St MELBOURNE VIC 3000",
-            script_date="15/12/2023",
+            script_date=parse_date("15/12/2023"),
             pbs=None,
             rpbs=None,
             asl_status=ASLStatus.PENDING.value,
@@ -61,10 +62,10 @@ def init_asl_database():
             sfty_net_entitlement_cardholder=True,
             rpbs_ben_entitlement_cardholder=False,
             name="Sarah Johnson",
-            dob="10/07/1992",
+            dob=parse_date("10/07/1992"),
             preferred_contact=455123456,
             address="456 Oak Ave PERTH WA 6000",
-            script_date="20/01/2024",
+            script_date=parse_date("20/01/2024"),
             pbs=None,
             rpbs=None,
             asl_status=ASLStatus.REJECTED.value,
@@ -79,10 +80,10 @@ def init_asl_database():
             sfty_net_entitlement_cardholder=False,
             rpbs_ben_entitlement_cardholder=False,
             name="Michael Brown",
-            dob="05/09/1975",
+            dob=parse_date("05/09/1975"),
             preferred_contact=433987654,
             address="789 Pine St SYDNEY NSW 2000",
-            script_date="15/02/2024",
+            script_date=parse_date("15/02/2024"),
             pbs=None,
             rpbs=None,
             asl_status=ASLStatus.NO_CONSENT.value,
@@ -117,7 +118,7 @@ def init_asl_database():
                 dose_instr="ONCE A DAY",
                 dose_qty=30,
                 dose_rpt=6,
-                prescribed_date="10/06/2021",
+                prescribed_date=parse_date("10/06/2021"),
                 paperless=True,
                 brand_sub_not_prmt=False,
                 remaining_repeats=6,
@@ -134,7 +135,7 @@ def init_asl_database():
                 dose_instr="ONCE A DAY",
                 dose_qty=90,
                 dose_rpt=6,
-                prescribed_date="10/06/2021",
+                prescribed_date=parse_date("10/06/2021"),
                 paperless=True,
                 brand_sub_not_prmt=False,
                 remaining_repeats=6,
@@ -150,7 +151,7 @@ def init_asl_database():
                 dose_instr="ONCE A DAY",
                 dose_qty=30,
                 dose_rpt=5,
-                prescribed_date="10/06/2021",
+                prescribed_date=parse_date("10/06/2021"),
                 paperless=False,
                 brand_sub_not_prmt=False,
                 remaining_repeats=5,
@@ -166,7 +167,7 @@ def init_asl_database():
                 dose_instr="AS REQUIRED FOR PAIN",
                 dose_qty=20,
                 dose_rpt=2,
-                prescribed_date="15/06/2021",
+                prescribed_date=parse_date("15/06/2021"),
                 paperless=True,
                 brand_sub_not_prmt=False,
                 remaining_repeats=2,
@@ -187,7 +188,7 @@ def init_asl_database():
                 dose_instr="TWO PUFFS TWICE DAILY",
                 dose_qty=1,
                 dose_rpt=4,
-                prescribed_date="15/12/2023",
+                prescribed_date=parse_date("15/12/2023"),
                 paperless=True,
                 brand_sub_not_prmt=False,
                 remaining_repeats=4,
@@ -204,7 +205,7 @@ def init_asl_database():
                 dose_instr="ONCE DAILY BEFORE BREAKFAST",
                 dose_qty=28,
                 dose_rpt=3,
-                prescribed_date="20/01/2024",
+                prescribed_date=parse_date("20/01/2024"),
                 paperless=True,
                 brand_sub_not_prmt=False,
                 remaining_repeats=3,
@@ -221,7 +222,7 @@ def init_asl_database():
                 dose_instr="ONCE DAILY AT NIGHT",
                 dose_qty=30,
                 dose_rpt=5,
-                prescribed_date="15/02/2024",
+                prescribed_date=parse_date("15/02/2024"),
                 paperless=True,
                 brand_sub_not_prmt=False,
                 remaining_repeats=5,
@@ -242,8 +243,8 @@ def init_asl_database():
                 dose_instr="ONCE DAILY",
                 dose_qty=4,
                 dose_rpt=6,
-                prescribed_date="05/07/2021",
-                dispensed_date="05/07/2021",
+                prescribed_date=parse_date("05/07/2021"),
+                dispensed_date=parse_date("05/07/2021"),
                 paperless=False,
                 brand_sub_not_prmt=False,
                 remaining_repeats=3,  # has 3 repeats left
@@ -260,8 +261,8 @@ def init_asl_database():
                 dose_instr="ONCE DAILY BEFORE BREAKFAST",
                 dose_qty=28,
                 dose_rpt=5,
-                prescribed_date="10/06/2021",
-                dispensed_date="23/06/2021",
+                prescribed_date=parse_date("10/06/2021"),
+                dispensed_date=parse_date("23/06/2021"),
                 paperless=True,
                 brand_sub_not_prmt=False,
                 remaining_repeats=2,  # has 2 repeats left
@@ -0,0 +1,28 @@
+"""Add patients.data_version for ASL caching and ETags
+
+Revision ID: 3f7a2d9c5e18
+Revises: 8e3f0c6d1a94
+Create Date: 2026-10-18 13:40:12.208114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f7a2d9c5e18'
+down_revision = '8e3f0c6d1a94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('patients', schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column('data_version', sa.Integer(), nullable=False, server_default='1')
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('patients', schema=None) as batch_op:
+        batch_op.drop_column('data_version')
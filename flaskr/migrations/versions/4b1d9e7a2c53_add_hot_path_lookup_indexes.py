@@ -0,0 +1,60 @@
+"""Add indexes for hot lookup paths
+
+Revision ID: 4b1d9e7a2c53
+Revises: c78b8a3c33bf
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b1d9e7a2c53'
+down_revision = 'c78b8a3c33bf'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('student_scenarios', schema=None) as batch_op:
+        batch_op.create_index('ix_student_scenarios_student_scenario', ['student_id', 'scenario_id'], unique=False)
+        batch_op.create_index('ix_student_scenarios_scenario_status', ['scenario_id', 'status'], unique=False)
+
+    with op.batch_alter_table('scenario_patients', schema=None) as batch_op:
+        batch_op.create_index('ix_scenario_patients_scenario_student', ['scenario_id', 'student_id'], unique=False)
+
+    with op.batch_alter_table('submissions', schema=None) as batch_op:
+        batch_op.create_index('ix_submissions_student_scenario_submitted', ['student_scenario_id', 'submitted_at'], unique=False)
+
+    with op.batch_alter_table('prescriptions', schema=None) as batch_op:
+        batch_op.create_index('ix_prescriptions_patient_dspid', ['patient_id', 'DSPID'], unique=False)
+        batch_op.create_index('ix_prescriptions_patient_drug_dspid', ['patient_id', 'drug_name', 'DSPID'], unique=False)
+
+    with op.batch_alter_table('patients', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_patients_medicare'), ['medicare'], unique=False)
+
+    with op.batch_alter_table('prescribers', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_prescribers_prescriber_id'), ['prescriber_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('prescribers', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_prescribers_prescriber_id'))
+
+    with op.batch_alter_table('patients', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_patients_medicare'))
+
+    with op.batch_alter_table('prescriptions', schema=None) as batch_op:
+        batch_op.drop_index('ix_prescriptions_patient_drug_dspid')
+        batch_op.drop_index('ix_prescriptions_patient_dspid')
+
+    with op.batch_alter_table('submissions', schema=None) as batch_op:
+        batch_op.drop_index('ix_submissions_student_scenario_submitted')
+
+    with op.batch_alter_table('scenario_patients', schema=None) as batch_op:
+        batch_op.drop_index('ix_scenario_patients_scenario_student')
+
+    with op.batch_alter_table('student_scenarios', schema=None) as batch_op:
+        batch_op.drop_index('ix_student_scenarios_scenario_status')
+        batch_op.drop_index('ix_student_scenarios_student_scenario')
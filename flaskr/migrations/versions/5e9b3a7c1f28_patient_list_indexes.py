@@ -0,0 +1,30 @@
+"""Index the patient list's filter and sort columns
+
+Revision ID: 5e9b3a7c1f28
+Revises: d2c8f6a1b593
+Create Date: 2026-10-18 18:41:07.215936
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e9b3a7c1f28'
+down_revision = 'd2c8f6a1b593'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('patients', schema=None) as batch_op:
+        batch_op.create_index('ix_patients_asl_status', ['asl_status'], unique=False)
+        batch_op.create_index('ix_patients_dob', ['dob'], unique=False)
+        batch_op.create_index('ix_patients_last_name_given_name', ['last_name', 'given_name'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('patients', schema=None) as batch_op:
+        batch_op.drop_index('ix_patients_last_name_given_name')
+        batch_op.drop_index('ix_patients_dob')
+        batch_op.drop_index('ix_patients_asl_status')
@@ -0,0 +1,36 @@
+"""Add row_version to patients and prescriptions for optimistic locking
+
+Revision ID: 6c2e8b4f1d07
+Revises: 3f7a2d9c5e18
+Create Date: 2026-10-18 15:02:47.531906
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c2e8b4f1d07'
+down_revision = '3f7a2d9c5e18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('patients', schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column('row_version', sa.Integer(), nullable=False, server_default='1')
+        )
+
+    with op.batch_alter_table('prescriptions', schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column('row_version', sa.Integer(), nullable=False, server_default='1')
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('prescriptions', schema=None) as batch_op:
+        batch_op.drop_column('row_version')
+
+    with op.batch_alter_table('patients', schema=None) as batch_op:
+        batch_op.drop_column('row_version')
@@ -0,0 +1,117 @@
+"""Store patient and prescription dates as native DATE/DATETIME
+
+Revision ID: 8e3f0c6d1a94
+Revises: 4b1d9e7a2c53
+Create Date: 2026-10-18 10:41:05.532871
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e3f0c6d1a94'
+down_revision = '4b1d9e7a2c53'
+branch_labels = None
+depends_on = None
+
+# (table, column, old type, new type)
+DATE_COLUMNS = [
+    ('patients', 'dob', sa.String(length=10), sa.Date()),
+    ('patients', 'script_date', sa.String(length=10), sa.Date()),
+    ('patients', 'consent_last_updated', sa.String(length=20), sa.DateTime()),
+    ('prescriptions', 'prescribed_date', sa.String(length=10), sa.Date()),
+    ('prescriptions', 'dispensed_date', sa.String(length=10), sa.Date()),
+]
+
+# Every format the app has written these strings in over time
+DATE_FORMATS = ('%d/%m/%Y', '%Y-%m-%d')
+DATETIME_FORMATS = (
+    '%d/%m/%Y %I:%M %p',
+    '%d/%m/%Y %H:%M %p',
+    '%d/%m/%Y %H:%M',
+    '%d/%m/%Y',
+    '%Y-%m-%d %H:%M:%S',
+)
+
+
+def _parse(value, new_type):
+    if value is None or not str(value).strip():
+        return None
+    text = ' '.join(str(value).split())
+    formats = DATETIME_FORMATS if isinstance(new_type, sa.DateTime) else DATE_FORMATS
+    for fmt in formats:
+        try:
+            parsed = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        return parsed if isinstance(new_type, sa.DateTime) else parsed.date()
+    # Unparseable legacy values are dropped rather than failing the upgrade
+    return None
+
+
+def _format(value, new_type):
+    if value is None:
+        return None
+    if isinstance(new_type, sa.DateTime):
+        return value.strftime('%d/%m/%Y %I:%M %p')
+    return value.strftime('%d/%m/%Y')
+
+
+def _copy_column(table_name, src, dst, src_type, dst_type, convert):
+    """Row-by-row copy src -> dst, converting in Python so it works on any backend"""
+    bind = op.get_bind()
+    table = sa.table(
+        table_name, sa.column('id', sa.Integer()), sa.column(src, src_type), sa.column(dst, dst_type)
+    )
+    rows = bind.execute(sa.select(table.c.id, table.c[src])).fetchall()
+    for row_id, value in rows:
+        bind.execute(
+            table.update().where(table.c.id == row_id).values({dst: convert(value)})
+        )
+
+
+def upgrade():
+    for table_name, column, old_type, new_type in DATE_COLUMNS:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.add_column(sa.Column(f'{column}_native', new_type, nullable=True))
+        _copy_column(
+            table_name, column, f'{column}_native', old_type, new_type,
+            lambda value, new_type=new_type: _parse(value, new_type),
+        )
+
+    for table_name in ('patients', 'prescriptions'):
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            for t, column, _, _ in DATE_COLUMNS:
+                if t != table_name:
+                    continue
+                batch_op.drop_column(column)
+                batch_op.alter_column(f'{column}_native', new_column_name=column)
+
+    with op.batch_alter_table('prescriptions', schema=None) as batch_op:
+        batch_op.create_index('ix_prescriptions_patient_prescribed', ['patient_id', 'prescribed_date'], unique=False)
+        batch_op.create_index('ix_prescriptions_patient_dispensed', ['patient_id', 'dispensed_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('prescriptions', schema=None) as batch_op:
+        batch_op.drop_index('ix_prescriptions_patient_dispensed')
+        batch_op.drop_index('ix_prescriptions_patient_prescribed')
+
+    for table_name, column, old_type, new_type in DATE_COLUMNS:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.add_column(sa.Column(f'{column}_text', old_type, nullable=True))
+        _copy_column(
+            table_name, column, f'{column}_text', new_type, old_type,
+            lambda value, new_type=new_type: _format(value, new_type),
+        )
+
+    for table_name in ('patients', 'prescriptions'):
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            for t, column, _, _ in DATE_COLUMNS:
+                if t != table_name:
+                    continue
+                batch_op.drop_column(column)
+                batch_op.alter_column(f'{column}_text', new_column_name=column)
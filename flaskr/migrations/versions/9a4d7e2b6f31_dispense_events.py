@@ -0,0 +1,50 @@
+"""Add the append-only dispense_events ledger
+
+Revision ID: 9a4d7e2b6f31
+Revises: 6c2e8b4f1d07
+Create Date: 2026-10-18 16:21:05.774310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4d7e2b6f31'
+down_revision = '6c2e8b4f1d07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('dispense_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('patient_id', sa.Integer(), nullable=False),
+    sa.Column('prescription_id', sa.Integer(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('drug_name', sa.String(length=200), nullable=True),
+    sa.Column('dispensed_by', sa.String(length=100), nullable=True),
+    sa.Column('dispensing_notes', sa.Text(), nullable=True),
+    sa.Column('dispensed_date', sa.Date(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('repeats_before', sa.Integer(), nullable=True),
+    sa.Column('repeats_after', sa.Integer(), nullable=True),
+    sa.Column('dose_rpt_before', sa.Integer(), nullable=True),
+    sa.Column('dose_rpt_after', sa.Integer(), nullable=True),
+    sa.Column('status_after', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['patient_id'], ['patients.id'], ),
+    sa.ForeignKeyConstraint(['prescription_id'], ['prescriptions.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('dispense_events', schema=None) as batch_op:
+        batch_op.create_index('ix_dispense_events_patient_id', ['patient_id', 'id'], unique=False)
+        batch_op.create_index('ix_dispense_events_prescription_id', ['prescription_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('dispense_events', schema=None) as batch_op:
+        batch_op.drop_index('ix_dispense_events_prescription_id')
+        batch_op.drop_index('ix_dispense_events_patient_id')
+
+    op.drop_table('dispense_events')
@@ -0,0 +1,50 @@
+"""Make prescribers.prescriber_id unique, merging duplicates
+
+Revision ID: a3f9d2c7e614
+Revises: 5e9b3a7c1f28
+Create Date: 2026-10-18 19:52:40.318274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f9d2c7e614'
+down_revision = '5e9b3a7c1f28'
+branch_labels = None
+depends_on = None
+
+# Prescribers sharing a prescriber_id with an older row; the oldest is the one
+# ingest kept updating, so it is the one that stays
+DUPLICATES = (
+    "SELECT p.id FROM prescribers p WHERE p.prescriber_id IS NOT NULL "
+    "AND p.id > (SELECT MIN(d.id) FROM prescribers d "
+    "WHERE d.prescriber_id = p.prescriber_id)"
+)
+
+
+def upgrade():
+    # Their patients' ASL pages change prescriber details
+    op.execute(
+        "UPDATE patients SET data_version = data_version + 1 WHERE id IN "
+        f"(SELECT patient_id FROM prescriptions WHERE prescriber_id IN ({DUPLICATES}))"
+    )
+    op.execute(
+        "UPDATE prescriptions SET prescriber_id = ("
+        "SELECT MIN(d.id) FROM prescribers d WHERE d.prescriber_id = "
+        "(SELECT p.prescriber_id FROM prescribers p WHERE p.id = prescriptions.prescriber_id)"
+        f") WHERE prescriber_id IN ({DUPLICATES})"
+    )
+    op.execute(f"DELETE FROM prescribers WHERE id IN ({DUPLICATES})")
+
+    with op.batch_alter_table('prescribers', schema=None) as batch_op:
+        batch_op.drop_index('ix_prescribers_prescriber_id')
+        batch_op.create_index('ix_prescribers_prescriber_id', ['prescriber_id'], unique=True)
+
+
+def downgrade():
+    # Merged duplicates are not restored
+    with op.batch_alter_table('prescribers', schema=None) as batch_op:
+        batch_op.drop_index('ix_prescribers_prescriber_id')
+        batch_op.create_index('ix_prescribers_prescriber_id', ['prescriber_id'], unique=False)
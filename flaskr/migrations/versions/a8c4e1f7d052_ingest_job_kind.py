@@ -0,0 +1,30 @@
+"""Record bulk imports in ingest_jobs: kind and importing user
+
+Revision ID: a8c4e1f7d052
+Revises: f5a2d8c3b719
+Create Date: 2026-10-18 22:41:09.508217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8c4e1f7d052'
+down_revision = 'f5a2d8c3b719'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ingest_jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('kind', sa.String(length=16), nullable=False, server_default='contract'))
+        batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_ingest_jobs_user_id_users', 'users', ['user_id'], ['id'])
+
+
+def downgrade():
+    with op.batch_alter_table('ingest_jobs', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_ingest_jobs_user_id_users', type_='foreignkey')
+        batch_op.drop_column('user_id')
+        batch_op.drop_column('kind')
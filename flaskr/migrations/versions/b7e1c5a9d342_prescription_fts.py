@@ -0,0 +1,83 @@
+"""Add the prescription_search FTS5 index and its sync triggers (SQLite only)
+
+Revision ID: b7e1c5a9d342
+Revises: 9a4d7e2b6f31
+Create Date: 2026-10-18 17:08:33.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e1c5a9d342'
+down_revision = '9a4d7e2b6f31'
+branch_labels = None
+depends_on = None
+
+PRESCRIBER_NAME = (
+    "(SELECT trim(coalesce(fname, '') || ' ' || coalesce(lname, '')) "
+    "FROM prescribers WHERE id = new.prescriber_id)"
+)
+
+UPGRADE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS prescription_search USING fts5("
+    "drug_name, drug_code, prescriber_name, patient_key, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    "CREATE TRIGGER IF NOT EXISTS prescriptions_search_insert "
+    "AFTER INSERT ON prescriptions BEGIN "
+    "INSERT INTO prescription_search (rowid, drug_name, drug_code, prescriber_name, patient_key) "
+    f"VALUES (new.id, new.drug_name, new.drug_code, {PRESCRIBER_NAME}, 'p' || new.patient_id); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS prescriptions_search_update "
+    "AFTER UPDATE OF id, drug_name, drug_code, prescriber_id, patient_id ON prescriptions BEGIN "
+    "DELETE FROM prescription_search WHERE rowid = old.id; "
+    "INSERT INTO prescription_search (rowid, drug_name, drug_code, prescriber_name, patient_key) "
+    f"VALUES (new.id, new.drug_name, new.drug_code, {PRESCRIBER_NAME}, 'p' || new.patient_id); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS prescriptions_search_delete "
+    "AFTER DELETE ON prescriptions BEGIN "
+    "DELETE FROM prescription_search WHERE rowid = old.id; "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS prescribers_search_update "
+    "AFTER UPDATE OF fname, lname ON prescribers BEGIN "
+    "UPDATE prescription_search "
+    "SET prescriber_name = trim(coalesce(new.fname, '') || ' ' || coalesce(new.lname, '')) "
+    "WHERE rowid IN (SELECT id FROM prescriptions WHERE prescriber_id = new.id); "
+    "END",
+    "DELETE FROM prescription_search",
+    "INSERT INTO prescription_search (rowid, drug_name, drug_code, prescriber_name, patient_key) "
+    "SELECT p.id, p.drug_name, p.drug_code, "
+    "trim(coalesce(d.fname, '') || ' ' || coalesce(d.lname, '')), 'p' || p.patient_id "
+    "FROM prescriptions p LEFT JOIN prescribers d ON d.id = p.prescriber_id",
+]
+
+DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS prescribers_search_update",
+    "DROP TRIGGER IF EXISTS prescriptions_search_delete",
+    "DROP TRIGGER IF EXISTS prescriptions_search_update",
+    "DROP TRIGGER IF EXISTS prescriptions_search_insert",
+    "DROP TABLE IF EXISTS prescription_search",
+]
+
+
+def _fts5_available(bind):
+    return bind.dialect.name == 'sqlite' and bool(
+        bind.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar()
+    )
+
+
+def upgrade():
+    # Other backends keep using the ILIKE search (see website/search.py)
+    bind = op.get_bind()
+    if not _fts5_available(bind):
+        return
+    for statement in UPGRADE:
+        op.execute(statement)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for statement in DOWNGRADE:
+        op.execute(statement)
@@ -0,0 +1,28 @@
+"""Store queued contracts on ingest_jobs, which becomes the ingest queue
+
+Revision ID: c6e2a9d4f817
+Revises: a8c4e1f7d052
+Create Date: 2026-10-18 14:56:00.323700
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6e2a9d4f817'
+down_revision = 'a8c4e1f7d052'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ingest_jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('contract', sa.JSON(), nullable=True))
+        batch_op.create_index('ix_ingest_jobs_kind_state', ['kind', 'state', 'submitted_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ingest_jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_ingest_jobs_kind_state')
+        batch_op.drop_column('contract')
@@ -0,0 +1,132 @@
+"""Add search_entries for the omnibox, with its FTS5 index on SQLite
+
+Revision ID: d2c8f6a1b593
+Revises: b7e1c5a9d342
+Create Date: 2026-10-18 18:02:51.774310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2c8f6a1b593'
+down_revision = 'b7e1c5a9d342'
+branch_labels = None
+depends_on = None
+
+FTS_UPGRADE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_entries_fts USING fts5("
+    "kind, title, body, content = 'search_entries', content_rowid = 'id', "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    "CREATE TRIGGER IF NOT EXISTS search_entries_fts_insert "
+    "AFTER INSERT ON search_entries BEGIN "
+    "INSERT INTO search_entries_fts (rowid, kind, title, body) "
+    "VALUES (new.id, new.kind, new.title, new.body); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS search_entries_fts_delete "
+    "AFTER DELETE ON search_entries BEGIN "
+    "INSERT INTO search_entries_fts (search_entries_fts, rowid, kind, title, body) "
+    "VALUES ('delete', old.id, old.kind, old.title, old.body); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS search_entries_fts_update "
+    "AFTER UPDATE ON search_entries BEGIN "
+    "INSERT INTO search_entries_fts (search_entries_fts, rowid, kind, title, body) "
+    "VALUES ('delete', old.id, old.kind, old.title, old.body); "
+    "INSERT INTO search_entries_fts (rowid, kind, title, body) "
+    "VALUES (new.id, new.kind, new.title, new.body); "
+    "END",
+]
+
+FTS_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS search_entries_fts_update",
+    "DROP TRIGGER IF EXISTS search_entries_fts_delete",
+    "DROP TRIGGER IF EXISTS search_entries_fts_insert",
+    "DROP TABLE IF EXISTS search_entries_fts",
+]
+
+
+def _fts5_available(bind):
+    return bind.dialect.name == 'sqlite' and bool(
+        bind.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar()
+    )
+
+
+def _join(*parts):
+    return ' '.join(str(part) for part in parts if part not in (None, ''))
+
+
+def _backfill(bind, entries):
+    """The same entries website/search.py writes, for the rows already there"""
+    rows = []
+    for user in bind.execute(sa.text(
+        "SELECT id, first_name, last_name, email, studentnumber FROM users "
+        "WHERE role = 'student' AND (is_active IS NULL OR is_active)"
+    )):
+        name = _join(user.first_name, user.last_name)
+        rows.append({
+            'kind': 'student', 'object_id': user.id, 'title': name or user.email,
+            'subtitle': user.email, 'body': _join(name, user.email, user.studentnumber),
+            'owner_id': None,
+        })
+    patients = sa.table(
+        'patients', sa.column('id'), sa.column('name'), sa.column('given_name'),
+        sa.column('last_name'), sa.column('medicare'), sa.column('dob', sa.Date),
+    )
+    for patient in bind.execute(sa.select(patients)):
+        dob = patient.dob
+        details = []
+        if patient.medicare:
+            details.append(f'Medicare {patient.medicare}')
+        if dob:
+            details.append(f"DOB {dob.strftime('%d/%m/%Y')}")
+        rows.append({
+            'kind': 'patient', 'object_id': patient.id,
+            'title': patient.name or f'Patient {patient.id}',
+            'subtitle': ' · '.join(details),
+            'body': _join(
+                patient.name, patient.given_name, patient.last_name, patient.medicare,
+                dob.strftime('%d/%m/%Y') if dob else None,
+                dob.isoformat() if dob else None,
+            ),
+            'owner_id': None,
+        })
+    for scenario in bind.execute(sa.text(
+        "SELECT id, name, description, teacher_id FROM scenarios "
+        "WHERE is_archived IS NULL OR NOT is_archived"
+    )):
+        description = ' '.join((scenario.description or '').split())
+        rows.append({
+            'kind': 'scenario', 'object_id': scenario.id, 'title': scenario.name,
+            'subtitle': description[:117] + '...' if len(description) > 120 else description,
+            'body': _join(scenario.name, description), 'owner_id': scenario.teacher_id,
+        })
+    if rows:
+        op.bulk_insert(entries, rows)
+
+
+def upgrade():
+    entries = op.create_table('search_entries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('object_id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=True),
+    sa.Column('subtitle', sa.String(length=200), nullable=True),
+    sa.Column('body', sa.Text(), nullable=True),
+    sa.Column('owner_id', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('kind', 'object_id', name='uq_search_entries_kind_object')
+    )
+    bind = op.get_bind()
+    # Other backends search search_entries.body with ILIKE (see website/search.py)
+    if _fts5_available(bind):
+        for statement in FTS_UPGRADE:
+            op.execute(statement)
+    _backfill(bind, entries)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for statement in FTS_DOWNGRADE:
+            op.execute(statement)
+    op.drop_table('search_entries')
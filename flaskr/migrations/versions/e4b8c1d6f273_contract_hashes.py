@@ -0,0 +1,35 @@
+"""Track ingested contracts: per-patient and per-item content hashes
+
+Revision ID: e4b8c1d6f273
+Revises: a3f9d2c7e614
+Create Date: 2026-10-18 20:37:12.604815
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b8c1d6f273'
+down_revision = 'a3f9d2c7e614'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('patients', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('contract_hash', sa.String(length=64), nullable=True))
+
+    with op.batch_alter_table('prescriptions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('contract_key', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('contract_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    # Not batch: rebuilding prescriptions trips the search triggers on
+    # prescribers, and SQLite (3.35+) can drop these columns in place
+    op.drop_column('prescriptions', 'contract_hash')
+    op.drop_column('prescriptions', 'contract_key')
+
+    with op.batch_alter_table('patients', schema=None) as batch_op:
+        batch_op.drop_column('contract_hash')
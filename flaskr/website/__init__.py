@@ -1,4 +1,3 @@
-import os
 from flask import Flask
 
 from flask_login import LoginManager
@@ -6,17 +5,45 @@ from flask_wtf.csrf import CSRFProtect
 from flask_migrate import Migrate
 from flask_minify import Minify
 
+from sqlalchemy import inspect
+
+from .database import (
+    configure_engine,
+    database_uri_from_env,
+    engine_options_from_env,
+    sqlite_pragmas_from_env,
+)
+from .asl_cache import init_asl_cache
+from .concurrency import init_concurrency
+from .ingest import init_ingest
+from .metrics import init_metrics
+from .query_stats import init_query_stats
+from .search import init_search
+
 
 def create_app():
     app = Flask(__name__)
 
-    Minify(app=app, html=True, js=True, cssless=True)
+    # Print jobs are streamed; minifying would buffer the whole document
+    Minify(
+        app=app,
+        html=True,
+        js=True,
+        cssless=True,
+        bypass=["views.print_job", "views.print_scenario"],
+    )
 
     app.config["SECRET_KEY"] = (
         "dev-secret-key-change-in-production"  # Change this in production!
     )
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///asl_simulation.db"
+    # Backend and pool settings come from DATABASE_URL / DB_POOL_* (see database.py)
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_uri_from_env()
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options_from_env(
+        app.config["SQLALCHEMY_DATABASE_URI"]
+    )
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # SQLite pragmas (WAL, busy_timeout, ...) applied on every new connection
+    app.config["SQLITE_PRAGMAS"] = sqlite_pragmas_from_env()
 
     # Session configuration for better security
     app.config["SESSION_COOKIE_HTTPONLY"] = True
@@ -31,6 +58,19 @@ def create_app():
     from .models import db, User
 
     db.init_app(app)
+    configure_engine(app, db)
+    # Per-request query counts, N+1 warnings and query budgets (see query_stats.py)
+    init_query_stats(app, db)
+    # Per-endpoint latency/status metrics, served at /admin/metrics
+    init_metrics(app)
+    # Per-patient ASL view-model cache, invalidated on ORM writes
+    init_asl_cache(app)
+    # Stale Patient/Prescription writes become 409s (see concurrency.py)
+    init_concurrency(app)
+    # Omnibox search entries kept in sync with ORM writes (see search.py)
+    init_search(app)
+    # NDJSON batch ingest and the background ingest queue (see ingest.py)
+    init_ingest(app)
     # Diagnostic prints were removed to avoid cluttering console output in debug mode
 
     # Set up Flask-Migrate
@@ -67,6 +107,12 @@ def create_app():
             return text
         return text.replace("\n", "<br>")
 
+    # Dates are stored natively; DD/MM/YYYY is purely a presentation format
+    from .converters import format_date, format_datetime
+
+    app.add_template_filter(format_date, "ddmmyyyy")
+    app.add_template_filter(format_datetime, "ddmmyyyy_hhmm")
+
     GLOBALS = {
         "ENABLE_EXPORT_SELECTED_ON_TEACHER_DASHBOARD": False,
         "SHOW_PASSWORD_RESET_ON_LOGIN": False,
@@ -79,11 +125,11 @@ def create_app():
 
 # Function to check for existing database and initialize if missing
 def initialize_database(app):
-    db_path = app.config["SQLALCHEMY_DATABASE_URI"].replace("sqlite:///", "")
-    if not os.path.exists(db_path):
-        from .models import db
+    from .models import db
 
-        with app.app_context():
+    with app.app_context():
+        # Works for any backend: create the schema only when it isn't there yet
+        if not inspect(db.engine).has_table("users"):
             db.create_all()
 
     return app
\ No newline at end of file
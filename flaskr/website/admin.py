@@ -1,3 +1,4 @@
+import hmac
 import random
 import string
 import os
@@ -16,6 +17,8 @@ from flask import (
     flash,
     jsonify,
     make_response,
+    current_app,
+    Response,
 )
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SelectField, IntegerField
@@ -31,6 +34,9 @@ from .models import (
     Patient,
     Scenario,
 )
+from .converters import format_date
+from .dispensing import detach_user
+from .metrics import render_metrics
 from datetime import datetime
 from functools import wraps
 
@@ -374,6 +380,10 @@ def require_admin():
     if request.endpoint == "admin.unauthorized":
         return
 
+    # Let a Prometheus scraper through with the configured bearer token
+    if request.endpoint == "admin.metrics" and _valid_metrics_token():
+        return
+
     # Check if user is authenticated
     if not current_user.is_authenticated:
         # flash("Please log in to access admin pages.", "error")
@@ -393,6 +403,21 @@ def require_admin():
             return redirect(url_for("views.home"))
 
 
+def _valid_metrics_token():
+    token = current_app.config.get("METRICS_TOKEN")
+    if not token:
+        return False
+    return hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    )
+
+
+@admin.route("/admin/metrics")
+def metrics():
+    """Request metrics in Prometheus text format (all workers)"""
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
 @admin.route("/admin")
 @login_required
 def admin_dashboard():
@@ -867,6 +892,7 @@ def delete_user(user_id):
                 db.session.delete(ss)
 
         # Delete the user
+        detach_user(user_to_delete.id)
         db.session.delete(user_to_delete)
         db.session.commit()
 
@@ -1025,8 +1051,8 @@ def export_all_students_csv():
                         "dose_instr": prescription.dose_instr,
                         "dose_qty": prescription.dose_qty,
                         "dose_rpt": prescription.dose_rpt,
-                        "prescribed_date": prescription.prescribed_date,
-                        "dispensed_date": prescription.dispensed_date,
+                        "prescribed_date": format_date(prescription.prescribed_date),
+                        "dispensed_date": format_date(prescription.dispensed_date),
                         "remaining_repeats": prescription.remaining_repeats,
                         "paperless": prescription.paperless,
                         "brand_sub_not_prmt": prescription.brand_sub_not_prmt,
@@ -1056,7 +1082,7 @@ def export_all_students_csv():
                     "patient_id": patient.id if patient else None,
                     "patient_last_name": patient.last_name if patient else None,
                     "patient_given_name": patient.given_name if patient else None,
-                    "patient_dob": patient.dob if patient else None,
+                    "patient_dob": format_date(patient.dob) if patient else None,
                     # Prescription data
                     "prescriptions": presc_data,
                 }
@@ -0,0 +1,227 @@
+"""
+Process-local cache of the assembled ASL view-model (``pt_data``) per patient,
+plus the per-patient ``data_version`` that keys it.
+
+The ASL page for one patient is viewed by every student in a scenario, so the
+dict is built once and reused until something it depends on changes.
+
+Every ORM write that touches a patient's ``Patient``, ``Prescription`` or
+``ASL`` rows, or a ``Prescriber`` on one of its prescriptions, bumps
+``patients.data_version`` in the same transaction (``after_flush``, and before
+bulk ``query.update()``/``delete()``). Cache entries are stored with the
+version they were built from, so a write committed by another process (another
+gunicorn worker, a script) is noticed on the next lookup. Local entries are
+also dropped straight away, and again after commit/rollback.
+
+The JSON endpoint uses the same version as its ETag.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import Session
+
+from .models import ASL, Patient, Prescriber, Prescription
+
+_TRACKED_MODELS = (Patient, Prescription, Prescriber, ASL)
+
+DEFAULT_SIZE = 512
+DEFAULT_TTL = 300.0  # seconds
+
+
+class ASLViewCache:
+    """Thread-safe LRU of patient_id -> (data_version, pt_data) with a TTL"""
+
+    def __init__(self, maxsize=DEFAULT_SIZE, ttl=DEFAULT_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, patient_id, version):
+        """Cached pt_data built from ``version``, or None; treat it as read-only"""
+        with self._lock:
+            entry = self._entries.get(patient_id)
+            if entry is not None and (
+                entry[1] != version or time.monotonic() - entry[0] > self.ttl
+            ):
+                del self._entries[patient_id]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                result = "miss"
+            else:
+                self._entries.move_to_end(patient_id)
+                self.hits += 1
+                result = "hit"
+        _count("asl_view_cache_requests_total", result=result)
+        return entry[2] if entry is not None else None
+
+    def put(self, patient_id, version, pt_data):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[patient_id] = (time.monotonic(), version, pt_data)
+            self._entries.move_to_end(patient_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, patient_ids):
+        with self._lock:
+            dropped = 0
+            for patient_id in patient_ids:
+                if self._entries.pop(patient_id, None) is not None:
+                    dropped += 1
+            self.invalidations += dropped
+        if dropped:
+            _count("asl_view_cache_invalidations_total", amount=dropped)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+asl_view_cache = ASLViewCache()
+
+
+def _count(name, amount=1, **labels):
+    """Mirror cache counters into the app's metrics registry, if any"""
+    if not has_app_context():
+        return
+    registry = current_app.extensions.get("metrics")
+    if registry is not None:
+        registry.inc(name, tuple(sorted(labels.items())), amount)
+
+
+def current_data_version(session, patient_id):
+    """The patient's data_version, or None if the patient doesn't exist"""
+    return session.execute(
+        select(Patient.data_version).where(Patient.id == patient_id)
+    ).scalar()
+
+
+def _patients_of_prescribers(connection, prescriber_ids):
+    prescriptions = Prescription.__table__
+    return set(
+        connection.execute(
+            select(prescriptions.c.patient_id)
+            .where(prescriptions.c.prescriber_id.in_(prescriber_ids))
+            .distinct()
+        ).scalars()
+    )
+
+
+def _bump(session, connection, patient_ids):
+    """Bump data_version for ``patient_ids`` and drop their cache entries"""
+    patient_ids = {pid for pid in patient_ids if pid is not None}
+    if not patient_ids:
+        return
+    patients = Patient.__table__
+    connection.execute(
+        update(patients)
+        .where(patients.c.id.in_(patient_ids))
+        .values(data_version=patients.c.data_version + 1)
+    )
+    asl_view_cache.invalidate(patient_ids)
+    session.info.setdefault("asl_cache_pending", set()).update(patient_ids)
+
+
+def _flushed_patients(session):
+    """(patient ids, prescriber ids) written by the flush in progress"""
+    patient_ids, prescriber_ids = set(), set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Prescriber):
+            prescriber_ids.add(obj.id)
+        elif isinstance(obj, Patient):
+            patient_ids.add(obj.id)
+        elif isinstance(obj, (Prescription, ASL)):
+            patient_ids.add(obj.patient_id)
+            # A row moved to another patient changes both
+            history = inspect(obj).attrs.patient_id.history
+            patient_ids.update(history.deleted or ())
+    return patient_ids, prescriber_ids
+
+
+def _after_flush(session, flush_context):
+    patient_ids, prescriber_ids = _flushed_patients(session)
+    if not (patient_ids or prescriber_ids):
+        return
+    connection = session.connection()
+    if prescriber_ids:
+        patient_ids |= _patients_of_prescribers(connection, prescriber_ids)
+    _bump(session, connection, patient_ids)
+
+
+def _after_flush_postexec(session, flush_context):
+    # The bump went straight to the table; reload it on loaded patients
+    mapper = inspect(Patient)
+    for patient_id in session.info.get("asl_cache_pending", ()):
+        key = mapper.identity_key_from_primary_key((patient_id,))
+        patient = session.identity_map.get(key)
+        if patient is not None and patient not in session.deleted:
+            session.expire(patient, ["data_version"])
+
+
+def _before_bulk(orm_execute_state):
+    """Bump versions for rows a bulk query.update()/delete() is about to touch"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ not in _TRACKED_MODELS:
+        return
+
+    table = mapper.local_table
+    whereclause = orm_execute_state.statement.whereclause
+    connection = orm_execute_state.session.connection()
+    column = table.c.id if mapper.class_ in (Patient, Prescriber) else table.c.patient_id
+    query = select(column).distinct()
+    if whereclause is not None:
+        query = query.where(whereclause)
+    ids = set(connection.execute(query).scalars())
+
+    if mapper.class_ is Prescriber:
+        ids = _patients_of_prescribers(connection, ids) if ids else set()
+    _bump(orm_execute_state.session, connection, ids)
+
+
+def _after_transaction(session):
+    pending = session.info.pop("asl_cache_pending", None)
+    if pending:
+        asl_view_cache.invalidate(pending)
+
+
+def init_asl_cache(app):
+    """Size the cache from config and hook the version/invalidation events (once)"""
+    app.config.setdefault(
+        "ASL_CACHE_SIZE", int(os.environ.get("ASL_CACHE_SIZE") or DEFAULT_SIZE)
+    )
+    app.config.setdefault(
+        "ASL_CACHE_TTL", float(os.environ.get("ASL_CACHE_TTL") or DEFAULT_TTL)
+    )
+    asl_view_cache.maxsize = app.config["ASL_CACHE_SIZE"]
+    asl_view_cache.ttl = app.config["ASL_CACHE_TTL"]
+    app.extensions["asl_cache"] = asl_view_cache
+
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "after_flush", _after_flush)
+        event.listen(Session, "after_flush_postexec", _after_flush_postexec)
+        event.listen(Session, "do_orm_execute", _before_bulk)
+        event.listen(Session, "after_commit", _after_transaction)
+        event.listen(Session, "after_rollback", _after_transaction)
+    return asl_view_cache
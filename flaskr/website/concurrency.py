@@ -0,0 +1,84 @@
+"""
+Optimistic concurrency for Patient and Prescription writes.
+
+Both models carry a ``row_version`` mapped as SQLAlchemy's ``version_id_col``:
+every ORM UPDATE/DELETE of one of those rows is issued as
+``... WHERE id = ? AND row_version = ?`` and bumps the version, so a write
+based on a stale read matches no row and raises ``StaleDataError`` instead of
+silently overwriting another user's change. Nothing is locked while a user is
+looking at a page, so concurrent readers never wait on each other.
+
+Views can also reject a write up front when the client says which version it
+saw (a hidden form field, ``prescription_versions``, or ``If-Match`` with the
+ASL ETag) by calling ``check_version``.
+
+Either way a JSON client gets a 409:
+    {"success": false, "error": "conflict", "message": ..., "current_version": ...}
+"""
+
+from flask import jsonify
+from sqlalchemy.orm.exc import StaleDataError
+
+from .models import db
+
+CONFLICT_MESSAGE = (
+    "This record was changed by someone else. Reload to see the latest "
+    "version and try again."
+)
+
+
+class VersionConflict(Exception):
+    """The client's copy of a row is out of date"""
+
+    def __init__(self, message=CONFLICT_MESSAGE, current_version=None):
+        super().__init__(message)
+        self.message = message
+        self.current_version = current_version
+
+
+def parse_version(value):
+    """A client-sent version as an int, or None if it's missing or garbled"""
+    try:
+        return int(str(value).strip().strip('"').rsplit("-", 1)[-1])
+    except (TypeError, ValueError):
+        return None
+
+
+def check_version(current, expected, what="record"):
+    """Raise VersionConflict unless ``expected`` is None or equals ``current``"""
+    if expected is not None and expected != current:
+        raise VersionConflict(
+            f"This {what} was changed by someone else (you had version "
+            f"{expected}, it is now {current}). Reload to see the latest "
+            "version and try again.",
+            current_version=current,
+        )
+
+
+def conflict_response(exc=None):
+    """The 409 JSON response for a VersionConflict or StaleDataError"""
+    if isinstance(exc, VersionConflict):
+        message, current_version = exc.message, exc.current_version
+    else:
+        message, current_version = CONFLICT_MESSAGE, None
+    return (
+        jsonify(
+            {
+                "success": False,
+                "error": "conflict",
+                "message": message,
+                "current_version": current_version,
+            }
+        ),
+        409,
+    )
+
+
+def init_concurrency(app):
+    """Turn conflicts that escape a view into 409s rather than 500s"""
+
+    @app.errorhandler(StaleDataError)
+    @app.errorhandler(VersionConflict)
+    def _conflict(exc):
+        db.session.rollback()
+        return conflict_response(exc)
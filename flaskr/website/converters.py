@@ -5,21 +5,48 @@ the SQLAlchemy models in models.py.
 
 from __future__ import annotations
 
+from collections import Counter, defaultdict
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import date, datetime
+from functools import lru_cache
 from typing import Any, Dict, List, Optional
+import hashlib
+import json
 import re
 
+from sqlalchemy import func, select, update
+
 from .models import (
-    db,
     Patient,
     Prescriber,
     Prescription,
     ASLStatus,
     PrescriptionStatus,
 )
+from .schema import (
+    Bool,
+    Choice,
+    Digits,
+    ListOf,
+    NotRequired,
+    Object,
+    Parsed,
+    Pattern,
+    Raw,
+    Text,
+    compile_schema,
+)
 
 DATE_FMT = "%d/%m/%Y"  # DD/MM/YYYY format
+DATETIME_FMT = "%d/%m/%Y %I:%M %p"  # DD/MM/YYYY HH:MM AM/PM
+
+# Formats accepted for consent "last updated" timestamps, most specific first
+DATETIME_INPUT_FMTS = (
+    "%d/%m/%Y %I:%M %p",
+    "%d/%m/%Y %H:%M %p",
+    "%d/%m/%Y %H:%M",
+    "%d/%m/%Y",
+)
 
 ASL_STATUS_ALLOWED = {
     "NO CONSENT": ASLStatus.NO_CONSENT,
@@ -29,241 +56,510 @@ ASL_STATUS_ALLOWED = {
     "REJECTED": ASLStatus.REJECTED,
 }
 
-TOP_LEVEL_REQUIRED = [
-    "medicare",
-    "pharmaceut-ben-entitlement-no",
-    "sfty-net-entitlement-cardholder",
-    "rpbs-ben-entitlement-cardholder",
-    "name",
-    "dob",
-    "preferred-contact",
-    "address-1",
-    "address-2",
-    "script-date",
-    "consent-status",
-    "asl-data",
-    "alr-data",
-]
-
-PRESCRIBER_REQUIRED = [
+_DATE_RE = re.compile(r"^\s*(\d{1,2})/(\d{1,2})/(\d{4})\s*$")
+
+
+class ContractValidationError(ValueError):
+    """A contract that doesn't match PT_DATA_SCHEMA.
+
+    ``errors`` lists every problem found, as (JSON path, message) pairs.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(f"{path}: {message}" for path, message in errors))
+
+
+def parse_date(value: Any) -> Optional[date]:
+    """DD/MM/YYYY string (or date) -> date; empty -> None; invalid -> ValueError"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    match = _DATE_RE.match(str(value))
+    if not match:
+        raise ValueError(f"{value!r} is not a DD/MM/YYYY date")
+    day, month, year = match.groups()
+    return date(int(year), int(month), int(day))
+
+
+def parse_datetime(value: Any) -> Optional[datetime]:
+    """DD/MM/YYYY [HH:MM [AM/PM]] string (or datetime) -> datetime"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    text = " ".join(str(value).split())
+    for fmt in DATETIME_INPUT_FMTS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"{value!r} is not a DD/MM/YYYY HH:MM date")
+
+
+def format_date(value: Optional[date]) -> Optional[str]:
+    """Presentation format for date columns (DD/MM/YYYY)"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value
+    return value.strftime(DATE_FMT)
+
+
+def format_datetime(value: Optional[datetime]) -> Optional[str]:
+    """Presentation format for datetime columns (DD/MM/YYYY HH:MM AM/PM)"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value
+    return value.strftime(DATETIME_FMT)
+
+
+# Contracts repeat the same few dates; parse each once
+_DATE = Parsed(lru_cache(maxsize=4096)(parse_date), "must be DD/MM/YYYY")
+_BOOL = Bool()
+_DIGITS = Digits()
+
+PRESCRIBER_SCHEMA = Object(
+    {
+        "fname": Raw(),
+        "lname": Raw(),
+        "title": NotRequired(Raw()),
+        "address-1": Raw(),
+        "address-2": Raw(),
+        "id": _DIGITS,
+        "hpii": Digits(length=16),
+        "hpio": Digits(length=16),
+        "phone": Text(),
+        "fax": NotRequired(Raw()),
+    }
+)
+
+_PRESCRIPTION_FIELDS = {
+    "drug-name": Raw(),
+    "drug-code": Pattern(re.compile(r"^[A-Z0-9]{4,6}$", re.I), "invalid drug-code"),
+    "dose-instr": Raw(),
+    "dose-qty": _DIGITS,
+    "dose-rpt": _DIGITS,
+    "prescribed-date": _DATE,
+    "paperless": _BOOL,
+    "brand-sub-not-prmt": _BOOL,
+    "prescriber": PRESCRIBER_SCHEMA,
+}
+
+# An ingested ASL item always starts Available; after that its status is
+# local dispensing state, so a contract's own "status" is informational only
+ASL_ITEM_SCHEMA = Object(
+    {"DSPID": Raw(), "status": NotRequired(Raw()), **_PRESCRIPTION_FIELDS}
+)
+
+ALR_ITEM_SCHEMA = Object(
+    {
+        "DSPID": NotRequired(Raw()),
+        **_PRESCRIPTION_FIELDS,
+        "dispensed-date": _DATE,
+        "remaining-repeats": Digits(minimum=1),
+    }
+)
+
+PT_DATA_SCHEMA = Object(
+    {
+        "medicare": Digits(length=11),
+        "pharmaceut-ben-entitlement-no": Raw(),
+        "sfty-net-entitlement-cardholder": _BOOL,
+        "rpbs-ben-entitlement-cardholder": _BOOL,
+        "name": Raw(),
+        "dob": _DATE,
+        "preferred-contact": _DIGITS,
+        "address-1": Raw(),
+        "address-2": Raw(),
+        "script-date": _DATE,
+        "pbs": NotRequired(Raw()),
+        "rpbs": NotRequired(Raw()),
+        "consent-status": Object(
+            {
+                "status": Choice(
+                    ASL_STATUS_ALLOWED,
+                    normalize=lambda s: s.strip().upper().replace("_", " "),
+                ),
+                "is-registered": _BOOL,
+                "last-updated": NotRequired(
+                    Parsed(
+                        parse_datetime, "must be DD/MM/YYYY HH:MM", required=False
+                    )
+                ),
+            }
+        ),
+        "asl-data": ListOf(ASL_ITEM_SCHEMA),
+        "alr-data": ListOf(ALR_ITEM_SCHEMA),
+    }
+)
+
+_validate_pt_data = compile_schema(PT_DATA_SCHEMA)
+
+
+def validate_pt_data(pt_data: Any) -> Dict[str, Any]:
+    """Check a whole contract against PT_DATA_SCHEMA in one pass.
+
+    Returns the contract with every field converted (ints, bools, dates,
+    ASLStatus); raises ContractValidationError listing all problems.
+    """
+    data, errors = _validate_pt_data(pt_data)
+    if errors:
+        raise ContractValidationError(errors)
+    return data
+
+
+def _prescriber_values(p: Dict[str, Any]) -> Dict[str, Any]:
+    """Validated contract prescriber -> Prescriber column values.
+
+    title and fax are only included when the contract has them, so an
+    existing prescriber keeps its own when they are left out.
+    """
+    values = {
+        "fname": p["fname"],
+        "lname": p["lname"],
+        "address_1": p["address-1"],
+        "address_2": p["address-2"],
+        "prescriber_id": p["id"],
+        "hpii": p["hpii"],
+        "hpio": p["hpio"],
+        "phone": p["phone"],
+    }
+    for key in ("title", "fax"):
+        if key in p:
+            values[key] = p[key]
+    return values
+
+
+_PRESCRIBER_COLUMNS = (
     "fname",
     "lname",
-    "address-1",
-    "address-2",
-    "id",
+    "title",
+    "address_1",
+    "address_2",
+    "prescriber_id",
     "hpii",
     "hpio",
     "phone",
-]
-
-ASL_ITEM_REQUIRED = [
-    "DSPID",
-    "status",
-    "drug-name",
-    "drug-code",
-    "dose-instr",
-    "dose-qty",
-    "dose-rpt",
-    "prescribed-date",
-    "paperless",
-    "brand-sub-not-prmt",
-    "prescriber",
-]
-
-ALR_ITEM_REQUIRED = [
-    "drug-name",
-    "drug-code",
-    "dose-instr",
-    "dose-qty",
-    "dose-rpt",
-    "prescribed-date",
-    "dispensed-date",
-    "paperless",
-    "brand-sub-not-prmt",
-    "remaining-repeats",
-    "prescriber",
-]
-
-_MEDICARE_RE = re.compile(r"^\d{11}$")
-_16_DIGIT_RE = re.compile(r"^\d{16}$")
-_DRUG_CODE_RE = re.compile(r"^[A-Z0-9]{4,6}$", re.I)
-
+    "fax",
+)
 
-class ContractValidationError(ValueError):
-    pass
 
+def _upsert_prescribers(session, rows):
+    """INSERT ... ON CONFLICT (prescriber_id) DO UPDATE; {prescriber_id: id}.
 
-def _require_keys(obj: Dict[str, Any], keys: List[str], where: str):
-    missing = [k for k in keys if k not in obj]
+    A prescriber inserted by a concurrent ingest since we looked is updated
+    rather than duplicated. Returns None on backends without ON CONFLICT.
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    rows = [{key: row.get(key) for key in _PRESCRIBER_COLUMNS} for row in rows]
+    statement = insert(Prescriber).values(rows)
+    excluded = statement.excluded
+    statement = statement.on_conflict_do_update(
+        index_elements=[Prescriber.prescriber_id],
+        set_={
+            key: func.coalesce(excluded[key], getattr(Prescriber, key))
+            if key in ("title", "fax")
+            else excluded[key]
+            for key in _PRESCRIBER_COLUMNS
+            if key != "prescriber_id"
+        },
+    ).returning(Prescriber.prescriber_id, Prescriber.id)
+    return dict(session.execute(statement).all())
+
+
+def resolve_prescribers(specs, session, cache=None):
+    """Row ids for contract prescribers; returns ({prescriber_id: id}, created).
+
+    ``specs`` maps prescriber_id to column values (``_prescriber_values``).
+    ``cache`` maps prescriber_id to (id, values) for prescribers already
+    resolved in this ingest, and is updated in place; pass the same dict
+    across a batch. Prescribers not in it are looked up in one query, missing
+    ones are upserted in one statement, and known ones are only updated when
+    the contract changes their details.
+    """
+    cache = {} if cache is None else cache
+    unknown = [pid for pid in specs if pid not in cache]
+    if unknown:
+        columns = [getattr(Prescriber, key) for key in _PRESCRIBER_COLUMNS]
+        for row in session.execute(
+            select(Prescriber.id, *columns).where(
+                Prescriber.prescriber_id.in_(unknown)
+            )
+        ):
+            cache[row.prescriber_id] = (
+                row.id,
+                {key: getattr(row, key) for key in _PRESCRIBER_COLUMNS},
+            )
+
+    missing = [specs[pid] for pid in specs if pid not in cache]
     if missing:
-        raise ContractValidationError(f"Missing {missing} in {where}")
-
-
-def _to_bool(val: Any) -> bool:
-    if isinstance(val, bool):
-        return val
-    if isinstance(val, str):
-        if val.strip().lower() in {"true", "1", "yes", "y"}:
-            return True
-        if val.strip().lower() in {"false", "0", "no", "n"}:
-            return False
-    if isinstance(val, (int, float)):
-        return bool(val)
-    raise ContractValidationError(f"Cannot convert {val!r} to bool")
-
-
-def _digits_only_int(val: Any, digits: int | None = None, field="") -> int:
-    s = re.sub(r"\D", "", str(val))
-    if not s:
-        raise ContractValidationError(f"{field or 'value'} must be numeric")
-    if digits and len(s) != digits:
-        raise ContractValidationError(f"{field} must be {digits} digits")
-    return int(s)
-
-
-def _validate_date(s: Any, field: str) -> str:
-    try:
-        datetime.strptime(str(s), DATE_FMT)
-        return str(s)
-    except Exception:
-        raise ContractValidationError(f"{field} must be DD/MM/YYYY")
-
-
-def _validate_drug_code(code: Any) -> str:
-    c = str(code)
-    if not _DRUG_CODE_RE.match(c):
-        raise ContractValidationError(f"Invalid drug-code: {code}")
-    return c
-
-
-def _asl_status_from_str(status: str) -> ASLStatus:
-    key = status.strip().upper().replace("_", " ")
-    if key not in ASL_STATUS_ALLOWED:
-        raise ContractValidationError(f"Invalid ASL status {status}")
-    return ASL_STATUS_ALLOWED[key]
-
-
-def _get_or_create_prescriber(p: Dict[str, Any]) -> Prescriber:
-    _require_keys(p, PRESCRIBER_REQUIRED, where="prescriber")
-    pid = _digits_only_int(p["id"], field="prescriber.id")
-    existing = Prescriber.query.filter_by(prescriber_id=pid).first()
-    if existing:
-        existing.fname = p.get("fname", existing.fname)
-        existing.lname = p.get("lname", existing.lname)
-        existing.title = p.get("title", existing.title)
-        existing.address_1 = p.get("address-1", existing.address_1)
-        existing.address_2 = p.get("address-2", existing.address_2)
-        existing.hpii = _digits_only_int(p["hpii"], digits=16, field="hpii")
-        existing.hpio = _digits_only_int(p["hpio"], digits=16, field="hpio")
-        existing.phone = str(p["phone"])
-        existing.fax = p.get("fax", existing.fax)
-        return existing
-    prescriber = Prescriber(
-        fname=p["fname"],
-        lname=p["lname"],
-        title=p.get("title"),
-        address_1=p["address-1"],
-        address_2=p["address-2"],
-        prescriber_id=pid,
-        hpii=_digits_only_int(p["hpii"], digits=16, field="hpii"),
-        hpio=_digits_only_int(p["hpio"], digits=16, field="hpio"),
-        phone=str(p["phone"]),
-        fax=p.get("fax"),
-    )
-    db.session.add(prescriber)
-    return prescriber
+        ids = _upsert_prescribers(session, missing)
+        if ids is None:
+            created = [Prescriber(**values) for values in missing]
+            session.add_all(created)
+            session.flush()
+            ids = {p.prescriber_id: p.id for p in created}
+        for values in missing:
+            full = {key: values.get(key) for key in _PRESCRIBER_COLUMNS}
+            cache[values["prescriber_id"]] = (ids[values["prescriber_id"]], full)
+
+    # Rows needing the same change share one UPDATE
+    changes = {}
+    for pid, values in specs.items():
+        row_id, known = cache[pid]
+        changed = {k: v for k, v in values.items() if known.get(k) != v}
+        if changed:
+            changes.setdefault(tuple(sorted(changed.items())), []).append(row_id)
+            known.update(changed)
+    for changed, row_ids in changes.items():
+        # An ORM UPDATE, so the ASL cache versions of their patients move on
+        session.execute(
+            update(Prescriber).where(Prescriber.id.in_(row_ids)).values(dict(changed))
+        )
+    return {pid: cache[pid][0] for pid in specs}, len(missing)
 
 
 @dataclass
 class IngestResult:
     patient: Patient
-    prescribers: List[Prescriber]
+    prescriber_ids: List[int]
     prescriptions: List[Prescription]
     created_prescribers: int
     created_prescriptions: int
     is_new_patient: bool
-
-
-def _build_patient(contract: Dict[str, Any]) -> Patient:
-    _require_keys(contract, TOP_LEVEL_REQUIRED, where="pt_data")
-    patient = Patient(
-        medicare=_digits_only_int(contract["medicare"], digits=11, field="medicare"),
-        pharmaceut_ben_entitlement_no=contract["pharmaceut-ben-entitlement-no"],
-        sfty_net_entitlement_cardholder=_to_bool(
-            contract["sfty-net-entitlement-cardholder"]
-        ),
-        rpbs_ben_entitlement_cardholder=_to_bool(
-            contract["rpbs-ben-entitlement-cardholder"]
+    updated_prescriptions: int = 0
+    retired_prescriptions: int = 0
+    # The same contract as last time; nothing was written
+    unchanged: bool = False
+
+
+def _build_patient(data: Dict[str, Any]) -> Patient:
+    """Patient from a validated contract (see validate_pt_data)"""
+    consent = data["consent-status"]
+    return Patient(
+        medicare=data["medicare"],
+        pharmaceut_ben_entitlement_no=data["pharmaceut-ben-entitlement-no"],
+        sfty_net_entitlement_cardholder=data["sfty-net-entitlement-cardholder"],
+        rpbs_ben_entitlement_cardholder=data["rpbs-ben-entitlement-cardholder"],
+        name=data["name"],
+        dob=data["dob"],
+        preferred_contact=data["preferred-contact"],
+        # Patient keeps a single address line; the contract splits it in two
+        address=", ".join(
+            part for part in (data["address-1"], data["address-2"]) if part
         ),
-        name=contract["name"],
-        dob=_validate_date(contract["dob"], field="dob"),
-        preferred_contact=_digits_only_int(
-            contract["preferred-contact"], field="preferred-contact"
-        ),
-        address_1=contract["address-1"],
-        address_2=contract["address-2"],
-        script_date=_validate_date(contract["script-date"], field="script-date"),
-        pbs=contract.get("pbs"),
-        rpbs=contract.get("rpbs"),
-        asl_status=_asl_status_from_str(contract["consent-status"]["status"]).value,
-        is_registered=_to_bool(contract["consent-status"]["is-registered"]),
+        script_date=data["script-date"],
+        pbs=data.get("pbs"),
+        rpbs=data.get("rpbs"),
+        asl_status=consent["status"].value,
+        is_registered=consent["is-registered"],
+        consent_last_updated=consent.get("last-updated"),
     )
-    if contract["consent-status"].get("last-updated"):
-        patient.consent_last_updated = str(contract["consent-status"]["last-updated"])
-    return patient
 
 
-def _build_prescription_from_asl(item, patient, prescriber):
-    _require_keys(item, ASL_ITEM_REQUIRED, where="asl-data item")
+def _build_prescription_from_asl(item, patient, prescriber_id):
     return Prescription(
         patient=patient,
-        prescriber=prescriber,
-        DSPID=item.get("DSPID"),
+        prescriber_id=prescriber_id,
+        DSPID=item["DSPID"],
         status=PrescriptionStatus.AVAILABLE.value,
         drug_name=item["drug-name"],
-        drug_code=_validate_drug_code(item["drug-code"]),
+        drug_code=item["drug-code"],
         dose_instr=item["dose-instr"],
-        dose_qty=_digits_only_int(item["dose-qty"], field="dose-qty"),
-        dose_rpt=_digits_only_int(item["dose-rpt"], field="dose-rpt"),
-        prescribed_date=_validate_date(
-            item["prescribed-date"], field="prescribed-date"
-        ),
-        paperless=_to_bool(item["paperless"]),
-        brand_sub_not_prmt=_to_bool(item["brand-sub-not-prmt"]),
+        dose_qty=item["dose-qty"],
+        dose_rpt=item["dose-rpt"],
+        prescribed_date=item["prescribed-date"],
+        paperless=item["paperless"],
+        brand_sub_not_prmt=item["brand-sub-not-prmt"],
     )
 
 
-def _build_prescription_from_alr(item, patient, prescriber):
-    _require_keys(item, ALR_ITEM_REQUIRED, where="alr-data item")
-    remaining = _digits_only_int(item["remaining-repeats"], field="remaining-repeats")
-    if remaining <= 0:
-        raise ContractValidationError("remaining-repeats must be > 0")
+def _build_prescription_from_alr(item, patient, prescriber_id):
     return Prescription(
         patient=patient,
-        prescriber=prescriber,
+        prescriber_id=prescriber_id,
         DSPID=item.get("DSPID"),
         status=PrescriptionStatus.DISPENSED.value,
         drug_name=item["drug-name"],
-        drug_code=_validate_drug_code(item["drug-code"]),
+        drug_code=item["drug-code"],
         dose_instr=item["dose-instr"],
-        dose_qty=_digits_only_int(item["dose-qty"], field="dose-qty"),
-        dose_rpt=_digits_only_int(item["dose-rpt"], field="dose-rpt"),
-        prescribed_date=_validate_date(
-            item["prescribed-date"], field="prescribed-date"
-        ),
-        dispensed_date=_validate_date(item["dispensed-date"], field="dispensed-date"),
-        paperless=_to_bool(item["paperless"]),
-        brand_sub_not_prmt=_to_bool(item["brand-sub-not-prmt"]),
-        remaining_repeats=remaining,
+        dose_qty=item["dose-qty"],
+        dose_rpt=item["dose-rpt"],
+        prescribed_date=item["prescribed-date"],
+        dispensed_date=item["dispensed-date"],
+        paperless=item["paperless"],
+        brand_sub_not_prmt=item["brand-sub-not-prmt"],
+        remaining_repeats=item["remaining-repeats"],
         dispensed_at_this_pharmacy=True,
     )
 
 
+def _content_hash(value) -> str:
+    """sha256 of a validated contract (or part of one) in canonical JSON.
+
+    Hashing the converted values means formatting alone ("0400 000 000" vs
+    "0400000000", "true" vs true) doesn't count as a change.
+    """
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _contract_items(data):
+    """(kind, contract_key, content hash, item) for each ASL/ALR item.
+
+    An item is identified by its list, drug code, prescribed date and
+    prescriber, numbered when a contract repeats the same combination.
+    """
+    seen = Counter()
+    for kind in ("asl", "alr"):
+        for item in data[f"{kind}-data"]:
+            identity = (
+                kind,
+                item["drug-code"],
+                item["prescribed-date"].isoformat(),
+                item["prescriber"]["id"],
+            )
+            seen[identity] += 1
+            key = ":".join(map(str, (*identity, seen[identity])))
+            content = dict(item, prescriber=item["prescriber"]["id"])
+            yield kind, key, _content_hash(content), item
+
+
+_BUILDERS = {
+    "asl": _build_prescription_from_asl,
+    "alr": _build_prescription_from_alr,
+}
+
+# The prescription's own columns, which a changed contract item overwrites.
+# Dispensing state (status, dose_rpt, remaining_repeats, dispensed_date,
+# dispensed_at_this_pharmacy) is only seeded when the row is created; after
+# that it belongs to local dispensing.
+_CONTRACT_COLUMNS = (
+    "DSPID",
+    "drug_name",
+    "drug_code",
+    "dose_instr",
+    "dose_qty",
+    "prescribed_date",
+    "paperless",
+    "brand_sub_not_prmt",
+    "prescriber_id",
+)
+
+
+def _apply_item(row, kind, item, prescriber_id):
+    """Copy the contract columns of ``item`` onto ``row``; True if any differed.
+
+    A row the contract had retired is brought back with the status its
+    dispensing state implies: fully dispensed once no repeats are left.
+    """
+    fresh = _BUILDERS[kind](item, None, prescriber_id)
+    changed = False
+    for column in _CONTRACT_COLUMNS:
+        value = getattr(fresh, column)
+        if getattr(row, column) != value:
+            setattr(row, column, value)
+            changed = True
+    if row.status == PrescriptionStatus.CANCELLED.value:
+        row.status = (
+            PrescriptionStatus.DISPENSED.value
+            if row.remaining_repeats == 0
+            else fresh.status
+        )
+        changed = True
+    return changed
+
+
+def _sync_prescriptions(data, patient, is_new, prescriber_ids, session):
+    """Bring the patient's contract prescriptions in line with ``data``.
+
+    Returns (created, updated, retired) lists. Items new to the contract are
+    inserted, items whose content changed have their _CONTRACT_COLUMNS updated
+    in place (dispensing state is left as it is), and items the contract no
+    longer lists are retired (CANCELLED, so their dispensing history stays).
+    Prescriptions that didn't come from a contract are left alone, except
+    that one ingested before contracts were tracked is adopted by the matching
+    item rather than duplicated.
+    """
+    tracked, untracked = {}, defaultdict(list)
+    if not is_new:
+        for row in session.execute(
+            select(Prescription).where(Prescription.patient_id == patient.id)
+        ).scalars():
+            if row.contract_key is not None:
+                tracked[row.contract_key] = row
+            elif row.status != PrescriptionStatus.CANCELLED.value:
+                untracked[
+                    (row.DSPID, row.drug_code, row.prescribed_date, row.prescriber_id)
+                ].append(row)
+
+    created, updated = [], []
+    for kind, key, content_hash, item in _contract_items(data):
+        prescriber_id = prescriber_ids[item["prescriber"]["id"]]
+        row = tracked.pop(key, None)
+        if row is None:
+            matches = untracked.get(
+                (
+                    item.get("DSPID"),
+                    item["drug-code"],
+                    item["prescribed-date"],
+                    prescriber_id,
+                )
+            )
+            if matches:
+                row = matches.pop(0)
+                row.contract_key, row.contract_hash = key, content_hash
+                if _apply_item(row, kind, item, prescriber_id):
+                    updated.append(row)
+                continue
+            row = _BUILDERS[kind](item, patient, prescriber_id)
+            row.contract_key, row.contract_hash = key, content_hash
+            session.add(row)
+            created.append(row)
+        elif (
+            row.contract_hash != content_hash
+            or row.status == PrescriptionStatus.CANCELLED.value
+        ):
+            if _apply_item(row, kind, item, prescriber_id):
+                updated.append(row)
+            row.contract_hash = content_hash
+
+    retired = [
+        row
+        for row in tracked.values()
+        if row.status != PrescriptionStatus.CANCELLED.value
+    ]
+    for row in retired:
+        row.status = PrescriptionStatus.CANCELLED.value
+    return created, updated, retired
+
+
 def ingest_pt_data_contract(
-    pt_data: Dict[str, Any], session, commit=False, overwrite_patient=False
+    pt_data: Dict[str, Any],
+    session,
+    commit=False,
+    overwrite_patient=False,
+    prescriber_cache=None,
 ) -> IngestResult:
-    patient_tmp = _build_patient(pt_data)
+    data = validate_pt_data(pt_data)
+    content_hash = _content_hash(data)
+    patient_tmp = _build_patient(data)
     existing = Patient.query.filter_by(medicare=patient_tmp.medicare).first()
+    if existing is not None and existing.contract_hash == content_hash:
+        return IngestResult(existing, [], [], 0, 0, False, unchanged=True)
     is_new = existing is None
     patient = patient_tmp if is_new else existing
     if not is_new and overwrite_patient:
@@ -274,8 +570,7 @@ def ingest_pt_data_contract(
             "name",
             "dob",
             "preferred_contact",
-            "address_1",
-            "address_2",
+            "address",
             "script_date",
             "pbs",
             "rpbs",
@@ -286,35 +581,35 @@ def ingest_pt_data_contract(
             setattr(patient, field, getattr(patient_tmp, field))
     if is_new:
         session.add(patient)
-    prescribers, prescriptions = [], []
-    created_prescribers = 0
-
-    def prescriber_for(item):
-        nonlocal created_prescribers
-        pr = _get_or_create_prescriber(item["prescriber"])
-        if pr not in prescribers:
-            prescribers.append(pr)
-            if pr.id is None:
-                created_prescribers += 1
-        return pr
-
-    for item in pt_data.get("asl-data", []) or []:
-        p = _build_prescription_from_asl(item, patient, prescriber_for(item))
-        session.add(p)
-        prescriptions.append(p)
-    for item in pt_data.get("alr-data", []) or []:
-        p = _build_prescription_from_alr(item, patient, prescriber_for(item))
-        session.add(p)
-        prescriptions.append(p)
+    asl_items = data["asl-data"]
+    alr_items = data["alr-data"]
+
+    # Every prescriber in the contract is resolved up front, in one query
+    specs = {}
+    for item in (*asl_items, *alr_items):
+        values = _prescriber_values(item["prescriber"])
+        specs.setdefault(values["prescriber_id"], {}).update(values)
+    prescriber_ids, created_prescribers = resolve_prescribers(
+        specs, session, cache=prescriber_cache
+    )
+
+    created, updated, retired = _sync_prescriptions(
+        data, patient, is_new, prescriber_ids, session
+    )
+    # The hash stands for the whole contract, so it only holds once the
+    # patient's own fields have been written from it too
+    patient.contract_hash = content_hash if is_new or overwrite_patient else None
     if commit:
         session.commit()
     else:
         session.flush()
     return IngestResult(
         patient,
-        prescribers,
-        prescriptions,
+        list(prescriber_ids.values()),
+        created + updated,
         created_prescribers,
-        len(prescriptions),
+        len(created),
         is_new,
+        updated_prescriptions=len(updated),
+        retired_prescriptions=len(retired),
     )
@@ -0,0 +1,178 @@
+"""
+Dispensing: the conditional UPDATE that dispenses a repeat, and the
+append-only ``DispenseEvent`` ledger written alongside it.
+
+Every dispense inserts one event per prescription recording who dispensed it,
+their notes, and the prescription's repeats/status before and after. The
+ledger is never updated or deleted through the ORM (only unlinked from rows
+that are deleted, or removed with its patient). Per-patient and
+per-prescription history are keyset-paginated index reads (``history_page``)
+rather than scans over prescriptions.
+"""
+
+from sqlalchemy import case, delete, event, func, select, update
+
+from .models import DispenseEvent, Prescription, PrescriptionStatus, db
+
+
+def _as_int(value):
+    try:
+        return int(value or 0)
+    except (ValueError, TypeError):
+        return 0
+
+
+def next_state(remaining_repeats, dose_rpt, status):
+    """(remaining_repeats, dose_rpt, status) after dispensing one repeat.
+
+    The Python twin of the SET clause in ``dispense_statement``.
+    """
+    remaining = _as_int(dose_rpt if remaining_repeats is None else remaining_repeats)
+    dose_rpt = _as_int(dose_rpt)
+    return (
+        remaining - 1 if remaining > 0 else 0,
+        dose_rpt - 1 if dose_rpt > 0 else dose_rpt,
+        PrescriptionStatus.DISPENSED.value if remaining <= 1 else status,
+    )
+
+
+def dispense_statement(prescriptions, dispensed_date):
+    """One UPDATE that dispenses ``prescriptions`` once each.
+
+    The decrement is computed in SQL from the row's current values, so it can
+    never go below zero, and each row only matches while it is not fully
+    dispensed and still at the row_version it was read at. A rowcount short of
+    len(prescriptions) therefore means another request got there first.
+    """
+    remaining = func.coalesce(
+        Prescription.remaining_repeats, Prescription.dose_rpt, 0
+    )
+    return (
+        update(Prescription)
+        .where(
+            Prescription.id.in_([p.id for p in prescriptions]),
+            Prescription.status != PrescriptionStatus.DISPENSED.value,
+            Prescription.row_version
+            == case(
+                {p.id: p.row_version for p in prescriptions}, value=Prescription.id
+            ),
+        )
+        .values(
+            remaining_repeats=case((remaining > 0, remaining - 1), else_=0),
+            # dose_rpt is what the ASL shows as repeats left
+            dose_rpt=case(
+                (Prescription.dose_rpt > 0, Prescription.dose_rpt - 1),
+                else_=Prescription.dose_rpt,
+            ),
+            # Last repeat used -> fully dispensed
+            status=case(
+                (remaining <= 1, PrescriptionStatus.DISPENSED.value),
+                else_=Prescription.status,
+            ),
+            dispensed_date=dispensed_date,
+            dispensed_at_this_pharmacy=True,
+            # Core UPDATEs skip version_id_col; bump it by hand
+            row_version=Prescription.row_version + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def record_dispenses(
+    prescriptions, dispensed_date, dispensed_by, dispensing_notes, user_id=None
+):
+    """Add a ledger event per prescription, from the rows as read.
+
+    Call before ``dispense_statement`` and roll back if it doesn't match every
+    row; its row_version guard then guarantees the recorded before-values are
+    exactly what it updated.
+    """
+    events = []
+    for prescription in prescriptions:
+        repeats_after, dose_rpt_after, status_after = next_state(
+            prescription.remaining_repeats, prescription.dose_rpt, prescription.status
+        )
+        events.append(
+            DispenseEvent(
+                patient_id=prescription.patient_id,
+                prescription_id=prescription.id,
+                user_id=user_id,
+                drug_name=prescription.drug_name,
+                dispensed_by=dispensed_by,
+                dispensing_notes=dispensing_notes or None,
+                dispensed_date=dispensed_date,
+                repeats_before=prescription.remaining_repeats,
+                repeats_after=repeats_after,
+                dose_rpt_before=prescription.dose_rpt,
+                dose_rpt_after=dose_rpt_after,
+                status_after=status_after,
+            )
+        )
+    db.session.add_all(events)
+    return events
+
+
+def history_page(patient_id, before=None, limit=50, prescription_id=None):
+    """(events newest first, cursor for the next page or None).
+
+    Keyset pagination on id: pass the returned cursor as ``before`` to get the
+    next (older) page. Each page is one range read of the ledger indexes.
+    """
+    query = select(DispenseEvent).where(DispenseEvent.patient_id == patient_id)
+    if prescription_id is not None:
+        query = query.where(DispenseEvent.prescription_id == prescription_id)
+    if before is not None:
+        query = query.where(DispenseEvent.id < before)
+    events = (
+        db.session.execute(query.order_by(DispenseEvent.id.desc()).limit(limit + 1))
+        .scalars()
+        .all()
+    )
+    if len(events) > limit:
+        return events[:limit], events[limit - 1].id
+    return events, None
+
+
+def detach_prescriptions(patient_id):
+    """Unlink the patient's events before its prescriptions are bulk-deleted.
+
+    ``ondelete="SET NULL"`` isn't enforced on SQLite, which runs without
+    ``foreign_keys`` and reuses the ids of deleted rows; a new prescription
+    would otherwise inherit the old one's history. The events themselves stay.
+    """
+    db.session.execute(
+        update(DispenseEvent)
+        .where(
+            DispenseEvent.patient_id == patient_id,
+            DispenseEvent.prescription_id.is_not(None),
+        )
+        .values(prescription_id=None)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def delete_patient_events(patient_id):
+    """Remove a patient's events along with the patient (its id can be reused)"""
+    db.session.execute(
+        delete(DispenseEvent)
+        .where(DispenseEvent.patient_id == patient_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def detach_user(user_id):
+    """Keep a deleted user's events, without pointing at whoever gets the id next"""
+    db.session.execute(
+        update(DispenseEvent)
+        .where(DispenseEvent.user_id == user_id)
+        .values(user_id=None)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _append_only(mapper, connection, target):
+    raise ValueError("dispense_events is append-only")
+
+
+event.listen(DispenseEvent, "before_update", _append_only)
+event.listen(DispenseEvent, "before_delete", _append_only)
@@ -0,0 +1,406 @@
+"""
+Batch ingest of pt_data contracts.
+
+``POST /asl/ingest/batch`` takes newline-delimited JSON (one contract per
+line) and reads it line by line as it arrives, so the body is never held in
+memory whole. Each contract goes through ``ingest_pt_data_contract`` inside
+its own SAVEPOINT: a contract that fails validation or a constraint is
+rolled back on its own and reported, and the rest of the batch carries on.
+Prescribers are resolved once per batch, not once per contract.
+
+Work is committed every ``INGEST_CHUNK_SIZE`` (100) records rather than
+once per contract. If a chunk's commit fails, every contract in that chunk
+is reported as failed; earlier chunks stay committed. ``ingest_contracts``
+is the same loop for any source of contracts (see patient_import.py).
+
+``POST /asl/ingest/jobs`` ingests a single contract in the background
+instead: the request only validates it, stores it on a queued ``IngestJob``
+row and answers 202 with the job id. The ``ingest_jobs`` table is the queue:
+``INGEST_WORKERS`` (2) threads per process claim the oldest queued job, so a
+job outlives the process that accepted it. When ``INGEST_QUEUE_SIZE`` (100)
+contracts are already waiting the request is turned away with 503 and
+Retry-After, so a burst from upstream backs off instead of piling up behind
+student traffic. A job still running after ``INGEST_JOB_TIMEOUT`` (600s) lost
+its worker and is marked failed.
+"""
+
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, select, update
+
+from .converters import ingest_pt_data_contract
+from .database import begin_write
+from .models import IngestJob, db
+
+
+def ingest_summary(result):
+    """What an ingest did, as reported to the caller"""
+    return {
+        "patient_id": result.patient.id,
+        "created_prescriptions": result.created_prescriptions,
+        "updated_prescriptions": result.updated_prescriptions,
+        "retired_prescriptions": result.retired_prescriptions,
+        "unchanged": result.unchanged,
+        "is_new_patient": result.is_new_patient,
+    }
+
+
+def error_details(errors):
+    return [{"path": p, "message": m} for p, m in errors]
+
+
+def _success(line, result):
+    return {"line": line, "status": "success", **ingest_summary(result)}
+
+
+def _error(line, message, errors=None):
+    result = {"line": line, "status": "error", "message": message}
+    if errors:
+        result["errors"] = error_details(errors)
+    return result
+
+
+def ingest_contracts(records, session, chunk_size=100, overwrite_patient=False):
+    """Ingest ``(line, contract, problem)`` records, yielding one result each.
+
+    A record with a ``problem`` (a message) is reported as an error without
+    being ingested. Results are yielded once their chunk is committed, so at
+    most ``chunk_size`` of them are held at a time; each is a dict with the
+    record's ``line``, a ``status`` of "success" or "error", and either the
+    ingest outcome or an error ``message``.
+    """
+    # Results since the last commit, and the successes among them (indexes)
+    buffered, pending = [], []
+    # Prescribers resolved so far (see converters.resolve_prescribers); it
+    # only describes rows as of our own writes, so drop it after any rollback
+    prescribers = {}
+
+    def commit_chunk():
+        nonlocal chunk_open
+        chunk_open = False
+        try:
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            prescribers.clear()
+            for index in pending:
+                buffered[index] = _error(
+                    buffered[index]["line"], f"Batch chunk was rolled back: {e}"
+                )
+        pending.clear()
+
+    # Savepoints need a transaction opened by begin_write on SQLite, and that
+    # is decided when it begins; this is whether the open one is
+    chunk_open = False
+
+    def begin_chunk():
+        nonlocal chunk_open
+        if not chunk_open:
+            session.commit()  # whatever the caller had open
+            begin_write(session)
+            chunk_open = True
+
+    for line, contract, problem in records:
+        if problem is not None:
+            result = _error(line, problem)
+        else:
+            try:
+                begin_chunk()
+                with session.begin_nested():
+                    result = _success(
+                        line,
+                        ingest_pt_data_contract(
+                            contract,
+                            session,
+                            commit=False,
+                            overwrite_patient=overwrite_patient,
+                            prescriber_cache=prescribers,
+                        ),
+                    )
+                pending.append(len(buffered))
+            except Exception as e:
+                prescribers.clear()
+                result = _error(line, str(e), getattr(e, "errors", None))
+
+        if not pending:
+            # Nothing waiting on a commit: an error can go straight out
+            yield from buffered
+            yield result
+            buffered.clear()
+            continue
+        buffered.append(result)
+        if len(buffered) >= chunk_size:
+            commit_chunk()
+            yield from buffered
+            buffered.clear()
+
+    if pending:
+        commit_chunk()
+    yield from buffered
+
+
+def _ndjson_records(lines):
+    for number, raw in enumerate(lines, 1):
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8-sig" if number == 1 else "utf-8", "replace")
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            contract = json.loads(raw)
+        except ValueError as e:
+            yield number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(contract, dict):
+            yield number, None, "Each line must be a JSON object"
+            continue
+        yield number, contract, None
+
+
+def ingest_ndjson(lines, session, chunk_size=100):
+    """Ingest one contract per line of ``lines``; return one result per record.
+
+    Blank lines are skipped; results are as for ``ingest_contracts``.
+    """
+    return list(ingest_contracts(_ndjson_records(lines), session, chunk_size))
+
+
+class IngestWorkers:
+    """The threads that claim queued IngestJob rows and ingest them.
+
+    Workers are started on demand (see ``start``) and stop once no queued job
+    is left, so processes that never ingest (the CLI, the gunicorn master)
+    have none.
+    """
+
+    def __init__(self, workers=2):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self._threads = []
+        self._wanted = False
+
+    def _check_fork(self):
+        # Threads don't survive a fork: a gunicorn worker starts its own
+        if os.getpid() != self.pid:
+            self._reset()
+
+    def configure(self, workers):
+        with self._lock:
+            self.workers = max(workers, 1)
+
+    def start(self, app):
+        """Make sure this process is working through the queued jobs"""
+        with self._lock:
+            self._check_fork()
+            # A worker about to stop for lack of jobs takes another look
+            self._wanted = True
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._work,
+                    args=(app,),
+                    name=f"ingest-worker-{len(self._threads) + 1}",
+                    daemon=True,
+                )
+                self._threads.append(thread)
+                thread.start()
+
+    def _work(self, app):
+        while True:
+            try:
+                job_id = claim_job(app)
+            except Exception:
+                app.logger.exception("Could not claim an ingest job")
+                job_id = None
+            if job_id is None:
+                with self._lock:
+                    if not self._wanted:
+                        self._threads.remove(threading.current_thread())
+                        return
+                    self._wanted = False
+                continue
+            try:
+                run_job(app, job_id)
+            except Exception:
+                app.logger.exception("Ingest job %s could not be recorded", job_id)
+
+
+ingest_jobs = IngestWorkers()
+
+
+def _queued_contracts():
+    return select(IngestJob).where(
+        IngestJob.kind == "contract", IngestJob.state == "queued"
+    )
+
+
+def submit_job(contract):
+    """Record ``contract`` as a queued IngestJob and wake this process's workers.
+
+    Returns the job id, or None when INGEST_QUEUE_SIZE jobs are already
+    waiting (nothing is recorded).
+    """
+    waiting = db.session.execute(
+        select(func.count()).select_from(_queued_contracts().subquery())
+    ).scalar()
+    if waiting >= current_app.config["INGEST_QUEUE_SIZE"]:
+        return None
+    job = IngestJob(id=uuid.uuid4().hex, state="queued", contract=contract)
+    db.session.add(job)
+    db.session.commit()
+    ingest_jobs.start(current_app._get_current_object())
+    return job.id
+
+
+def fail_stale_jobs(session, timeout, job_id=None):
+    """Fail running contract jobs whose worker has gone for ``timeout`` seconds.
+
+    A worker that dies mid-ingest (a restart, a crash) leaves its job
+    running; its ingest never committed, so the job is marked failed.
+    """
+    now = datetime.now()
+    stale = update(IngestJob).where(
+        IngestJob.kind == "contract",
+        IngestJob.state == "running",
+        IngestJob.started_at < now - timedelta(seconds=timeout),
+    )
+    if job_id is not None:
+        stale = stale.where(IngestJob.id == job_id)
+    session.execute(
+        stale.values(
+            state="failed",
+            contract=None,
+            finished_at=now,
+            result={"message": "The ingest worker stopped before finishing"},
+        ).execution_options(synchronize_session=False)
+    )
+
+
+def claim_job(app):
+    """Mark the oldest queued contract job running; its id, or None if none wait"""
+    with app.app_context():
+        session = db.session
+        # Workers claim side by side, so every transaction takes the write
+        # lock up front (see database.begin_write)
+        begin_write(session)
+        fail_stale_jobs(session, app.config["INGEST_JOB_TIMEOUT"])
+        job = session.execute(
+            _queued_contracts()
+            .order_by(IngestJob.submitted_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar()
+        if job is None:
+            session.commit()
+            return None
+        job.state = "running"
+        job.started_at = datetime.now()
+        session.commit()
+        return job.id
+
+
+def finish_job(job, state, outcome, ttl):
+    """Record a job's outcome and purge jobs older than ``ttl`` seconds.
+
+    Jobs that never finished are purged by when they were submitted.
+    """
+    job.state = state
+    job.result = outcome
+    job.contract = None
+    job.finished_at = datetime.now()
+    cutoff = job.finished_at - timedelta(seconds=ttl)
+    db.session.execute(
+        delete(IngestJob).where(
+            func.coalesce(IngestJob.finished_at, IngestJob.submitted_at) < cutoff
+        )
+    )
+
+
+def run_job(app, job_id):
+    """Ingest a claimed job's contract, recording the outcome on its row.
+
+    A successful ingest commits together with its job's outcome; a failed one
+    is rolled back and the failure recorded in a transaction of its own.
+    """
+    with app.app_context():
+        session = db.session
+        ttl = app.config["INGEST_JOB_TTL"]
+        try:
+            begin_write(session)
+            job = session.get(IngestJob, job_id)
+            if job is None:
+                session.rollback()
+                return
+            if job.contract is None:
+                raise ValueError("The contract for this job was lost")
+            result = ingest_pt_data_contract(job.contract, session)
+            finish_job(job, "succeeded", ingest_summary(result), ttl)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            outcome = {"message": str(e)}
+            if getattr(e, "errors", None):
+                outcome["errors"] = error_details(e.errors)
+            begin_write(session)
+            job = session.get(IngestJob, job_id)
+            if job is None:
+                session.rollback()
+                return
+            finish_job(job, "failed", outcome, ttl)
+            session.commit()
+
+
+def poll_job(job_id):
+    """The contract job ``job_id`` as it stands, or None if there isn't one.
+
+    A job found queued makes sure this process is working on the queue (its
+    own worker may have restarted since); one whose worker has gone is
+    failed first.
+    """
+    job = db.session.get(IngestJob, job_id)
+    if job is None or job.kind != "contract":
+        return None
+    if job.state == "running":
+        fail_stale_jobs(
+            db.session, current_app.config["INGEST_JOB_TIMEOUT"], job_id=job_id
+        )
+        db.session.commit()
+        job = db.session.get(IngestJob, job_id)
+    elif job.state == "queued":
+        ingest_jobs.start(current_app._get_current_object())
+    return job
+
+
+def job_status(job):
+    """An IngestJob as the status endpoint reports it"""
+    return {
+        "job_id": job.id,
+        "state": job.state,
+        "submitted_at": job.submitted_at and job.submitted_at.isoformat(),
+        "started_at": job.started_at and job.started_at.isoformat(),
+        "finished_at": job.finished_at and job.finished_at.isoformat(),
+        "result": job.result,
+    }
+
+
+def init_ingest(app):
+    """Batch and background ingest settings from the environment"""
+    for key, default in (
+        ("INGEST_CHUNK_SIZE", 100),
+        ("INGEST_WORKERS", 2),
+        ("INGEST_QUEUE_SIZE", 100),
+        ("INGEST_RETRY_AFTER", 5),
+        ("INGEST_JOB_TTL", 86400),
+        ("INGEST_JOB_TIMEOUT", 600),
+    ):
+        app.config.setdefault(key, int(os.environ.get(key) or default))
+    ingest_jobs.configure(app.config["INGEST_WORKERS"])
+    app.extensions["ingest_jobs"] = ingest_jobs
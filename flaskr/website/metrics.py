@@ -0,0 +1,342 @@
+"""
+Prometheus-style request metrics.
+
+Records, per Flask endpoint (``views.asl``, ``auth.login``, ``admin.admin_dashboard`` ...):
+
+* ``http_requests_total`` by method and status
+* ``http_request_duration_seconds`` latency histogram
+* ``http_requests_in_progress`` gauge
+* ``http_request_db_seconds`` / ``http_request_db_queries_total`` from the
+  per-request SQL stats (see query_stats.py)
+* ``template_render_duration_seconds`` per template
+* ``asl_view_cache_*`` hit/miss/invalidation counters (see asl_cache.py)
+
+and renders them in the Prometheus text exposition format.
+
+Multiple worker processes (gunicorn) each keep their own registry and write a
+snapshot to ``METRICS_DIR`` (``metrics_<pid>.json``) at most every
+``METRICS_FLUSH_INTERVAL`` seconds. A scrape merges every snapshot: counters
+and histograms are summed over all processes that ever wrote one, gauges only
+over processes that are still alive. Without ``METRICS_DIR`` only the serving
+process is reported. The directory should be emptied when the server starts
+(gunicorn.conf.py does this).
+"""
+
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+
+from flask import (
+    before_render_template,
+    current_app,
+    g,
+    has_request_context,
+    request,
+    template_rendered,
+)
+
+from .query_stats import current_query_stats
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0
+)
+
+# name -> (type, help)
+METRICS = {
+    "http_requests_total": (
+        "counter",
+        "HTTP requests by endpoint, method and status code.",
+    ),
+    "http_request_duration_seconds": (
+        "histogram",
+        "HTTP request latency by endpoint and method.",
+    ),
+    "http_requests_in_progress": (
+        "gauge",
+        "HTTP requests currently being served, by endpoint.",
+    ),
+    "http_request_db_seconds": (
+        "histogram",
+        "Time spent executing SQL per request, by endpoint.",
+    ),
+    "http_request_db_queries_total": (
+        "counter",
+        "SQL statements executed, by endpoint.",
+    ),
+    "template_render_duration_seconds": (
+        "histogram",
+        "Jinja template render time by template.",
+    ),
+    "asl_view_cache_requests_total": (
+        "counter",
+        "ASL view-model cache lookups by result (hit/miss).",
+    ),
+    "asl_view_cache_invalidations_total": (
+        "counter",
+        "ASL view-model cache entries dropped after writes.",
+    ),
+}
+
+
+def _labels(**labels):
+    return tuple(sorted(labels.items()))
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms for one process"""
+
+    def __init__(self, directory=None, flush_interval=5.0, buckets=DEFAULT_BUCKETS):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.counters = {}
+        self.gauges = {}
+        # key -> [bucket counts..., +Inf count], sum
+        self.histograms = {}
+        self._last_flush = 0.0
+
+    def _check_fork(self):
+        # A registry created before gunicorn forks must not report the
+        # master's numbers as the worker's
+        if os.getpid() != self.pid:
+            self._reset()
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            self._check_fork()
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def add(self, name, labels, amount):
+        """Move a gauge up or down"""
+        with self._lock:
+            self._check_fork()
+            key = (name, labels)
+            self.gauges[key] = self.gauges.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            self._check_fork()
+            key = (name, labels)
+            if key not in self.histograms:
+                self.histograms[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts, _ = self.histograms[key]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self.histograms[key][1] += value
+
+    def snapshot(self):
+        with self._lock:
+            self._check_fork()
+            return {
+                "pid": self.pid,
+                "buckets": list(self.buckets),
+                "counters": [[n, list(l), v] for (n, l), v in self.counters.items()],
+                "gauges": [[n, list(l), v] for (n, l), v in self.gauges.items()],
+                "histograms": [
+                    [n, list(l), list(counts), total]
+                    for (n, l), (counts, total) in self.histograms.items()
+                ],
+            }
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f"metrics_{pid}.json")
+
+    def flush(self, force=False):
+        """Write this process's snapshot for the other workers to read"""
+        if not self.directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+
+        snapshot = self.snapshot()
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self._path(snapshot["pid"]))
+
+    def _snapshots(self):
+        own = self.snapshot()
+        if not self.directory or not os.path.isdir(self.directory):
+            return [(own, True)]
+
+        snapshots = [(own, True)]
+        for filename in os.listdir(self.directory):
+            if not (filename.startswith("metrics_") and filename.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue  # being replaced or truncated; picked up next scrape
+            if data.get("pid") == own["pid"] or data.get("buckets") != own["buckets"]:
+                continue
+            snapshots.append((data, _pid_alive(data["pid"])))
+        return snapshots
+
+    def collect(self):
+        """Merge every process's snapshot into (counters, gauges, histograms)"""
+        counters, gauges, histograms = {}, {}, {}
+        for data, alive in self._snapshots():
+            for name, labels, value in data["counters"]:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            if alive:
+                for name, labels, value in data["gauges"]:
+                    key = (name, tuple(map(tuple, labels)))
+                    gauges[key] = gauges.get(key, 0) + value
+            for name, labels, counts, total in data["histograms"]:
+                key = (name, tuple(map(tuple, labels)))
+                merged = histograms.setdefault(key, [[0] * len(counts), 0.0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+        return counters, gauges, histograms
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        counters, gauges, histograms = self.collect()
+        values = {"counter": counters, "gauge": gauges}
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for (metric, labels), (counts, total) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(self.buckets + (float("inf"),), counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(
+                            f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}"
+                        )
+                    lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+            else:
+                for (metric, labels), value in sorted(values[kind].items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def init_metrics(app):
+    """Create the app's registry and hook it into the request lifecycle"""
+    app.config.setdefault("METRICS_ENABLED", os.environ.get("METRICS_ENABLED", "1") != "0")
+    app.config.setdefault("METRICS_DIR", os.environ.get("METRICS_DIR") or None)
+    app.config.setdefault(
+        "METRICS_FLUSH_INTERVAL", float(os.environ.get("METRICS_FLUSH_INTERVAL") or 5)
+    )
+    # Bearer token that lets a scraper read /admin/metrics without a session
+    app.config.setdefault("METRICS_TOKEN", os.environ.get("METRICS_TOKEN") or None)
+
+    registry = MetricsRegistry(
+        directory=app.config["METRICS_DIR"],
+        flush_interval=app.config["METRICS_FLUSH_INTERVAL"],
+    )
+    app.extensions["metrics"] = registry
+    if not app.config["METRICS_ENABLED"]:
+        return registry
+
+    atexit.register(registry.flush, force=True)
+
+    @app.before_request
+    def _start_request_metrics():
+        g._metrics_endpoint = request.endpoint or "unmatched"
+        g._metrics_start = time.perf_counter()
+        registry.add(
+            "http_requests_in_progress", _labels(endpoint=g._metrics_endpoint), 1
+        )
+
+    @app.after_request
+    def _status_metrics(response):
+        g._metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _finish_request_metrics(exc):
+        started = g.pop("_metrics_start", None)
+        if started is None:
+            return
+        endpoint = g._metrics_endpoint
+        elapsed = time.perf_counter() - started
+        status = g.get("_metrics_status", 500 if exc else 200)
+
+        registry.add("http_requests_in_progress", _labels(endpoint=endpoint), -1)
+        registry.inc(
+            "http_requests_total",
+            _labels(endpoint=endpoint, method=request.method, status=str(status)),
+        )
+        registry.observe(
+            "http_request_duration_seconds",
+            _labels(endpoint=endpoint, method=request.method),
+            elapsed,
+        )
+        stats = current_query_stats()
+        if stats is not None:
+            registry.observe(
+                "http_request_db_seconds", _labels(endpoint=endpoint), stats.total_ms / 1000
+            )
+            registry.inc(
+                "http_request_db_queries_total", _labels(endpoint=endpoint), stats.count
+            )
+        registry.flush()
+
+    def _template_started(sender, template, context, **extra):
+        if has_request_context():
+            g.setdefault("_metrics_templates", []).append(time.perf_counter())
+
+    def _template_finished(sender, template, context, **extra):
+        if not has_request_context() or not g.get("_metrics_templates"):
+            return
+        elapsed = time.perf_counter() - g._metrics_templates.pop()
+        registry.observe(
+            "template_render_duration_seconds",
+            _labels(template=template.name or "<string>"),
+            elapsed,
+        )
+
+    # weak=False: the receivers are closures that would otherwise be collected
+    before_render_template.connect(_template_started, app, weak=False)
+    template_rendered.connect(_template_finished, app, weak=False)
+    return registry
+
+
+def render_metrics():
+    """Metrics text for the current app (all workers when METRICS_DIR is set)"""
+    return current_app.extensions["metrics"].render()
@@ -171,6 +171,11 @@ class StudentScenario(db.Model):
     # Whether this student's grade has been published (visible to the student)
     grade_published = db.Column(db.Boolean, default=False)
 
+    __table_args__ = (
+        db.Index("ix_student_scenarios_student_scenario", "student_id", "scenario_id"),
+        db.Index("ix_student_scenarios_scenario_status", "scenario_id", "status"),
+    )
+
     # Relationships
     student = db.relationship(
         "User",
@@ -198,6 +203,14 @@ class Submission(db.Model):
     submission_data = db.Column(db.JSON)  # Store the ASL form data snapshot
     notes = db.Column(db.Text)  # Student's notes about their submission
 
+    __table_args__ = (
+        db.Index(
+            "ix_submissions_student_scenario_submitted",
+            "student_scenario_id",
+            "submitted_at",
+        ),
+    )
+
     # Relationships
     student_scenario = db.relationship("StudentScenario", backref="submissions")
     patient = db.relationship("Patient")
@@ -216,20 +229,24 @@ class ScenarioPatient(db.Model):
     patient_id = db.Column(db.Integer, db.ForeignKey("patients.id"), nullable=False)
     assigned_at = db.Column(db.DateTime, default=datetime.now)
 
+    __table_args__ = (
+        db.Index("ix_scenario_patients_scenario_student", "scenario_id", "student_id"),
+    )
+
 
 class Patient(db.Model):
     __tablename__ = "patients"
 
     id = db.Column(db.Integer, primary_key=True)
-    medicare = db.Column(db.String(11))
+    medicare = db.Column(db.String(11), index=True)
     pharmaceut_ben_entitlement_no = db.Column(db.String(20))
     sfty_net_entitlement_cardholder = db.Column(db.Boolean, default=False)
     rpbs_ben_entitlement_cardholder = db.Column(db.Boolean, default=False)
     name = db.Column(db.String(100))
-    dob = db.Column(db.String(10))  # format is DD/MM/YYYY
+    dob = db.Column(db.Date)  # shown as DD/MM/YYYY
     preferred_contact = db.Column(db.String(20))
     address = db.Column(db.String(200))
-    script_date = db.Column(db.String(10))
+    script_date = db.Column(db.Date)
     pbs = db.Column(db.String(50), nullable=True)
     rpbs = db.Column(db.String(50), nullable=True)
     last_name = db.Column(db.String(100), nullable=True)
@@ -271,10 +288,24 @@ class Patient(db.Model):
     consented_to_upload = db.Column(db.Boolean, default=False)
     # Combined status=
     asl_status = db.Column(db.Integer, default=ASLStatus.GRANTED.value)
-    consent_last_updated = db.Column(
-        db.String(20), default=lambda: datetime.now().strftime("%d/%m/%Y %I:%M %p")
-    )
+    consent_last_updated = db.Column(db.DateTime, default=datetime.now)
     is_registered = db.Column(db.Boolean, default=True)
+    # Bumped on every write to the patient or its prescriptions/ASL record
+    # (see asl_cache.py); drives the ASL cache and the JSON endpoint's ETag
+    data_version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    # Optimistic lock for this row only (see concurrency.py)
+    row_version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    # sha256 of the last pt_data contract ingested for this patient; resending
+    # it is a no-op (see converters.ingest_pt_data_contract)
+    contract_hash = db.Column(db.String(64), nullable=True)
+
+    __mapper_args__ = {"version_id_col": row_version}
+    # patient_dashboard filters/counts by status and sorts by these columns
+    __table_args__ = (
+        db.Index("ix_patients_asl_status", "asl_status"),
+        db.Index("ix_patients_last_name_given_name", "last_name", "given_name"),
+        db.Index("ix_patients_dob", "dob"),
+    )
 
     # def get_asl_status(self):
     #    return ASLStatus(self.asl_status)
@@ -302,7 +333,8 @@ class Prescriber(db.Model):
     title = db.Column(db.String(100))
     address_1 = db.Column(db.String(100))
     address_2 = db.Column(db.String(100))
-    prescriber_id = db.Column(db.Integer)  # int
+    # Upserts from ingest resolve on it (see converters.resolve_prescribers)
+    prescriber_id = db.Column(db.Integer, index=True, unique=True)  # int
     hpii = db.Column(db.BigInteger)  # int
     hpio = db.Column(db.BigInteger)  # int
     phone = db.Column(db.String(20))  # str
@@ -325,11 +357,30 @@ class Prescription(db.Model):
     dose_instr = db.Column(db.String(200))
     dose_qty = db.Column(db.Integer)
     dose_rpt = db.Column(db.Integer)
-    prescribed_date = db.Column(db.String(10))
-    dispensed_date = db.Column(db.String(10), nullable=True)
+    prescribed_date = db.Column(db.Date)
+    dispensed_date = db.Column(db.Date, nullable=True)
     paperless = db.Column(db.Boolean, default=True)
     remaining_repeats = db.Column(db.Integer, nullable=True)
     dispensed_at_this_pharmacy = db.Column(db.Boolean, default=False)
+    # Optimistic lock: dispensing compares and bumps it (see concurrency.py)
+    row_version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    # Set on items that came from a pt_data contract: which contract item this
+    # is, and a hash of its content, so a resent contract only applies changes
+    contract_key = db.Column(db.String(100), nullable=True)
+    contract_hash = db.Column(db.String(64), nullable=True)
+
+    # ASL/ALR lookups filter on (patient_id, DSPID); ALR-copy checks add drug_name
+    __table_args__ = (
+        db.Index("ix_prescriptions_patient_dspid", "patient_id", "DSPID"),
+        db.Index(
+            "ix_prescriptions_patient_drug_dspid", "patient_id", "drug_name", "DSPID"
+        ),
+        # Date-range filters over a patient's ASL/ALR
+        db.Index("ix_prescriptions_patient_prescribed", "patient_id", "prescribed_date"),
+        db.Index("ix_prescriptions_patient_dispensed", "patient_id", "dispensed_date"),
+    )
+
+    __mapper_args__ = {"version_id_col": row_version}
 
     # DB Relationships
     patient = db.relationship("Patient", backref="prescriptions")
@@ -339,6 +390,100 @@ class Prescription(db.Model):
         return PrescriptionStatus(self.status)
 
 
+class DispenseEvent(db.Model):
+    """Append-only dispensing ledger: one row per repeat dispensed.
+
+    Rows are only ever inserted (see dispensing.py); each records the
+    prescription's repeats/status before and after the dispense, for the
+    dispensing history.
+    """
+
+    __tablename__ = "dispense_events"
+
+    id = db.Column(db.Integer, primary_key=True)
+    patient_id = db.Column(db.Integer, db.ForeignKey("patients.id"), nullable=False)
+    # asl_form replaces a patient's prescriptions; the event outlives the row.
+    # SQLite doesn't enforce ondelete, so deletes go through detach_prescriptions
+    prescription_id = db.Column(
+        db.Integer,
+        db.ForeignKey("prescriptions.id", ondelete="SET NULL"),
+        nullable=True,
+    )
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    drug_name = db.Column(db.String(200))
+    dispensed_by = db.Column(db.String(100))
+    dispensing_notes = db.Column(db.Text)
+    dispensed_date = db.Column(db.Date)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    repeats_before = db.Column(db.Integer)
+    repeats_after = db.Column(db.Integer)
+    dose_rpt_before = db.Column(db.Integer)
+    dose_rpt_after = db.Column(db.Integer)
+    status_after = db.Column(db.Integer)
+
+    # History is read newest-first by id, per patient or per prescription
+    __table_args__ = (
+        db.Index("ix_dispense_events_patient_id", "patient_id", "id"),
+        db.Index("ix_dispense_events_prescription_id", "prescription_id", "id"),
+    )
+
+    patient = db.relationship("Patient")
+    prescription = db.relationship("Prescription")
+    user = db.relationship("User")
+
+
+class SearchEntry(db.Model):
+    """One searchable student, patient or scenario for the omnibox (see search.py).
+
+    Derived data: rewritten from the source row after every ORM write.
+    """
+
+    __tablename__ = "search_entries"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # student/patient/scenario
+    object_id = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String(200))
+    subtitle = db.Column(db.String(200))
+    body = db.Column(db.Text)  # all searchable text for the row
+    # Scenarios are only listed for the teacher who owns them
+    owner_id = db.Column(db.Integer, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint("kind", "object_id", name="uq_search_entries_kind_object"),
+    )
+
+
+class IngestJob(db.Model):
+    """One asynchronous pt_data ingest (see ingest.py), or a bulk import.
+
+    A queued job holds its contract until a worker claims and ingests it, so
+    the table is the queue for every process. A teacher's spreadsheet import
+    (see patient_import.py) is recorded the same way, its result holding the
+    error report.
+    """
+
+    __tablename__ = "ingest_jobs"
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    kind = db.Column(db.String(16), nullable=False, default="contract")  # or "import"
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    state = db.Column(db.String(16), nullable=False, default="queued")
+    submitted_at = db.Column(db.DateTime, default=datetime.now)
+    started_at = db.Column(db.DateTime, nullable=True)
+    # Finished jobs are purged by age (INGEST_JOB_TTL)
+    finished_at = db.Column(db.DateTime, nullable=True, index=True)
+    # The pt_data waiting to be ingested; cleared once the job finishes
+    contract = db.Column(db.JSON, nullable=True)
+    # The ingest outcome, or the error message (and validation errors)
+    result = db.Column(db.JSON, nullable=True)
+
+    # Workers take the oldest queued job of a kind
+    __table_args__ = (
+        db.Index("ix_ingest_jobs_kind_state", "kind", "state", "submitted_at"),
+    )
+
+
 class ASL(db.Model):
     __tablename__ = "asls"
     id = db.Column(db.Integer, primary_key=True)
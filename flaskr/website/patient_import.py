@@ -0,0 +1,505 @@
+"""
+Bulk import of patients and their ASL/ALR items from a spreadsheet.
+
+A teacher uploads a CSV or XLSX file with one row per prescription item
+(columns in IMPORT_COLUMNS; ``/patients/import/template.csv`` is a filled-in
+example). Rows belong to the patient whose medicare number they carry, and
+a row with the medicare cell left blank continues the patient above it, so
+patient details only need filling in once. A row with no item columns
+filled in is a patient without items.
+
+The file is read a row at a time (the csv module over the upload, openpyxl
+in read-only mode), each patient's rows become a pt_data contract, and the
+contracts go through ``ingest.ingest_contracts``: validated against
+PT_DATA_SCHEMA, ingested in a savepoint each and committed in chunks. Only
+one patient's rows and one chunk of results are in memory at a time.
+
+Re-importing a file changes nothing; importing an edited one updates the
+patients it lists as a resent contract would (see converters.py). A patient
+with any problem is skipped whole, and every problem is reported against
+its spreadsheet row and column.
+"""
+
+import csv
+import io
+import os
+import re
+import uuid
+
+from .converters import ContractValidationError, validate_pt_data
+from .ingest import finish_job, ingest_contracts
+from .models import IngestJob
+
+PATIENT_COLUMNS = (
+    "medicare",
+    "name",
+    "dob",
+    "address-1",
+    "address-2",
+    "preferred-contact",
+    "pharmaceut-ben-entitlement-no",
+    "sfty-net-entitlement-cardholder",
+    "rpbs-ben-entitlement-cardholder",
+    "script-date",
+    "pbs",
+    "rpbs",
+    "consent-status",
+    "consent-registered",
+    "consent-last-updated",
+)
+
+# "list" is ASL or ALR; dispensed-date and remaining-repeats are ALR only
+ITEM_COLUMNS = (
+    "list",
+    "drug-name",
+    "drug-code",
+    "dose-instr",
+    "dose-qty",
+    "dose-rpt",
+    "prescribed-date",
+    "paperless",
+    "brand-sub-not-prmt",
+    "dispensed-date",
+    "remaining-repeats",
+)
+
+PRESCRIBER_FIELDS = (
+    "fname",
+    "lname",
+    "title",
+    "address-1",
+    "address-2",
+    "id",
+    "hpii",
+    "hpio",
+    "phone",
+    "fax",
+)
+
+IMPORT_COLUMNS = (
+    PATIENT_COLUMNS
+    + ITEM_COLUMNS
+    + tuple(f"prescriber-{field}" for field in PRESCRIBER_FIELDS)
+)
+
+# Columns a file may leave out; blank cells in them are left out of the contract
+OPTIONAL_COLUMNS = frozenset(
+    (
+        "pbs",
+        "rpbs",
+        "consent-last-updated",
+        "dispensed-date",
+        "remaining-repeats",
+        "prescriber-title",
+        "prescriber-fax",
+    )
+)
+
+REQUIRED_COLUMNS = tuple(c for c in IMPORT_COLUMNS if c not in OPTIONAL_COLUMNS)
+
+# Contract fields whose column name isn't the field name itself
+_CONSENT_COLUMNS = {
+    "status": "consent-status",
+    "is-registered": "consent-registered",
+    "last-updated": "consent-last-updated",
+}
+_ITEM_FIELDS = tuple(c for c in ITEM_COLUMNS if c != "list")
+_ALR_ONLY = ("dispensed-date", "remaining-repeats")
+_ITEM_CELLS = ITEM_COLUMNS + tuple(f"prescriber-{f}" for f in PRESCRIBER_FIELDS)
+
+# $.name, $.consent-status.status, $.asl-data[2].prescriber.hpii, ...
+_PATH = re.compile(r"^\$(?:\.(asl-data|alr-data)\[(\d+)\])?((?:\.[^.\[\]]+)*)$")
+_NON_DIGITS = re.compile(r"\D")
+
+# An import reports at most this many problems
+MAX_REPORTED_ERRORS = 10000
+
+EXAMPLE_ROWS = (
+    {
+        "medicare": "29501234561",
+        "name": "Jane Citizen",
+        "dob": "14/02/1968",
+        "address-1": "12 Example St",
+        "address-2": "MELBOURNE VIC 3000",
+        "preferred-contact": "0400 123 456",
+        "pharmaceut-ben-entitlement-no": "NA318402K",
+        "sfty-net-entitlement-cardholder": "false",
+        "rpbs-ben-entitlement-cardholder": "false",
+        "script-date": "18/10/2026",
+        "consent-status": "Granted",
+        "consent-registered": "true",
+        "consent-last-updated": "13/10/2026 11:59 AM",
+        "list": "ASL",
+        "drug-name": "Lipitor 10mg tablet, 30",
+        "drug-code": "8213G",
+        "dose-instr": "ONCE A DAY",
+        "dose-qty": "30",
+        "dose-rpt": "5",
+        "prescribed-date": "10/06/2026",
+        "paperless": "true",
+        "brand-sub-not-prmt": "false",
+        "prescriber-fname": "Sam",
+        "prescriber-lname": "Nguyen",
+        "prescriber-title": "Dr",
+        "prescriber-address-1": "1 Clinic Rd",
+        "prescriber-address-2": "MELBOURNE VIC 3000",
+        "prescriber-id": "1234567",
+        "prescriber-hpii": "8003610000000001",
+        "prescriber-hpio": "8003620000000001",
+        "prescriber-phone": "03 9000 0000",
+    },
+    {
+        "list": "ALR",
+        "drug-name": "Panadol Extra 500mg tablet, 20",
+        "drug-code": "1234A",
+        "dose-instr": "AS REQUIRED FOR PAIN",
+        "dose-qty": "20",
+        "dose-rpt": "2",
+        "prescribed-date": "15/06/2026",
+        "paperless": "true",
+        "brand-sub-not-prmt": "false",
+        "dispensed-date": "20/06/2026",
+        "remaining-repeats": "2",
+        "prescriber-fname": "Sam",
+        "prescriber-lname": "Nguyen",
+        "prescriber-title": "Dr",
+        "prescriber-address-1": "1 Clinic Rd",
+        "prescriber-address-2": "MELBOURNE VIC 3000",
+        "prescriber-id": "1234567",
+        "prescriber-hpii": "8003610000000001",
+        "prescriber-hpio": "8003620000000001",
+        "prescriber-phone": "03 9000 0000",
+    },
+)
+
+
+class ImportFileError(ValueError):
+    """The upload can't be read as an import at all (type, header)"""
+
+
+def _column_name(header):
+    return re.sub(r"[\s_]+", "-", str(header or "").strip().lower())
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value.strip()
+    # Spreadsheets store whole numbers as floats
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _csv_rows(stream):
+    # A stray non-UTF-8 byte shows up in its cell rather than failing the file
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        yield from csv.reader(text)
+    finally:
+        text.detach()
+
+
+def _xlsx_rows(stream):
+    from openpyxl import load_workbook
+
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except Exception:
+        raise ImportFileError("The file is not a readable .xlsx workbook")
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_rows(stream, filename):
+    """(row number, {column: value}) for each non-blank row of an upload.
+
+    The first row is the header; columns are matched case-insensitively
+    with spaces or underscores for hyphens, and unknown ones are ignored.
+    Raises ImportFileError straight away when the file type or header is
+    unusable; the rows themselves are read as they are iterated.
+    """
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension == ".csv":
+        rows = _csv_rows(stream)
+    elif extension == ".xlsx":
+        rows = _xlsx_rows(stream)
+    else:
+        raise ImportFileError("Upload a .csv or .xlsx file")
+
+    header = next(rows, None)
+    if header is None:
+        raise ImportFileError("The file is empty")
+    positions = {}
+    for index, name in enumerate(header):
+        positions.setdefault(_column_name(name), index)
+    missing = [column for column in REQUIRED_COLUMNS if column not in positions]
+    if missing:
+        rows.close()
+        raise ImportFileError(f"Missing columns: {', '.join(missing)}")
+    positions = [(c, positions[c]) for c in IMPORT_COLUMNS if c in positions]
+
+    def data_rows():
+        for number, values in enumerate(rows, 2):
+            row = {
+                column: _cell(values[index]) if index < len(values) else ""
+                for column, index in positions
+            }
+            if any(value != "" for value in row.values()):
+                yield number, row
+
+    return data_rows()
+
+
+def _filled(row, columns):
+    return {
+        column: row.get(column, "")
+        for column in columns
+        if column not in OPTIONAL_COLUMNS or row.get(column, "") != ""
+    }
+
+
+def _item(row):
+    """(list, pt_data item) for a row, or (None, None) if it has no item"""
+    if all(row.get(column, "") == "" for column in _ITEM_CELLS):
+        return None, None
+    kind = str(row.get("list", "")).strip().lower()
+    if kind not in ("asl", "alr"):
+        return kind, None
+    item = _filled(row, _ITEM_FIELDS)
+    if kind == "asl":
+        for column in _ALR_ONLY:
+            item.pop(column, None)
+    else:
+        for column in _ALR_ONLY:
+            item.setdefault(column, "")
+    item["DSPID"] = kind
+    prescriber = _filled(row, [f"prescriber-{field}" for field in PRESCRIBER_FIELDS])
+    item["prescriber"] = {
+        column[len("prescriber-"):]: value for column, value in prescriber.items()
+    }
+    return kind, item
+
+
+def _contract(rows):
+    """pt_data contract for one patient's rows -> (contract, sources, problems).
+
+    ``sources`` maps each item back to its row; ``problems`` are
+    (row, column, message) found before validation.
+    """
+    first_number, first = rows[0]
+    contract = _filled(
+        first, [c for c in PATIENT_COLUMNS if not c.startswith("consent-")]
+    )
+    contract["consent-status"] = {
+        field: first[column]
+        for field, column in _CONSENT_COLUMNS.items()
+        if column in first and (column not in OPTIONAL_COLUMNS or first[column] != "")
+    }
+    contract["asl-data"], contract["alr-data"] = [], []
+    sources = {"asl-data": [], "alr-data": []}
+    problems = []
+    for number, row in rows:
+        kind, item = _item(row)
+        if item is not None:
+            contract[f"{kind}-data"].append(item)
+            sources[f"{kind}-data"].append(number)
+        elif kind is not None:
+            problems.append((number, "list", "must be ASL or ALR"))
+    return contract, sources, problems
+
+
+def _records(rows, details):
+    """ingest_contracts records, one per patient; ``details`` gets each one's
+    medicare number, item rows and problems, keyed by its first row"""
+    first_rows = {}  # medicare -> first row, to catch a patient split up
+    group, key = [], None
+
+    def record():
+        line = group[0][0]
+        contract, sources, problems = _contract(group)
+        medicare = str(group[0][1]["medicare"])
+        if first_rows.get(key, line) != line:
+            problems.insert(
+                0,
+                (
+                    line,
+                    "medicare",
+                    f"patient already imported from row {first_rows[key]}; "
+                    "keep a patient's rows together",
+                ),
+            )
+        else:
+            first_rows[key] = line
+        if problems:
+            # Report the rest of the patient's problems in the same pass
+            try:
+                validate_pt_data(contract)
+            except ContractValidationError as e:
+                problems += [
+                    (*_locate(path, line, sources), message)
+                    for path, message in e.errors
+                ]
+            problems.sort(key=lambda problem: problem[0])
+        details[line] = {
+            "medicare": medicare,
+            "sources": sources,
+            "problems": problems,
+        }
+        if problems:
+            return line, None, f"{len(problems)} problem(s) in the patient's rows"
+        return line, contract, None
+
+    for number, row in rows:
+        medicare = str(row["medicare"])
+        if medicare == "":
+            if not group:
+                details[number] = {
+                    "medicare": "",
+                    "sources": {},
+                    "problems": [
+                        (number, "medicare", "required on a patient's first row")
+                    ],
+                }
+                yield number, None, "medicare is required on a patient's first row"
+                continue
+        elif (_NON_DIGITS.sub("", medicare) or medicare) != key:
+            if group:
+                yield record()
+            group, key = [], _NON_DIGITS.sub("", medicare) or medicare
+        group.append((number, row))
+    if group:
+        yield record()
+
+
+def _locate(path, line, sources):
+    """(row, column) of the cell a validation error's JSON path points at"""
+    match = _PATH.match(path)
+    if not match:
+        return line, ""
+    items, index, rest = match.groups()
+    keys = [key for key in rest.split(".") if key]
+    if items is None:
+        if keys[:1] == ["consent-status"]:
+            return line, _CONSENT_COLUMNS.get(keys[1], "") if keys[1:] else keys[0]
+        return line, "-".join(keys)
+    index = int(index)
+    row = sources[items][index] if index < len(sources[items]) else line
+    if keys == ["DSPID"]:
+        return row, "list"
+    return row, "-".join(keys)
+
+
+def _problems(result, detail):
+    """(row, column, message) for every problem behind an error result"""
+    if detail["problems"]:
+        return detail["problems"]
+    if result.get("errors"):
+        line, sources = result["line"], detail["sources"]
+        return [
+            (*_locate(error["path"], line, sources), error["message"])
+            for error in result["errors"]
+        ]
+    return [(result["line"], "", result["message"])]
+
+
+def import_patients(stream, filename, session, chunk_size=100):
+    """Import an uploaded file; returns a summary with the error report.
+
+    Raises ImportFileError before importing anything if the file can't be
+    used at all.
+    """
+    rows = read_rows(stream, filename)
+    read = {"rows": 0}
+
+    def counted(rows):
+        for number, row in rows:
+            read["rows"] += 1
+            yield number, row
+
+    summary = {
+        "filename": filename,
+        "patients": 0,
+        "imported": 0,
+        "failed": 0,
+        "new_patients": 0,
+        "unchanged": 0,
+        "created_prescriptions": 0,
+        "updated_prescriptions": 0,
+        "retired_prescriptions": 0,
+        "errors": [],
+        "errors_not_shown": 0,
+    }
+    details = {}
+    records = _records(counted(rows), details)
+    for result in ingest_contracts(
+        records, session, chunk_size=chunk_size, overwrite_patient=True
+    ):
+        detail = details.pop(result["line"])
+        summary["patients"] += 1
+        if result["status"] == "success":
+            summary["imported"] += 1
+            summary["new_patients"] += result["is_new_patient"]
+            summary["unchanged"] += result["unchanged"]
+            for key in (
+                "created_prescriptions",
+                "updated_prescriptions",
+                "retired_prescriptions",
+            ):
+                summary[key] += result[key]
+            continue
+        summary["failed"] += 1
+        for row, column, message in _problems(result, detail):
+            if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+                summary["errors"].append(
+                    {
+                        "row": row,
+                        "column": column,
+                        "medicare": detail["medicare"],
+                        "message": message,
+                    }
+                )
+            else:
+                summary["errors_not_shown"] += 1
+    summary["rows"] = read["rows"]
+    return summary
+
+
+def run_import(stream, filename, user_id, session, chunk_size=100, ttl=86400):
+    """import_patients(), recorded as an IngestJob of kind "import" for the
+    teacher to come back to and download the error report from"""
+    summary = import_patients(stream, filename, session, chunk_size=chunk_size)
+    job = IngestJob(id=uuid.uuid4().hex, kind="import", user_id=user_id)
+    session.add(job)
+    finish_job(job, "succeeded", summary, ttl)
+    session.commit()
+    return job
+
+
+def _csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+def template_csv():
+    """The import header followed by EXAMPLE_ROWS"""
+    yield _csv_line(IMPORT_COLUMNS)
+    for example in EXAMPLE_ROWS:
+        yield _csv_line([example.get(column, "") for column in IMPORT_COLUMNS])
+
+
+def error_report_csv(summary):
+    """An import's problems as CSV lines, for download"""
+    yield _csv_line(["row", "column", "medicare", "message"])
+    for error in summary["errors"]:
+        yield _csv_line(
+            [error["row"], error["column"], error["medicare"], error["message"]]
+        )
+    if summary.get("errors_not_shown"):
+        yield _csv_line(
+            ["", "", "", f"... and {summary['errors_not_shown']} more problem(s)"]
+        )
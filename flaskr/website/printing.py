@@ -0,0 +1,163 @@
+"""
+Prescription printing.
+
+Scripts are read with their patient and prescriber in the same SELECT
+(``joinedload``/``contains_eager``), so printing a selection or a whole
+scenario is one query however many scripts it covers.
+
+A print job renders every script into a single HTML document, one script per
+printed page, and is streamed: rows are fetched ``PRINT_BATCH_SIZE`` at a
+time and each page is sent to the browser as soon as it is rendered, so a
+class set starts arriving straight away and is never held in memory whole.
+"""
+
+from datetime import date
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import contains_eager, joinedload
+
+from .converters import format_date
+from .models import ASLStatus, Patient, Prescription, ScenarioPatient, db
+
+# Rows fetched per round trip while streaming a print job
+PRINT_BATCH_SIZE = 100
+
+
+def _age(dob, today=None):
+    if dob is None:
+        return None
+    today = today or date.today()
+    return today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+
+
+def print_item(prescription):
+    """The fields printed on one script (also the print-selected JSON payload)"""
+    patient = prescription.patient
+    prescriber = prescription.prescriber
+    item = {
+        "medicare": patient.medicare,
+        "pharmaceut-ben-entitlement-no": patient.pharmaceut_ben_entitlement_no,
+        "sfty-net-entitlement-cardholder": patient.sfty_net_entitlement_cardholder,
+        "rpbs-ben-entitlement-cardholder": patient.rpbs_ben_entitlement_cardholder,
+        "name": patient.name,
+        "dob": format_date(patient.dob),
+        "age": _age(patient.dob),
+        "preferred-contact": patient.preferred_contact,
+        "address-1": patient.address or "",
+        "address-2": "",  # Patient model doesn't have address_2
+        "script-date": format_date(patient.script_date),
+        "pbs": patient.pbs,
+        "rpbs": patient.rpbs,
+        "prescription_id": prescription.id,
+        "DSPID": "null",
+        "status": prescription.get_status().name.title(),
+        "drug-name": prescription.drug_name,
+        "drug-code": prescription.drug_code,
+        "dose-instr": prescription.dose_instr,
+        "dose-qty": prescription.dose_qty,
+        "dose-rpt": prescription.dose_rpt,
+        "prescribed-date": format_date(prescription.prescribed_date),
+        "paperless": prescription.paperless,
+        "brand-sub-not-prmt": prescription.brand_sub_not_prmt,
+    }
+    if prescriber is not None:
+        item.update(
+            {
+                "clinician-name-and-title": f"{prescriber.fname} {prescriber.lname}"
+                + (f" {prescriber.title}" if prescriber.title else ""),
+                "clinician-address-1": prescriber.address_1,
+                "clinician-address-2": prescriber.address_2,
+                "clinician-id": prescriber.prescriber_id,
+                "hpii": prescriber.hpii,
+                "hpio": prescriber.hpio,
+                "clinician-phone": prescriber.phone,
+                "clinician-fax": prescriber.fax,
+            }
+        )
+    return item
+
+
+def selection_query(prescription_ids):
+    """The given prescriptions with patient and prescriber, grouped by patient"""
+    return (
+        select(Prescription)
+        .options(
+            joinedload(Prescription.patient), joinedload(Prescription.prescriber)
+        )
+        .where(Prescription.id.in_(prescription_ids))
+        .order_by(Prescription.patient_id, Prescription.id)
+    )
+
+
+def blocked_patient(prescription_ids):
+    """(id, name) of a patient among the selection whose ASL can't be viewed"""
+    return (
+        db.session.query(Patient.id, Patient.name)
+        .join(Prescription, Prescription.patient_id == Patient.id)
+        .filter(
+            Prescription.id.in_(prescription_ids),
+            Patient.asl_status != ASLStatus.GRANTED.value,
+        )
+        .first()
+    )
+
+
+def _in_scenario(scenario):
+    """Condition on Prescription/Patient: the patient belongs to ``scenario``"""
+    return or_(
+        Patient.id.in_(
+            select(ScenarioPatient.patient_id).where(
+                ScenarioPatient.scenario_id == scenario.id
+            )
+        ),
+        Patient.id == scenario.active_patient_id,
+    )
+
+
+def scenario_query(scenario):
+    """Every ASL script of a scenario's patients (those whose ASL can be viewed).
+
+    Matches what each patient's ASL page lists: DSPID "asl", skipping scripts
+    with no repeats left.
+    """
+    return (
+        select(Prescription)
+        .join(Prescription.patient)
+        .options(
+            contains_eager(Prescription.patient), joinedload(Prescription.prescriber)
+        )
+        .where(
+            _in_scenario(scenario),
+            Patient.asl_status == ASLStatus.GRANTED.value,
+            Prescription.DSPID == "asl",
+            or_(
+                Prescription.remaining_repeats.is_(None),
+                Prescription.remaining_repeats != 0,
+            ),
+        )
+        .order_by(Patient.name, Prescription.patient_id, Prescription.id)
+    )
+
+
+def scenario_patients_without_access(scenario):
+    """How many of a scenario's patients scenario_query leaves out"""
+    return db.session.execute(
+        select(func.count(Patient.id)).where(
+            _in_scenario(scenario), Patient.asl_status != ASLStatus.GRANTED.value
+        )
+    ).scalar()
+
+
+def count_scripts(query):
+    return db.session.execute(
+        select(func.count()).select_from(query.order_by(None).subquery())
+    ).scalar()
+
+
+def iter_print_items(query):
+    """print_item() for every row of ``query``, fetched in batches"""
+    rows = db.session.execute(
+        query.execution_options(yield_per=PRINT_BATCH_SIZE)
+    ).scalars()
+    for prescription in rows:
+        yield print_item(prescription)
@@ -0,0 +1,180 @@
+"""
+Per-request SQL instrumentation.
+
+Hooks the engine's ``before_cursor_execute``/``after_cursor_execute`` events
+to count statements and DB time for the current request, and flags N+1
+patterns: the same statement shape executed many times in one request.
+
+Configuration (``app.config``, defaults read from the environment):
+
+``SQL_QUERY_STATS``            collect stats at all (default on)
+``SQL_QUERY_HEADERS``          add ``X-DB-Query-Count``/``X-DB-Time-ms`` to
+                               responses (default: only in debug mode)
+``SQL_QUERY_BUDGET``           max statements per request for every route
+                               (default: none); ``@query_budget(n)`` sets a
+                               per-route budget
+``SQL_QUERY_BUDGET_STRICT``    raise ``QueryBudgetExceeded`` instead of
+                               logging a warning, for test runs
+``SQL_N_PLUS_ONE_THRESHOLD``   repeats of one statement shape that count as
+                               an N+1 (default 5)
+"""
+
+import os
+import re
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from .database import _env_bool
+
+# IN (?, ?, ?) / IN (%(id_1)s, %(id_2)s) expand per value; treat them as one shape
+_PLACEHOLDER_LIST_RE = re.compile(
+    r"\(\s*(?:\?|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+))+\s*\)"
+)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in strict mode when a request runs more statements than allowed"""
+
+
+class QueryStats:
+    """Statement count, DB time and statement shapes for one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, elapsed_ms):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold):
+        """Statement shapes executed at least ``threshold`` times"""
+        return [
+            (shape, n) for shape, n in self.shapes.most_common() if n >= threshold
+        ]
+
+
+def statement_shape(statement):
+    """Normalise a statement so N+1 repeats compare equal"""
+    shape = _WHITESPACE_RE.sub(" ", statement).strip()
+    return _PLACEHOLDER_LIST_RE.sub("(?)", shape)
+
+
+def query_budget(limit):
+    """Cap the number of statements a view may run (see SQL_QUERY_BUDGET)"""
+
+    def decorator(view):
+        view.query_budget = limit
+        return view
+
+    return decorator
+
+
+def current_query_stats():
+    """Stats collected so far for the current request, or None"""
+    if not has_request_context():
+        return None
+    return g.get("_query_stats")
+
+
+def query_stats_config_from_env(environ=None):
+    """Default ``SQL_*`` config values from the environment"""
+    environ = os.environ if environ is None else environ
+    headers = environ.get("SQL_QUERY_HEADERS")
+    budget = environ.get("SQL_QUERY_BUDGET")
+    return {
+        "SQL_QUERY_STATS": _env_bool(environ, "SQL_QUERY_STATS", True),
+        # None = follow app.debug
+        "SQL_QUERY_HEADERS": _env_bool(environ, "SQL_QUERY_HEADERS", False)
+        if headers
+        else None,
+        "SQL_QUERY_BUDGET": int(budget) if budget else None,
+        "SQL_QUERY_BUDGET_STRICT": _env_bool(environ, "SQL_QUERY_BUDGET_STRICT", False),
+        "SQL_N_PLUS_ONE_THRESHOLD": int(environ.get("SQL_N_PLUS_ONE_THRESHOLD") or 5),
+    }
+
+
+def _route_budget(app):
+    view = app.view_functions.get(request.endpoint) if request.endpoint else None
+    budget = getattr(view, "query_budget", None)
+    return budget if budget is not None else app.config.get("SQL_QUERY_BUDGET")
+
+
+def init_query_stats(app, db):
+    """Attach the engine listeners and request hooks to ``app``"""
+    for key, value in query_stats_config_from_env().items():
+        app.config.setdefault(key, value)
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_stats_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_stats_start"].pop()
+        stats = current_query_stats()
+        if stats is not None:
+            stats.record(statement, (time.perf_counter() - started) * 1000)
+
+    @event.listens_for(engine, "handle_error")
+    def _discard_timer(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_stats_start"):
+            conn.info["query_stats_start"].pop()
+
+    @app.before_request
+    def _begin_query_stats():
+        if current_app.config["SQL_QUERY_STATS"]:
+            g._query_stats = QueryStats()
+
+    @app.after_request
+    def _report_query_stats(response):
+        stats = current_query_stats()
+        if stats is None:
+            return response
+        config = current_app.config
+        logger = current_app.logger
+
+        for shape, n in stats.repeated(config["SQL_N_PLUS_ONE_THRESHOLD"]):
+            logger.warning(
+                "Possible N+1 on %s %s: statement ran %d times: %s",
+                request.method,
+                request.path,
+                n,
+                shape[:300],
+            )
+
+        budget = _route_budget(current_app)
+        if budget is not None and stats.count > budget:
+            message = (
+                f"{request.method} {request.path} ran {stats.count} SQL statements "
+                f"(budget {budget})"
+            )
+            if config["SQL_QUERY_BUDGET_STRICT"]:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        logger.debug(
+            "%s %s: %d SQL statements in %.1f ms",
+            request.method,
+            request.path,
+            stats.count,
+            stats.total_ms,
+        )
+
+        show_headers = config["SQL_QUERY_HEADERS"]
+        if show_headers is None:
+            show_headers = current_app.debug
+        if show_headers:
+            response.headers["X-DB-Query-Count"] = str(stats.count)
+            response.headers["X-DB-Time-ms"] = f"{stats.total_ms:.2f}"
+        return response
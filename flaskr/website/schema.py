@@ -0,0 +1,298 @@
+"""
+Declarative schemas for JSON documents, compiled once into validators.
+
+A schema is a tree of the node types below. ``compile_schema(schema)`` turns
+it into a function that checks and converts a whole document in one pass and
+returns ``(value, errors)``. Every problem is collected rather than stopping
+at the first, as ``(path, message)`` pairs where ``path`` is a JSON path such
+as ``$.asl-data[2].prescriber.hpii``.
+
+The converted value mirrors the document: objects become dicts of converted
+fields (optional fields the document leaves out stay out), lists become lists
+and leaves become Python values (ints, bools, dates).
+
+Compiling generates a straight-line function per object (one statement per
+field, converters bound as locals), and paths are only rendered for fields
+that fail, so validating a valid document is a run of direct calls.
+"""
+
+import re
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+class Invalid(Exception):
+    """Raised by a leaf converter; the message is reported at the leaf's path"""
+
+
+class Raw:
+    """Any value, unchanged"""
+
+    convert = None
+
+
+class Text:
+    """Any value, as a string"""
+
+    convert = staticmethod(str)
+
+
+class Digits:
+    """An integer written with digits; other characters are ignored.
+
+    ``length`` requires exactly that many digits, ``minimum`` a smallest value.
+    """
+
+    def __init__(self, length=None, minimum=None):
+        self.length = length
+        self.minimum = minimum
+        self.convert = self._converter(length, minimum)
+
+    @staticmethod
+    def _converter(length, minimum):
+        # A closure over the settings: it runs for most fields of a contract
+        def convert(value):
+            text = value if type(value) is str else str(value)
+            if not (text.isdigit() and text.isascii()):
+                text = _NON_DIGITS.sub("", text)
+                if not text:
+                    raise Invalid("must be numeric")
+            if length and len(text) != length:
+                raise Invalid(f"must be {length} digits")
+            number = int(text)
+            if minimum is not None and number < minimum:
+                raise Invalid(f"must be >= {minimum}")
+            return number
+
+        return convert
+
+
+_TRUE = {"true", "1", "yes", "y"}
+_FALSE = {"false", "0", "no", "n"}
+
+
+class Bool:
+    """A bool, number, or "true"/"false"/"yes"/"no"/"1"/"0" string"""
+
+    @staticmethod
+    def convert(value):
+        if value is True or value is False:
+            return value
+        if isinstance(value, str):
+            text = value.strip().lower()
+            if text in _TRUE:
+                return True
+            if text in _FALSE:
+                return False
+        elif isinstance(value, (int, float)):
+            return bool(value)
+        raise Invalid(f"cannot convert {value!r} to bool")
+
+
+class Parsed:
+    """A value converted by ``parse``, which raises ValueError on bad input.
+
+    Unless ``required`` is false, a value that parses to None (an empty
+    string) is rejected too.
+    """
+
+    def __init__(self, parse, message, required=True):
+        self.parse = parse
+        self.message = message
+        self.required = required
+
+    def convert(self, value):
+        try:
+            parsed = self.parse(value)
+        except (ValueError, TypeError):
+            raise Invalid(self.message)
+        if parsed is None and self.required:
+            raise Invalid(self.message)
+        return parsed
+
+
+class Pattern:
+    """A string (after str()) matching ``regex``"""
+
+    def __init__(self, regex, message):
+        self.regex = re.compile(regex)
+        self.message = message
+
+    def convert(self, value):
+        text = value if type(value) is str else str(value)
+        if not self.regex.match(text):
+            raise Invalid(f"{self.message}: {value!r}")
+        return text
+
+
+class Choice:
+    """A string looked up in ``choices`` after ``normalize``"""
+
+    def __init__(self, choices, normalize=str.strip):
+        self.choices = choices
+        self.normalize = normalize
+
+    def convert(self, value):
+        key = self.normalize(value) if isinstance(value, str) else value
+        try:
+            return self.choices[key]
+        except (KeyError, TypeError):
+            raise Invalid(f"must be one of {', '.join(map(str, self.choices))}")
+
+
+class NotRequired:
+    """Marks an object field that may be left out"""
+
+    def __init__(self, node):
+        self.node = node
+
+
+class ListOf:
+    """A list of ``item``; null counts as an empty list"""
+
+    def __init__(self, item):
+        self.item = item
+
+
+class Object:
+    """A JSON object with the given fields; unknown keys are ignored"""
+
+    def __init__(self, fields):
+        self.fields = fields
+
+
+def _compile(node):
+    """node -> check(value, path, errors) -> converted value"""
+    if isinstance(node, Object):
+        return _compile_object(node)
+    if isinstance(node, ListOf):
+        return _compile_list(node)
+    convert = node.convert
+
+    def check_leaf(value, path, errors):
+        if convert is None:
+            return value
+        try:
+            return convert(value)
+        except Invalid as e:
+            errors.append((path, e.args[0]))
+            return None
+
+    return check_leaf
+
+
+def _compile_object(node):
+    # (name, required, leaf convert or None, nested check or None)
+    fields = []
+    for name, child in node.fields.items():
+        required = not isinstance(child, NotRequired)
+        if not required:
+            child = child.node
+        if isinstance(child, (Object, ListOf)):
+            fields.append((name, required, None, _compile(child)))
+        else:
+            fields.append((name, required, child.convert, None))
+    fields = tuple(fields)
+    required_keys = frozenset(name for name, required, _, _ in fields if required)
+
+    def check_fields(value, path, errors):
+        """Field by field, for objects missing required keys"""
+        out = {}
+        missing = [name for name, required, _, _ in fields if required and name not in value]
+        errors.append((path, f"missing {', '.join(missing)}"))
+        for name, required, convert, check in fields:
+            if name not in value:
+                continue
+            if check is not None:
+                out[name] = check(value[name], (path, name), errors)
+            elif convert is None:
+                out[name] = value[name]
+            else:
+                try:
+                    out[name] = convert(value[name])
+                except Invalid as e:
+                    errors.append(((path, name), e.args[0]))
+        return out
+
+    return _generate_object(fields, required_keys, check_fields)
+
+
+def _generate_object(fields, required_keys, check_fields):
+    """A straight-line check for ``fields``, one statement per field.
+
+    With every required key present (one set comparison), each field is a
+    direct lookup and call with no per-field loop or branching.
+    """
+    namespace = {
+        "Invalid": Invalid,
+        "required_keys": required_keys,
+        "check_fields": check_fields,
+    }
+    lines = [
+        "def check_object(value, path, errors):",
+        "    if type(value) is not dict:",
+        "        errors.append((path, 'must be an object'))",
+        "        return None",
+        "    if not required_keys <= value.keys():",
+        "        return check_fields(value, path, errors)",
+        "    out = {}",
+    ]
+    for i, (name, required, convert, check) in enumerate(fields):
+        key = repr(name)
+        indent = "    "
+        if not required:
+            lines.append(f"    if {key} in value:")
+            indent = "        "
+        if check is not None:
+            namespace[f"check_{i}"] = check
+            lines.append(
+                f"{indent}out[{key}] = check_{i}(value[{key}], (path, {key}), errors)"
+            )
+        elif convert is None:
+            lines.append(f"{indent}out[{key}] = value[{key}]")
+        else:
+            namespace[f"convert_{i}"] = convert
+            lines += [
+                f"{indent}try:",
+                f"{indent}    out[{key}] = convert_{i}(value[{key}])",
+                f"{indent}except Invalid as e:",
+                f"{indent}    errors.append(((path, {key}), e.args[0]))",
+            ]
+    lines.append("    return out")
+    exec("\n".join(lines), namespace)
+    return namespace["check_object"]
+
+
+def _compile_list(node):
+    check_item = _compile(node.item)
+
+    def check_list(value, path, errors):
+        if value is None:
+            return []
+        if type(value) is not list:
+            errors.append((path, "must be a list"))
+            return []
+        return [check_item(item, (path, i), errors) for i, item in enumerate(value)]
+
+    return check_list
+
+
+def json_path(path):
+    """Render a (parent, key) chain as ``$.a.b[0].c``"""
+    parts = []
+    while path is not None:
+        path, key = path
+        parts.append(f"[{key}]" if type(key) is int else f".{key}")
+    return "$" + "".join(reversed(parts))
+
+
+def compile_schema(schema):
+    """A validator for ``schema``: document -> (converted value, errors)"""
+    check = _compile(schema)
+
+    def validate(document):
+        errors = []
+        value = check(document, None, errors)
+        return value, [(json_path(path), message) for path, message in errors]
+
+    return validate
@@ -0,0 +1,594 @@
+"""
+Full-text search: prescriptions for the ASL search box, and the teachers'
+omnibox over students, patients and scenarios.
+
+Prescriptions
+-------------
+
+On SQLite the ``prescription_search`` FTS5 table mirrors every prescription,
+keyed by ``rowid = prescriptions.id``. Triggers on ``prescriptions`` and
+``prescribers`` keep it in sync with every write, ORM or raw SQL. The table
+and triggers are created by migration ``b7e1c5a9d342`` for existing databases,
+and by a ``create_all`` DDL hook below for new ones.
+
+Queries are tokenised, every token is matched as a prefix (``amox`` finds
+"Amoxicillin"), and results are ranked with bm25, weighting drug name over
+prescriber and code. That is for searching across patients: a search within
+one patient (the ASL search box) keeps the original ``ILIKE '%q%'`` scan over
+that patient's rows, which is as fast and still matches inside words.
+
+Other backends, or SQLite databases without the table, always use the
+``ILIKE`` scan.
+
+Omnibox
+-------
+``search_entries`` holds one denormalised row per active student, patient and
+non-archived scenario (title, subtitle and all searchable text). ORM events
+below rewrite a row's entry whenever a flush or bulk query touches it, and
+``search_entries_fts`` (SQLite, external content) is kept in step with
+``search_entries`` by triggers. ``omnibox_search`` runs one ranked query
+across all three kinds inside a latency budget.
+"""
+
+import os
+import re
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import (
+    and_,
+    column,
+    delete,
+    event,
+    func,
+    insert,
+    inspect,
+    literal_column,
+    or_,
+    select,
+    table,
+    text,
+)
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from .models import Patient, Prescriber, Prescription, Scenario, SearchEntry, User, db
+
+FTS_TABLE = "prescription_search"
+
+# bm25 weights for drug_name, drug_code, prescriber_name, patient_key
+BM25_WEIGHTS = (10.0, 2.0, 4.0, 0.0)
+
+_PRESCRIBER_NAME = (
+    "(SELECT trim(coalesce(fname, '') || ' ' || coalesce(lname, '')) "
+    "FROM prescribers WHERE id = new.prescriber_id)"
+)
+
+FTS_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "drug_name, drug_code, prescriber_name, patient_key, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    f"CREATE TRIGGER IF NOT EXISTS prescriptions_search_insert "
+    f"AFTER INSERT ON prescriptions BEGIN "
+    f"INSERT INTO {FTS_TABLE} (rowid, drug_name, drug_code, prescriber_name, patient_key) "
+    f"VALUES (new.id, new.drug_name, new.drug_code, {_PRESCRIBER_NAME}, 'p' || new.patient_id); "
+    f"END",
+    f"CREATE TRIGGER IF NOT EXISTS prescriptions_search_update "
+    f"AFTER UPDATE OF id, drug_name, drug_code, prescriber_id, patient_id ON prescriptions BEGIN "
+    f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id; "
+    f"INSERT INTO {FTS_TABLE} (rowid, drug_name, drug_code, prescriber_name, patient_key) "
+    f"VALUES (new.id, new.drug_name, new.drug_code, {_PRESCRIBER_NAME}, 'p' || new.patient_id); "
+    f"END",
+    f"CREATE TRIGGER IF NOT EXISTS prescriptions_search_delete "
+    f"AFTER DELETE ON prescriptions BEGIN "
+    f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id; "
+    f"END",
+    f"CREATE TRIGGER IF NOT EXISTS prescribers_search_update "
+    f"AFTER UPDATE OF fname, lname ON prescribers BEGIN "
+    f"UPDATE {FTS_TABLE} "
+    f"SET prescriber_name = trim(coalesce(new.fname, '') || ' ' || coalesce(new.lname, '')) "
+    f"WHERE rowid IN (SELECT id FROM prescriptions WHERE prescriber_id = new.id); "
+    f"END",
+]
+
+ENTRY_FTS_TABLE = "search_entries_fts"
+
+ENTRY_FTS_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {ENTRY_FTS_TABLE} USING fts5("
+    "kind, title, body, content = 'search_entries', content_rowid = 'id', "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    f"CREATE TRIGGER IF NOT EXISTS search_entries_fts_insert "
+    f"AFTER INSERT ON search_entries BEGIN "
+    f"INSERT INTO {ENTRY_FTS_TABLE} (rowid, kind, title, body) "
+    f"VALUES (new.id, new.kind, new.title, new.body); "
+    f"END",
+    f"CREATE TRIGGER IF NOT EXISTS search_entries_fts_delete "
+    f"AFTER DELETE ON search_entries BEGIN "
+    f"INSERT INTO {ENTRY_FTS_TABLE} ({ENTRY_FTS_TABLE}, rowid, kind, title, body) "
+    f"VALUES ('delete', old.id, old.kind, old.title, old.body); "
+    f"END",
+    f"CREATE TRIGGER IF NOT EXISTS search_entries_fts_update "
+    f"AFTER UPDATE ON search_entries BEGIN "
+    f"INSERT INTO {ENTRY_FTS_TABLE} ({ENTRY_FTS_TABLE}, rowid, kind, title, body) "
+    f"VALUES ('delete', old.id, old.kind, old.title, old.body); "
+    f"INSERT INTO {ENTRY_FTS_TABLE} (rowid, kind, title, body) "
+    f"VALUES (new.id, new.kind, new.title, new.body); "
+    f"END",
+]
+
+# Fill the index from existing rows (migration and rebuild_fts)
+FTS_BACKFILL = (
+    f"INSERT INTO {FTS_TABLE} (rowid, drug_name, drug_code, prescriber_name, patient_key) "
+    "SELECT p.id, p.drug_name, p.drug_code, "
+    "trim(coalesce(d.fname, '') || ' ' || coalesce(d.lname, '')), 'p' || p.patient_id "
+    "FROM prescriptions p LEFT JOIN prescribers d ON d.id = p.prescriber_id"
+)
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# engine URL -> whether the FTS table is there
+_fts_available = {}
+
+
+def _fts5_compiled(connection):
+    return bool(
+        connection.exec_driver_sql(
+            "SELECT sqlite_compileoption_used('ENABLE_FTS5')"
+        ).scalar()
+    )
+
+
+def _create_fts(target, connection, **kw):
+    if connection.dialect.name == "sqlite" and _fts5_compiled(connection):
+        for statement in FTS_DDL + ENTRY_FTS_DDL:
+            connection.exec_driver_sql(statement)
+        _fts_available.clear()
+
+
+def _drop_fts(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {ENTRY_FTS_TABLE}")
+        _fts_available.clear()
+
+
+event.listen(db.metadata, "after_create", _create_fts)
+event.listen(db.metadata, "before_drop", _drop_fts)
+
+
+def fts_available(session=None, table_name=FTS_TABLE):
+    """Whether an FTS index can be used on this database (checked once per engine)"""
+    session = session or db.session
+    engine = session.get_bind()
+    key = (str(engine.url), table_name)
+    if key not in _fts_available:
+        _fts_available[key] = engine.dialect.name == "sqlite" and bool(
+            session.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": table_name},
+            ).scalar()
+        )
+    return _fts_available[key]
+
+
+def rebuild_fts(connection):
+    """Re-create the index from scratch (e.g. after restoring a database)"""
+    connection.exec_driver_sql(f"DELETE FROM {FTS_TABLE}")
+    connection.exec_driver_sql(FTS_BACKFILL)
+
+
+def _prefix_terms(query):
+    """'"tok1"* "tok2"*' for free text, or None if it has no word characters"""
+    tokens = _TOKEN.findall(query)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def match_expression(query, patient_id=None):
+    """FTS5 MATCH string for free text, or None if it has no searchable tokens.
+
+    Every token is quoted (so FTS syntax in user input is inert) and matched as
+    a prefix; all tokens must match, in any of the searchable columns.
+    """
+    terms = _prefix_terms(query)
+    if terms is None:
+        return None
+    expression = f"{{drug_name drug_code prescriber_name}} : ({terms})"
+    if patient_id is not None:
+        expression += f' AND patient_key : "p{int(patient_id)}"'
+    return expression
+
+
+def search_prescriptions(query, patient_id=None, limit=None, session=None):
+    """(Prescription, Prescriber) pairs matching ``query``, best match first.
+
+    Within one patient the substring scan is used: it only reads that
+    patient's rows through the patient_id index, which is faster than FTS for
+    broad terms, and it still matches inside words ("cillin").
+    """
+    session = session or db.session
+    if patient_id is not None or not fts_available(session):
+        return search_prescriptions_like(query, patient_id, limit, session)
+    return search_prescriptions_fts(query, limit=limit, session=session)
+
+
+def search_prescriptions_fts(query, patient_id=None, limit=None, session=None):
+    """Ranked prefix search on the FTS5 index (which must exist)"""
+    session = session or db.session
+    expression = match_expression(query, patient_id)
+    if expression is None:
+        return []
+
+    fts = table(FTS_TABLE, column("rowid"))
+    results = (
+        session.query(Prescription, Prescriber)
+        .join(fts, fts.c.rowid == Prescription.id)
+        .join(Prescriber, Prescription.prescriber_id == Prescriber.id)
+        .filter(literal_column(FTS_TABLE).op("MATCH")(expression))
+        .order_by(func.bm25(literal_column(FTS_TABLE), *BM25_WEIGHTS))
+    )
+    if limit is not None:
+        results = results.limit(limit)
+    return results.all()
+
+
+def search_prescriptions_like(query, patient_id=None, limit=None, session=None):
+    """The original substring scan; used where FTS5 isn't available"""
+    session = session or db.session
+    results = (
+        session.query(Prescription, Prescriber)
+        .join(Prescriber, Prescription.prescriber_id == Prescriber.id)
+        .filter(
+            or_(
+                Prescription.drug_name.ilike(f"%{query}%"),
+                Prescription.drug_code.ilike(f"%{query}%"),
+                Prescriber.fname.ilike(f"%{query}%"),
+                Prescriber.lname.ilike(f"%{query}%"),
+            ),
+        )
+    )
+    if patient_id is not None:
+        results = results.filter(Prescription.patient_id == patient_id)
+    if limit is not None:
+        results = results.limit(limit)
+    return results.all()
+
+
+# ---------------------------------------------------------------------------
+# Omnibox
+# ---------------------------------------------------------------------------
+
+# bm25 weights for kind, title, body
+ENTRY_BM25_WEIGHTS = (0.0, 5.0, 1.0)
+
+ENTRY_KINDS = ("student", "patient", "scenario")
+
+# Source model -> (entry kind, columns the entry is built from)
+_SOURCES = {
+    User: ("student", ("first_name", "last_name", "email", "studentnumber", "role", "is_active")),
+    Patient: ("patient", ("name", "given_name", "last_name", "medicare", "dob")),
+    Scenario: ("scenario", ("name", "description", "teacher_id", "is_archived")),
+}
+_MODEL_OF = {kind: model for model, (kind, _) in _SOURCES.items()}
+
+# SQLite IN () lists are kept well under the bound-parameter limit
+_CHUNK = 500
+
+
+def _student_entries(connection, ids):
+    users = User.__table__
+    rows = connection.execute(
+        select(
+            users.c.id, users.c.first_name, users.c.last_name,
+            users.c.email, users.c.studentnumber,
+        ).where(
+            users.c.id.in_(ids),
+            users.c.role == "student",
+            users.c.is_active.is_not(False),
+        )
+    )
+    for row in rows:
+        name = f"{row.first_name or ''} {row.last_name or ''}".strip()
+        yield {
+            "kind": "student",
+            "object_id": row.id,
+            "title": name or row.email,
+            "subtitle": row.email,
+            "body": " ".join(
+                str(part)
+                for part in (name, row.email, row.studentnumber)
+                if part not in (None, "")
+            ),
+            "owner_id": None,
+        }
+
+
+def _patient_entries(connection, ids):
+    patients = Patient.__table__
+    rows = connection.execute(
+        select(
+            patients.c.id, patients.c.name, patients.c.given_name,
+            patients.c.last_name, patients.c.medicare, patients.c.dob,
+        ).where(patients.c.id.in_(ids))
+    )
+    for row in rows:
+        details = []
+        if row.medicare:
+            details.append(f"Medicare {row.medicare}")
+        if row.dob:
+            details.append(f"DOB {row.dob.strftime('%d/%m/%Y')}")
+        yield {
+            "kind": "patient",
+            "object_id": row.id,
+            "title": row.name or f"Patient {row.id}",
+            "subtitle": " · ".join(details),
+            # DOB in both the displayed and ISO forms
+            "body": " ".join(
+                str(part)
+                for part in (
+                    row.name, row.given_name, row.last_name, row.medicare,
+                    row.dob.strftime("%d/%m/%Y") if row.dob else None,
+                    row.dob.isoformat() if row.dob else None,
+                )
+                if part
+            ),
+            "owner_id": None,
+        }
+
+
+def _scenario_entries(connection, ids):
+    scenarios = Scenario.__table__
+    rows = connection.execute(
+        select(
+            scenarios.c.id, scenarios.c.name, scenarios.c.description,
+            scenarios.c.teacher_id,
+        ).where(scenarios.c.id.in_(ids), scenarios.c.is_archived.is_not(True))
+    )
+    for row in rows:
+        description = " ".join((row.description or "").split())
+        yield {
+            "kind": "scenario",
+            "object_id": row.id,
+            "title": row.name,
+            "subtitle": description[:117] + "..." if len(description) > 120 else description,
+            "body": f"{row.name} {description}".strip(),
+            "owner_id": row.teacher_id,
+        }
+
+
+_BUILDERS = {
+    "student": _student_entries,
+    "patient": _patient_entries,
+    "scenario": _scenario_entries,
+}
+
+
+def sync_entries(connection, kind, ids):
+    """Rewrite the search entries of ``kind`` for ``ids`` from the source rows.
+
+    Rows that are gone, or no longer searchable (inactive students, archived
+    scenarios), just lose their entry.
+    """
+    entries = SearchEntry.__table__
+    ids = sorted({i for i in ids if i is not None})
+    for start in range(0, len(ids), _CHUNK):
+        chunk = ids[start : start + _CHUNK]
+        connection.execute(
+            delete(entries).where(entries.c.kind == kind, entries.c.object_id.in_(chunk))
+        )
+        rows = list(_BUILDERS[kind](connection, chunk))
+        if rows:
+            connection.execute(insert(entries), rows)
+
+
+def rebuild_entries(connection):
+    """Re-create every search entry from the source tables"""
+    for kind, model in _MODEL_OF.items():
+        ids = connection.execute(select(model.__table__.c.id)).scalars().all()
+        connection.execute(delete(SearchEntry.__table__).where(SearchEntry.kind == kind))
+        sync_entries(connection, kind, ids)
+
+
+def _flushed_sources(session):
+    """kind -> ids of searchable rows written by the flush in progress"""
+    pending = {}
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        source = _SOURCES.get(type(obj))
+        if source is None:
+            continue
+        kind, fields = source
+        if obj in session.dirty and obj not in session.deleted:
+            # Skip writes that leave the entry as it was (e.g. last_login)
+            attrs = inspect(obj).attrs
+            if not any(attrs[field].history.has_changes() for field in fields):
+                continue
+        pending.setdefault(kind, set()).add(obj.id)
+    return pending
+
+
+def _after_flush(session, flush_context):
+    pending = _flushed_sources(session)
+    if pending:
+        connection = session.connection()
+        for kind, ids in pending.items():
+            sync_entries(connection, kind, ids)
+
+
+def _before_bulk(orm_execute_state):
+    """Note the rows a bulk query.update()/delete() touches; synced before commit"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ not in _SOURCES:
+        return
+    kind = _SOURCES[mapper.class_][0]
+    whereclause = orm_execute_state.statement.whereclause
+    query = select(mapper.local_table.c.id)
+    if whereclause is not None:
+        query = query.where(whereclause)
+    ids = orm_execute_state.session.connection().execute(query).scalars()
+    orm_execute_state.session.info.setdefault("search_pending", {}).setdefault(
+        kind, set()
+    ).update(ids)
+
+
+def _before_commit(session):
+    pending = session.info.pop("search_pending", None)
+    if pending:
+        connection = session.connection()
+        for kind, ids in pending.items():
+            sync_entries(connection, kind, ids)
+
+
+def _after_rollback(session):
+    session.info.pop("search_pending", None)
+
+
+def init_search(app):
+    """Latency budget from config, and the entry-sync events (hooked once)"""
+    app.config.setdefault(
+        "SEARCH_BUDGET_MS", int(os.environ.get("SEARCH_BUDGET_MS") or 250)
+    )
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "after_flush", _after_flush)
+        event.listen(Session, "do_orm_execute", _before_bulk)
+        event.listen(Session, "before_commit", _before_commit)
+        event.listen(Session, "after_rollback", _after_rollback)
+
+
+class SearchTimeout(Exception):
+    """A search ran past its latency budget"""
+
+
+@contextmanager
+def time_budget(session, budget_ms):
+    """Abort statements run inside the block once ``budget_ms`` has elapsed.
+
+    SQLite gets a progress handler that interrupts the running statement,
+    PostgreSQL a transaction-local ``statement_timeout``; elsewhere the budget
+    isn't enforced. Raises SearchTimeout, after rolling back, when it fires.
+    """
+    connection = session.connection()
+    dialect = connection.dialect.name
+    deadline = time.perf_counter() + budget_ms / 1000
+    raw = connection.connection.driver_connection
+    try:
+        if dialect == "sqlite":
+            raw.set_progress_handler(lambda: time.perf_counter() > deadline, 1000)
+        elif dialect == "postgresql":
+            connection.exec_driver_sql(
+                f"SET LOCAL statement_timeout = {max(int(budget_ms), 1)}"
+            )
+        yield
+        if dialect == "postgresql":
+            connection.exec_driver_sql("SET LOCAL statement_timeout = DEFAULT")
+    except OperationalError as exc:
+        if time.perf_counter() < deadline:
+            raise
+        session.rollback()
+        raise SearchTimeout() from exc
+    finally:
+        if dialect == "sqlite":
+            raw.set_progress_handler(None, 0)
+
+
+def _matching(statement, query, session):
+    """``statement`` (over search_entries) narrowed to entries matching ``query``.
+
+    None if ``query`` has nothing to search for.
+    """
+    if fts_available(session, ENTRY_FTS_TABLE):
+        terms = _prefix_terms(query)
+        if terms is None:
+            return None
+        fts = table(ENTRY_FTS_TABLE, column("rowid"))
+        return statement.join(fts, fts.c.rowid == SearchEntry.id).where(
+            literal_column(ENTRY_FTS_TABLE).op("MATCH")(f"{{title body}} : ({terms})")
+        )
+
+    tokens = _TOKEN.findall(query)
+    if not tokens:
+        return None
+    return statement.where(
+        and_(*(SearchEntry.body.ilike(f"%{token}%") for token in tokens))
+    )
+
+
+def entry_ids(query, kind, session=None):
+    """SELECT of the ids of ``kind`` rows matching ``query``, for use in IN ().
+
+    None if ``query`` has nothing to search for.
+    """
+    session = session or db.session
+    return _matching(
+        select(SearchEntry.object_id).where(SearchEntry.kind == kind), query, session
+    )
+
+
+def _entry_query(query, kinds, owner_id, ranked, session):
+    """SELECT over search_entries for ``query``, or None if it has no tokens"""
+    visible = or_(SearchEntry.kind != "scenario", SearchEntry.owner_id == owner_id)
+    statement = _matching(
+        select(SearchEntry).where(SearchEntry.kind.in_(kinds), visible), query, session
+    )
+    if statement is None or not ranked:
+        return statement
+    if fts_available(session, ENTRY_FTS_TABLE):
+        return statement.order_by(
+            func.bm25(literal_column(ENTRY_FTS_TABLE), *ENTRY_BM25_WEIGHTS),
+            SearchEntry.id,
+        )
+    # Title hits first, then alphabetical
+    first = _TOKEN.findall(query)[0]
+    return statement.order_by(
+        SearchEntry.title.ilike(f"%{first}%").desc(), SearchEntry.title
+    )
+
+
+def omnibox_search(
+    query,
+    kinds=ENTRY_KINDS,
+    owner_id=None,
+    page=1,
+    per_page=20,
+    budget_ms=250,
+    session=None,
+):
+    """One page of search entries matching ``query``, best match first.
+
+    Scenarios are limited to those owned by ``owner_id``. Returns a dict of
+    ``results`` (SearchEntry rows), ``has_more``, ``ranked`` and ``partial``.
+
+    The ranked query gets ``budget_ms``; if it runs out, the rest of the budget
+    goes to an unranked query (first matches in index order), flagged
+    ``ranked: False``. If that times out too, the page is empty and ``partial``.
+    """
+    session = session or db.session
+    started = time.perf_counter()
+    result = {"results": [], "has_more": False, "ranked": True, "partial": False}
+    offset = (page - 1) * per_page
+
+    for ranked in (True, False):
+        remaining = budget_ms - (time.perf_counter() - started) * 1000
+        if remaining <= 0:
+            break
+        statement = _entry_query(query, kinds, owner_id, ranked, session)
+        if statement is None:
+            return result
+        try:
+            with time_budget(session, remaining):
+                rows = (
+                    session.execute(statement.offset(offset).limit(per_page + 1))
+                    .scalars()
+                    .all()
+                )
+        except SearchTimeout:
+            continue
+        result.update(
+            results=rows[:per_page], has_more=len(rows) > per_page, ranked=ranked
+        )
+        return result
+
+    result.update(ranked=False, partial=True)
+    return result
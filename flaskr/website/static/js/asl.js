@@ -67,7 +67,8 @@ $(function () {
           }
 
           if (data.should_reload) {
-            location.reload();
+            // Only re-renders the tables if the data actually changed
+            pollAslData();
           }
         } else {
           alert("Refresh failed: " + data.error);
@@ -147,6 +148,11 @@ $(function () {
     performFrontendSearch(query);
   });
 
+  // Re-apply the current search after the tables are re-rendered
+  $(document).on("asl:updated", function () {
+    $("#search-input").trigger("input");
+  });
+
   function performFrontendSearch(query) {
     let hasResults = false;
 
@@ -262,9 +268,6 @@ $(function () {
 
 $(function () {
   // Handle prescription selection for dispensing
-  const checkboxes = document.querySelectorAll(
-    '#asl-table input[type="checkbox"]'
-  );
   const dispenseButton = document.getElementById("dispense-selected");
 
   // Show/hide dispense button based on selection
@@ -275,10 +278,9 @@ $(function () {
     $(dispenseButton).toggleClass("d-none", checkedBoxes.length === 0);
   }
 
-  // Add event listeners to checkboxes
-  checkboxes.forEach((checkbox) => {
-    checkbox.addEventListener("change", toggleDispenseButton);
-  });
+  // Delegated so rows re-rendered by pollAslData keep working
+  $("#asl-table").on("change", 'input[type="checkbox"]', toggleDispenseButton);
+  $(document).on("asl:updated", toggleDispenseButton);
 
   // Handle dispense button click
   $(dispenseButton).on("click", function () {
@@ -302,6 +304,7 @@ $(function () {
 
         return {
           id: $(this).val(),
+          row_version: $(this).data("row-version"),
           prescribed_date: $cells.eq(1).text().trim(),
           drug_name: drugName,
           dspid: dspid,
@@ -324,8 +327,12 @@ $(function () {
     const container = document.getElementById("selected-prescriptions");
     const prescriptionIds = document.getElementById("prescription-ids");
 
-    // Set prescription IDs
+    // Set prescription IDs, and the versions they were selected at so the
+    // server can refuse to dispense anything changed since
     prescriptionIds.value = prescriptions.map((p) => p.id).join(",");
+    document.getElementById("prescription-versions").value = prescriptions
+      .map((p) => (p.row_version === undefined ? "" : p.row_version))
+      .join(",");
 
     // Create prescription cards
     container.innerHTML = prescriptions
@@ -402,15 +409,20 @@ $(function () {
               .getElementById("dispense-selected")
               .classList.add("d-none");
 
-            // Refresh page to show updated status
-            setTimeout(() => {
-              window.location.reload();
-            }, 1500);
+            // Pull the updated lists (dispensed items move to ALR)
+            pollAslData();
           } else {
             showAlert(
               "error",
               data.message || "Error dispensing prescriptions"
             );
+            if (data.error === "conflict") {
+              // Someone else got there first; show the current lists
+              bootstrap.Modal.getInstance(
+                document.getElementById("dispensingModal")
+              ).hide();
+              pollAslData();
+            }
           }
         })
         .catch((error) => {
@@ -447,3 +459,139 @@ $(function () {
     }, 5000);
   }
 });
+
+
+// Live updates: poll /api/asl/<id> with the last ETag. The server answers an
+// empty 304 until the patient's data_version changes, so this is cheap, and
+// the tables are only re-rendered when something actually changed.
+const ASL_POLL_INTERVAL_MS = 15000;
+let aslEtag = typeof asl_etag !== "undefined" ? asl_etag : null;
+
+function pollAslData() {
+  const headers = {};
+  if (aslEtag) {
+    headers["If-None-Match"] = aslEtag;
+  }
+
+  return fetch(`/api/asl/${pt_id}`, {
+    headers: headers,
+    cache: "no-store",
+    credentials: "same-origin",
+  })
+    .then((response) => {
+      if (response.status === 304 || !response.ok) {
+        return null;
+      }
+      aslEtag = response.headers.get("ETag");
+      return response.json();
+    })
+    .then((data) => {
+      if (data) {
+        applyAslData(data);
+      }
+    })
+    .catch((error) => {
+      console.error("ASL poll failed:", error);
+    });
+}
+
+function applyAslData(data) {
+  // Access granted/revoked changes the whole page layout
+  if (data.can_view_asl !== pt_data.can_view_asl) {
+    location.reload();
+    return;
+  }
+
+  Object.assign(pt_data, data);
+  if (typeof flatted_pt_data !== "undefined") {
+    Object.assign(flatted_pt_data, flatten_dict(pt_data));
+  }
+
+  $("#asl-status, #consent-status").text(data["consent-status"].status);
+  $("#consent-last-updated").text(data["consent-status"]["last-updated"]);
+
+  if (data.can_view_asl) {
+    renderAslRows(data["asl-data"]);
+    renderAlrRows(data["alr-data"]);
+  }
+  $(document).trigger("asl:updated");
+}
+
+function escapeHtml(value) {
+  return $("<div>")
+    .text(value === null || value === undefined ? "" : String(value))
+    .html();
+}
+
+function renderAslRows(items) {
+  // Keep the user's selection across re-renders
+  const checked = new Set(
+    $("#asl-table .prescription-select:checked")
+      .map(function () {
+        return $(this).val();
+      })
+      .get()
+  );
+
+  const rows = items.map(
+    (item) => `
+<tr>
+  <td><input type="checkbox" class="prescription-select" name="prescription_select" value="${escapeHtml(item.prescription_id)}" data-row-version="${escapeHtml(item.row_version)}"${checked.has(String(item.prescription_id)) ? " checked" : ""}></td>
+  <td>${escapeHtml(item["prescribed-date"])}</td>
+  <td>
+    <strong>${escapeHtml(item["drug-name"])}</strong><br>
+    <small class="text-muted">${escapeHtml(item["dose-instr"])}</small><br>
+    <small class="text-muted">Code: ${escapeHtml(item["drug-code"])}</small>
+  </td>
+  <td>${escapeHtml(item["dose-qty"])}</td>
+  <td>
+    ${escapeHtml(item.prescriber.fname)} ${escapeHtml(item.prescriber.lname)}<br>
+    <small class="text-muted">ID: ${escapeHtml(item.prescriber.id)}</small>
+  </td>
+  <td>${escapeHtml(item["dose-rpt"])}</td>
+  <td>${item.paperless ? '<span class="badge bg-success">Yes</span>' : '<span class="badge bg-secondary">No</span>'}</td>
+  <td>
+    <button class="btn btn-sm btn-info" onclick="viewPrescriptionDetails(${Number(item.prescription_id)})">
+      <i class="bi bi-eye"></i>
+    </button>
+  </td>
+</tr>`
+  );
+  $("#asl-table tbody").html(rows.join(""));
+
+  if (typeof updateExportButtonState === "function") {
+    $("#asl-table .prescription-select").on("change", updateExportButtonState);
+    updateExportButtonState();
+  }
+}
+
+function renderAlrRows(items) {
+  const rows = items.map(
+    (alr, index) => `
+<tr id="alr-${index + 1}" class="alr-${alr.paperless ? "paperless" : "paper"}">
+  <td class="alr-date">${escapeHtml(alr["dispensed-date"] || "")}</td>
+  <td class="alr-item">
+    ${escapeHtml(alr["drug-name"])}
+    <p>${escapeHtml(alr["dose-instr"])}</p>
+  </td>
+  <td class="alr-qty">${escapeHtml(alr["dose-qty"])}</td>
+  <td class="alr-prescriber">
+    ${escapeHtml(alr.prescriber.lname)}, ${escapeHtml((alr.prescriber.fname || "").charAt(0))}<br>
+    ${escapeHtml(alr["prescribed-date"])}
+  </td>
+  <td class="alr-rpt">${escapeHtml(alr["remaining-repeats"] ?? "N/A")}</td>
+  <td class="alr-cloud-prescription">
+    <img src="/static/cloud-prescription.svg"/>
+  </td>
+</tr>`
+  );
+  $("#alr-table tbody").html(rows.join(""));
+}
+
+$(function () {
+  setInterval(function () {
+    if (!document.hidden) {
+      pollAslData();
+    }
+  }, ASL_POLL_INTERVAL_MS);
+});
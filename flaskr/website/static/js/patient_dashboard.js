@@ -4,32 +4,12 @@
  * Initialize patient dashboard functionality
  */
 document.addEventListener("DOMContentLoaded", function () {
-  initializeSearch();
   initializeSelectAll();
   initializeIndividualCheckboxes();
   initializeBulkDelete();
   initializeDeleteButtons();
 });
 
-/**
- * Initialize search functionality for patient table
- */
-function initializeSearch() {
-  const searchInput = document.getElementById("patientSearch");
-
-  if (searchInput) {
-    searchInput.addEventListener("input", function () {
-      const searchTerm = this.value.toLowerCase();
-      const rows = document.querySelectorAll("#patientsTable tbody tr");
-
-      rows.forEach(function (row) {
-        const text = row.textContent.toLowerCase();
-        row.style.display = text.includes(searchTerm) ? "" : "none";
-      });
-    });
-  }
-}
-
 /**
  * Initialize select all checkbox functionality
  */
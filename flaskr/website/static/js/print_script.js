@@ -2,116 +2,30 @@ $(function () {
   $("#script-print").click(print_scripts);
 });
 
-const options = {
-  filename: "prescriptions.pdf",
-  margin: 10,
-  image: {
-    type: "jpeg",
-    quality: 0.98,
-  },
-  html2canvas: {
-    scale: 2,
-    logging: false,
-  },
-  jsPDF: {
-    unit: "mm",
-    format: "a4",
-    orientation: "portrait",
-  },
-};
-
-async function get_blank_prescription() {
-  try {
-    const response = await fetch("/prescription");
-    if (!response.ok) throw new Error("Network response was not ok");
-
-    const html = await response.text();
-    const container = document.createElement("div");
-    container.innerHTML = html;
-
-    return container;
-  } catch (error) {
-    console.error("Error fetching content:", error);
+/**
+ * Open the selected ASL scripts (all of them if none are selected) as one
+ * server-rendered print document
+ */
+function print_scripts() {
+  let $boxes = $("#asl-table .prescription-select:checked");
+  if ($boxes.length === 0) {
+    $boxes = $("#asl-table .prescription-select");
   }
-}
-
-async function print_scripts() {
-  // console.log("Print function called");
-  const checkedBoxes = $("#asl-table .asl-check input:checked");
-  let select_all = checkedBoxes.length === 0;
-
-  let $container = $("<div></div>");
-  const prescription_container = await get_blank_prescription();
-  let prescriptionCount = 0;
-
-  $("#asl-table tbody tr").each(function (index) {
-    const $row = $(this);
-    const $checkbox = $row.find(".asl-check input");
-
-    if (select_all || $checkbox.is(":checked")) {
-      // console.log(`Processing prescription ${index}`);
-
-      let presc = prescription_container.cloneNode(true);
-      const rowId = $row.attr("id");
-
-      presc = insert_prescription_details(presc, index);
-
-      let $wrapper = $("<div></div>").append(presc);
-      $wrapper.css({ "break-after": "page", "margin-top": "10px" });
-
-      $container.append($wrapper[0]);
-      prescriptionCount++;
-    }
-  });
 
-  // console.log(`Total prescriptions to print: ${prescriptionCount}`);
+  const ids = $boxes
+    .map(function () {
+      return this.value;
+    })
+    .get();
 
-  if (prescriptionCount === 0) {
+  if (ids.length === 0) {
     alert("No valid prescriptions found to print!");
     return;
   }
 
-  html2pdf().set(options).from($container[0]).save();
+  window.open("/prescriptions/print?ids=" + ids.join(","), "_blank");
 }
 
-const id_list = [
-  "medicare", // now it's single field, not split
-  "pharmaceut-ben-entitlement-no",
-  "sfty-net-entitlement-cardholder",
-  "rpbs-ben-entitlement-cardholder",
-  "name",
-  "dob",
-  "preferred-contact",
-  "address-1",
-  "address-2",
-  "script-date",
-  "pbs",
-  "rpbs",
-];
-
-const drug_info_ids = [
-  "prescriber-fname",
-  "prescriber-lname",
-  "prescriber-title",
-  "prescriber-address-1",
-  "prescriber-address-2",
-  "prescriber-id",
-  "prescriber-hpii",
-  "prescriber-hpio",
-  "prescriber-phone",
-  "prescriber-fax",
-  "DSPID",
-  "status",
-  "brand-sub-not-prmt",
-  "drug-name",
-  "drug-code",
-  "dose-instr",
-  "dose-qty",
-  "dose-rpt",
-  "prescribed-date",
-  "paperless",
-];
-
 function flatten_dict(dict) {
   let new_dict = {};
 
@@ -141,47 +55,3 @@ function flatten_dict(dict) {
 
   return new_dict;
 }
-
-function insert_prescription_details(el, drug_id) {
-  // console.log(`Inserting details for drug_id: ${drug_id}`);
-
-  id_list.forEach((id) => {
-    const $el = $(el).find(`#${id}`);
-    if (pt_data[id] !== undefined) {
-      let data_point = pt_data[id];
-      if (data_point === true) {
-        data_point = "x";
-      } else if (data_point === false) {
-        return;
-      }
-      $el.text(data_point);
-    }
-  });
-
-  // Use asl-data, not asl_data
-  drug_info_ids.forEach((id) => {
-    const $el = $(el).find(`#${id}`);
-    const new_key = `asl-data-${drug_id}-${id}`;
-    if (flatted_pt_data[new_key] !== undefined) {
-      let data_point = flatted_pt_data[new_key];
-      if (data_point === true) {
-        data_point = "x";
-      } else if (data_point === false) {
-        return;
-      }
-      $el.text(data_point);
-    }
-  });
-
-  const $el = $(el).find(`#age`);
-  $el.text(years_old(pt_data["dob"]));
-  return el;
-}
-
-function years_old(dob) {
-  let pt_dob = dob.split("/");
-  let newDate = new Date(pt_dob[2], pt_dob[1] - 1, pt_dob[0]);
-  let timeDifference = Date.now() - newDate;
-  let pt_age = Math.floor(timeDifference / (1000 * 3600 * 24 * 365));
-  return pt_age;
-}
@@ -10,6 +10,8 @@ from flask import (
     current_app,
     send_file,
     send_from_directory,
+    stream_template,
+    Response,
 )
 from flask_login import login_required, current_user
 from .models import (
@@ -25,6 +27,7 @@ from .models import (
     StudentScenario,
     ScenarioPatient,
     Submission,
+    IngestJob,
 )
 from .forms import (
     PatientForm,
@@ -34,12 +37,65 @@ from .forms import (
     ASL_ALR_CreationForm,
     ASL_ALR_PrescriptionSubform,
 )
-from sqlalchemy import or_
-from .converters import ingest_pt_data_contract
+from sqlalchemy import and_, case, false, func, or_, select
+from sqlalchemy.orm import aliased, contains_eager, joinedload, load_only
+from sqlalchemy.orm.exc import StaleDataError
+from .converters import (
+    ContractValidationError,
+    ingest_pt_data_contract,
+    format_date,
+    format_datetime,
+    parse_date,
+    parse_datetime,
+    validate_pt_data,
+)
+from .asl_cache import asl_view_cache, current_data_version
+from .concurrency import (
+    CONFLICT_MESSAGE,
+    VersionConflict,
+    check_version,
+    conflict_response,
+    parse_version,
+)
+from .dispensing import (
+    delete_patient_events,
+    detach_prescriptions,
+    dispense_statement,
+    history_page,
+    record_dispenses,
+)
+from .ingest import (
+    error_details,
+    ingest_ndjson,
+    ingest_summary,
+    job_status,
+    poll_job,
+    submit_job,
+)
+from .patient_import import (
+    IMPORT_COLUMNS,
+    REQUIRED_COLUMNS,
+    ImportFileError,
+    error_report_csv,
+    run_import,
+    template_csv,
+)
+from .printing import (
+    blocked_patient,
+    count_scripts,
+    iter_print_items,
+    print_item,
+    scenario_patients_without_access,
+    scenario_query,
+    selection_query,
+)
+from .query_stats import query_budget
+from .search import ENTRY_KINDS, entry_ids, omnibox_search, search_prescriptions
 from datetime import datetime
 from functools import wraps
 import requests
 import os
+import time
 from pathlib import Path
 from werkzeug.utils import secure_filename
 import csv
@@ -815,6 +871,7 @@ def index():
 
 # Teacher Dashboard
 @views.route("/teacher/dashboard")
+@query_budget(8)
 @teacher_required
 def teacher_dashboard():
     """Teacher dashboard showing all scenarios"""
@@ -830,38 +887,44 @@ def teacher_dashboard():
     total_students = User.query.filter_by(role="student").count()
     total_patients = Patient.query.count()
 
-    # Add submission counts and grading statistics to each scenario
-    for scenario in scenarios:
-        # Count submissions for this scenario by counting submitted StudentScenarios
-        submitted_count = (
-            StudentScenario.query.filter_by(scenario_id=scenario.id)
-            .filter(StudentScenario.status.in_(["submitted", "graded"]))
-            .count()
+    # Submission counts and grading statistics for every scenario in one
+    # GROUP BY query; submissions are only counted, never loaded.
+    submitted_case = case(
+        (StudentScenario.status.in_(["submitted", "graded"]), StudentScenario.id)
+    )
+    graded_case = case((StudentScenario.status == "graded", StudentScenario.id))
+    stats_rows = (
+        db.session.query(
+            StudentScenario.scenario_id,
+            func.count(func.distinct(StudentScenario.id)),
+            func.count(func.distinct(submitted_case)),
+            func.count(func.distinct(graded_case)),
+            func.count(Submission.id),
+            func.max(Submission.submitted_at),
         )
+        .join(Scenario, Scenario.id == StudentScenario.scenario_id)
+        .outerjoin(Submission, Submission.student_scenario_id == StudentScenario.id)
+        .filter(Scenario.teacher_id == current_user.id, Scenario.is_archived == False)
+        .group_by(StudentScenario.scenario_id)
+        .all()
+    )
+    stats = {row[0]: row[1:] for row in stats_rows}
 
-        # Count graded submissions
-        graded_count = StudentScenario.query.filter_by(
-            scenario_id=scenario.id, status="graded"
-        ).count()
-
-        # Count total assigned students
-        total_assigned = StudentScenario.query.filter_by(
-            scenario_id=scenario.id
-        ).count()
-
-        # Get all submissions for this scenario
-        scenario_submissions = (
-            db.session.query(Submission)
-            .join(StudentScenario)
-            .filter(StudentScenario.scenario_id == scenario.id)
-            .all()
-        )
+    for scenario in scenarios:
+        (
+            total_assigned,
+            submitted_count,
+            graded_count,
+            submission_total,
+            latest_submission_at,
+        ) = stats.get(scenario.id, (0, 0, 0, 0, None))
 
         # Add the counts as attributes
         scenario.submission_count = submitted_count
-        scenario.submissions = scenario_submissions
         scenario.graded_count = graded_count
         scenario.total_assigned = total_assigned
+        scenario.submission_total = submission_total
+        scenario.latest_submission_at = latest_submission_at
 
     # Create forms
     form = EmptyForm()
@@ -879,6 +942,7 @@ def teacher_dashboard():
 
 
 @views.route("/student/dashboard")
+@query_budget(5)
 @login_required
 def student_dashboard():
     """Student dashboard showing assigned scenarios"""
@@ -889,42 +953,72 @@ def student_dashboard():
     if hasattr(current_user, 'role') and current_user.role == 'admin':
         return "Access denied: Admin accounts cannot access the student dashboard.", 403
 
-    # Get student's assigned scenarios with submission status (only for students)
-    student_scenarios = []
+    # Get student's assigned scenarios with submission status (only for students).
+    # One query brings back each assignment with its scenario (plus creator and
+    # active patient), the student's assigned patient and the latest submission,
+    # so the page costs the same number of queries however many scenarios exist.
+    rows = []
     if hasattr(current_user, 'role') and current_user.role == 'student':
-        student_scenarios = (
-            StudentScenario.query.join(Scenario)
+        patient_alias = aliased(Patient)
+        ranked = (
+            db.session.query(
+                Submission.id.label("submission_id"),
+                Submission.student_scenario_id,
+                func.row_number()
+                .over(
+                    partition_by=Submission.student_scenario_id,
+                    order_by=(Submission.submitted_at.desc(), Submission.id.desc()),
+                )
+                .label("rn"),
+            )
+            .join(StudentScenario, StudentScenario.id == Submission.student_scenario_id)
+            .filter(StudentScenario.student_id == current_user.id)
+            .subquery()
+        )
+        rows = (
+            db.session.query(StudentScenario, patient_alias, Submission)
+            .join(StudentScenario.scenario)
+            .outerjoin(
+                ScenarioPatient,
+                and_(
+                    ScenarioPatient.scenario_id == StudentScenario.scenario_id,
+                    ScenarioPatient.student_id == StudentScenario.student_id,
+                ),
+            )
+            .outerjoin(patient_alias, patient_alias.id == ScenarioPatient.patient_id)
+            .outerjoin(
+                ranked,
+                and_(ranked.c.student_scenario_id == StudentScenario.id, ranked.c.rn == 1),
+            )
+            .outerjoin(Submission, Submission.id == ranked.c.submission_id)
+            .options(
+                contains_eager(StudentScenario.scenario).joinedload(Scenario.creator),
+                contains_eager(StudentScenario.scenario).joinedload(
+                    Scenario.active_patient
+                ),
+            )
             .filter(
                 StudentScenario.student_id == current_user.id, Scenario.is_archived == False
             )
+            .order_by(StudentScenario.id, ScenarioPatient.id)
             .all()
         )
 
     # Get detailed information for each scenario
     scenario_data = []
-    for ss in student_scenarios:
-        scenario = Scenario.query.get(ss.scenario_id)
-
-        # Find patient assigned to this student for this scenario
-        patient_assignment = ScenarioPatient.query.filter_by(
-            scenario_id=scenario.id, student_id=current_user.id
-        ).first()
+    seen = set()
+    for ss, patient, latest_submission in rows:
+        # Keep the first patient assignment if a student has more than one
+        if ss.id in seen:
+            continue
+        seen.add(ss.id)
+        scenario = ss.scenario
 
-        assigned_patient = None
-        if patient_assignment:
-            assigned_patient = Patient.query.get(patient_assignment.patient_id)
-        else:
-            # Fallback to scenario's active patient if no individual assignment
-            assigned_patient = scenario.active_patient
+        # Fallback to scenario's active patient if no individual assignment
+        assigned_patient = patient or scenario.active_patient
 
-        # Get submission status
-        submissions = (
-            Submission.query.filter_by(student_scenario_id=ss.id)
-            .order_by(Submission.submitted_at.desc())
-            .all()
-            if assigned_patient
-            else []
-        )
+        # Only the latest submission is shown on the dashboard
+        submissions = [latest_submission] if assigned_patient and latest_submission else []
 
         # Determine visibility and submission window based on mode
         from datetime import datetime, timedelta
@@ -1416,23 +1510,33 @@ def bulk_delete_students():
 @views.route("/students/search", methods=["GET"])
 @teacher_required
 def search_students():
-    """Search for students by name or email"""
+    """Search for students by name, email or student number"""
     try:
         query = request.args.get("q", "")
 
         if not query:
             students = User.query.filter_by(role="student", is_active=True).all()
         else:
-            students = User.query.filter(
-                User.role == "student",
-                User.is_active == True,
-                db.or_(
-                    User.first_name.ilike(f"%{query}%"),
-                    User.last_name.ilike(f"%{query}%"),
-                    User.email.ilike(f"%{query}%"),
-                    User.student_id.ilike(f"%{query}%"),
-                ),
-            ).all()
+            page = omnibox_search(
+                query,
+                kinds=("student",),
+                per_page=200,
+                budget_ms=current_app.config["SEARCH_BUDGET_MS"],
+            )
+            ids = [entry.object_id for entry in page["results"]]
+            by_id = {
+                student.id: student
+                for student in User.query.filter(User.id.in_(ids)).all()
+            }
+            students = [by_id[i] for i in ids if i in by_id]
+
+        # Assignment counts in one query instead of one per student
+        counts = dict(
+            db.session.query(StudentScenario.student_id, func.count(StudentScenario.id))
+            .filter(StudentScenario.student_id.in_([s.id for s in students]))
+            .group_by(StudentScenario.student_id)
+            .all()
+        )
 
         results = []
         for student in students:
@@ -1442,12 +1546,8 @@ def search_students():
                     "email": student.email,
                     "first_name": student.first_name,
                     "last_name": student.last_name,
-                    "student_id": student.student_id,
-                    "scenarios_count": (
-                        len(student.assigned_scenarios)
-                        if hasattr(student, "assigned_scenarios")
-                        else 0
-                    ),
+                    "student_id": student.studentnumber,
+                    "scenarios_count": counts.get(student.id, 0),
                 }
             )
 
@@ -1457,6 +1557,66 @@ def search_students():
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+_SEARCH_URLS = {
+    "student": lambda entry: url_for("views.view_student", student_id=entry.object_id),
+    "patient": lambda entry: url_for("views.edit_pt", patient_id=entry.object_id),
+    "scenario": lambda entry: url_for(
+        "views.scenario_dashboard", scenario_id=entry.object_id
+    ),
+}
+
+
+@views.route("/api/search", methods=["GET"])
+@teacher_required
+def omnibox():
+    """Search students, patients and this teacher's scenarios at once.
+
+    ?q=<text>&type=student,patient,scenario&page=1&per_page=20
+    """
+    query = request.args.get("q", "").strip()
+    kinds = [
+        kind
+        for kind in request.args.get("type", ",".join(ENTRY_KINDS)).split(",")
+        if kind in ENTRY_KINDS
+    ]
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = min(max(request.args.get("per_page", 20, type=int), 1), 100)
+    if not query or not kinds:
+        return jsonify({"success": False, "message": "Nothing to search for"}), 400
+
+    started = time.perf_counter()
+    found = omnibox_search(
+        query,
+        kinds=kinds,
+        owner_id=current_user.id,
+        page=page,
+        per_page=per_page,
+        budget_ms=current_app.config["SEARCH_BUDGET_MS"],
+    )
+    return jsonify(
+        {
+            "success": True,
+            "query": query,
+            "results": [
+                {
+                    "type": entry.kind,
+                    "id": entry.object_id,
+                    "title": entry.title,
+                    "subtitle": entry.subtitle,
+                    "url": _SEARCH_URLS[entry.kind](entry),
+                }
+                for entry in found["results"]
+            ],
+            "page": page,
+            "per_page": per_page,
+            "has_more": found["has_more"],
+            "ranked": found["ranked"],
+            "partial": found["partial"],
+            "took_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+    )
+
+
 @views.route("/static/js/<path:filename>")
 def js_module(filename):
     return send_from_directory("static/js", filename, mimetype="application/javascript")
@@ -1475,9 +1635,7 @@ def create_patient():
         patient.given_name = form.basic.givenName.data
         patient.title = form.basic.title.data
         patient.sex = form.basic.sex.data
-        patient.dob = (
-            form.basic.dob.data.strftime("%d/%m/%Y") if form.basic.dob.data else None
-        )
+        patient.dob = form.basic.dob.data
         patient.pt_number = form.basic.ptNumber.data
 
         # Contact
@@ -1536,6 +1694,86 @@ def create_patient():
     return render_template("views/edit_pt.html", form=form, patient=None)
 
 
+@views.route("/patients/import", methods=["GET", "POST"])
+@teacher_required
+def import_patients():
+    """Import patients and their ASL/ALR items from CSV/XLSX (see patient_import.py)"""
+    if request.method == "POST":
+        upload = request.files.get("import_file")
+        if not upload or upload.filename == "":
+            flash("No file selected.", "error")
+            return redirect(url_for("views.import_patients"))
+        try:
+            job = run_import(
+                upload.stream,
+                upload.filename,
+                current_user.id,
+                db.session,
+                chunk_size=current_app.config["INGEST_CHUNK_SIZE"],
+                ttl=current_app.config["INGEST_JOB_TTL"],
+            )
+        except ImportFileError as e:
+            flash(f"Could not import {upload.filename}: {e}", "error")
+            return redirect(url_for("views.import_patients"))
+        return redirect(url_for("views.import_patients_result", job_id=job.id))
+
+    return render_template(
+        "views/import_patients.html",
+        job=None,
+        recent=_recent_imports(),
+        columns=IMPORT_COLUMNS,
+        required=set(REQUIRED_COLUMNS),
+    )
+
+
+def _recent_imports():
+    return (
+        IngestJob.query.filter_by(kind="import", user_id=current_user.id)
+        .order_by(IngestJob.finished_at.desc())
+        .limit(5)
+        .all()
+    )
+
+
+def _own_import(job_id):
+    return IngestJob.query.filter_by(
+        id=job_id, kind="import", user_id=current_user.id
+    ).first_or_404()
+
+
+@views.route("/patients/import/<job_id>")
+@teacher_required
+def import_patients_result(job_id):
+    return render_template(
+        "views/import_patients.html",
+        job=_own_import(job_id),
+        recent=_recent_imports(),
+        columns=IMPORT_COLUMNS,
+        required=set(REQUIRED_COLUMNS),
+    )
+
+
+@views.route("/patients/import/<job_id>/errors.csv")
+@teacher_required
+def import_patients_errors(job_id):
+    job = _own_import(job_id)
+    response = Response(error_report_csv(job.result), mimetype="text/csv")
+    response.headers["Content-Disposition"] = (
+        f"attachment; filename=import_errors_{job.finished_at:%Y-%m-%d_%H%M}.csv"
+    )
+    return response
+
+
+@views.route("/patients/import/template.csv")
+@teacher_required
+def import_patients_template():
+    response = Response(template_csv(), mimetype="text/csv")
+    response.headers["Content-Disposition"] = (
+        "attachment; filename=patient_import_template.csv"
+    )
+    return response
+
+
 @views.route("/patients/edit/<int:patient_id>", methods=["GET", "POST"])
 @teacher_required
 def edit_pt(patient_id):
@@ -1548,9 +1786,7 @@ def edit_pt(patient_id):
         form.basic.givenName.data = patient.given_name
         form.basic.title.data = patient.title
         form.basic.sex.data = patient.sex
-        form.basic.dob.data = (
-            datetime.strptime(patient.dob, "%d/%m/%Y") if patient.dob else None
-        )
+        form.basic.dob.data = patient.dob
         form.basic.ptNumber.data = patient.pt_number
 
         form.basic.suburb.data = patient.suburb
@@ -1594,13 +1830,15 @@ def edit_pt(patient_id):
 
     # --- Save updates on POST ---
     if form.validate_on_submit():
+        # row_version the form was loaded with; reject edits made on a stale copy
+        if parse_version(request.form.get("row_version")) not in (None, patient.row_version):
+            return _edit_pt_conflict(form, patient)
+
         patient.last_name = form.basic.lastName.data
         patient.given_name = form.basic.givenName.data
         patient.title = form.basic.title.data
         patient.sex = form.basic.sex.data
-        patient.dob = (
-            form.basic.dob.data.strftime("%d/%m/%Y") if form.basic.dob.data else None
-        )
+        patient.dob = form.basic.dob.data
         patient.pt_number = form.basic.ptNumber.data
 
         patient.address = request.form.get("basic-address")
@@ -1646,13 +1884,28 @@ def edit_pt(patient_id):
         patient.repeats_held = form.basic.repeatsHeld.data
         patient.pt_deceased = form.basic.ptDeceased.data
 
-        db.session.commit()
+        try:
+            db.session.commit()
+        except StaleDataError:
+            # Saved by someone else between our read and this write
+            db.session.rollback()
+            return _edit_pt_conflict(form, patient)
         flash("Patient updated successfully!", "success")
         return redirect(url_for("views.patient_dashboard"))
 
     return render_template("views/edit_pt.html", form=form, patient=patient)
 
 
+def _edit_pt_conflict(form, patient):
+    """Re-show the submitted form against the current row_version, as a 409"""
+    flash(
+        "This patient was changed by someone else while you were editing. "
+        "Check the details and save again to overwrite their changes.",
+        "error",
+    )
+    return render_template("views/edit_pt.html", form=form, patient=patient), 409
+
+
 @views.route("/show-users")
 def show_users():
     from .models import User
@@ -1716,7 +1969,7 @@ def export_asl_csv(patient_id):
         writer.writerow(["=" * 80])
         writer.writerow([])
         writer.writerow(["Patient Name:", patient.name or ""])
-        writer.writerow(["Date of Birth:", patient.dob or ""])
+        writer.writerow(["Date of Birth:", format_date(patient.dob) or ""])
         writer.writerow(["Address:", patient.address or ""])
         writer.writerow(["Preferred Contact:", patient.preferred_contact or ""])
         writer.writerow(["Medicare Number:", patient.medicare or ""])
@@ -1751,9 +2004,12 @@ def export_asl_csv(patient_id):
             ]
         )
         writer.writerow(
-            ["Consent Last Updated:", patient.consent_last_updated or "N/A"]
+            [
+                "Consent Last Updated:",
+                format_datetime(patient.consent_last_updated) or "N/A",
+            ]
         )
-        writer.writerow(["Script Date:", patient.script_date or ""])
+        writer.writerow(["Script Date:", format_date(patient.script_date) or ""])
         writer.writerow(["PBS:", patient.pbs or ""])
         writer.writerow(["RPBS:", patient.rpbs or ""])
         writer.writerow([])
@@ -1802,7 +2058,7 @@ def export_asl_csv(patient_id):
                         prescription.dose_instr or "",
                         prescription.dose_qty or "",
                         prescription.dose_rpt or "",
-                        prescription.prescribed_date or "",
+                        format_date(prescription.prescribed_date) or "",
                         "Yes" if prescription.paperless else "No",
                         "Yes" if prescription.brand_sub_not_prmt else "No",
                         f"{prescriber.fname} {prescriber.lname}",
@@ -1869,8 +2125,8 @@ def export_asl_csv(patient_id):
                         prescription.dose_qty or "",
                         prescription.dose_rpt or "",
                         prescription.remaining_repeats or "",
-                        prescription.prescribed_date or "",
-                        prescription.dispensed_date or "",
+                        format_date(prescription.prescribed_date) or "",
+                        format_date(prescription.dispensed_date) or "",
                         "Yes" if prescription.paperless else "No",
                         "Yes" if prescription.brand_sub_not_prmt else "No",
                         "Yes" if prescription.dispensed_at_this_pharmacy else "No",
@@ -1905,7 +2161,8 @@ def export_asl_csv(patient_id):
             c if c.isalnum() or c in (" ", "_") else "_" for c in patient.name
         )
         safe_patient_name = safe_patient_name.replace(" ", "_")
-        filename = f"ASL_{safe_patient_name}_{patient.dob.replace('/', '-')}.csv"
+        dob_suffix = patient.dob.strftime("%d-%m-%Y") if patient.dob else "unknown"
+        filename = f"ASL_{safe_patient_name}_{dob_suffix}.csv"
 
         response.headers["Content-Disposition"] = f"attachment; filename={filename}"
         response.headers["Content-Type"] = "text/csv; charset=utf-8"
@@ -1955,7 +2212,7 @@ def export_selected_asl_csv(patient_id):
         writer.writerow(["=" * 80])
         writer.writerow([])
         writer.writerow(["Patient Name:", patient.name or ""])
-        writer.writerow(["Date of Birth:", patient.dob or ""])
+        writer.writerow(["Date of Birth:", format_date(patient.dob) or ""])
         writer.writerow(["Address:", patient.address or ""])
         writer.writerow([])
         writer.writerow([])
@@ -2013,8 +2270,8 @@ def export_selected_asl_csv(patient_id):
                     prescription.dose_qty or "",
                     prescription.dose_rpt or "",
                     prescription.remaining_repeats or "",
-                    prescription.prescribed_date or "",
-                    prescription.dispensed_date or "",
+                    format_date(prescription.prescribed_date) or "",
+                    format_date(prescription.dispensed_date) or "",
                     "Yes" if prescription.paperless else "No",
                     "Yes" if prescription.brand_sub_not_prmt else "No",
                     "Yes" if prescription.dispensed_at_this_pharmacy else "No",
@@ -2055,164 +2312,204 @@ def export_selected_asl_csv(patient_id):
         return redirect(url_for("views.asl", patient_id=patient_id))
 
 
-@views.route("/asl/<int:patient_id>")
-def asl(patient_id: int):
-    """ASL page — ASL-first display. ALR shows only ALR-prescriber items."""
-    try:
-        # Only allow teachers and students
-        if not (hasattr(current_user, 'role') and current_user.role in ['teacher', 'student']):
-            return "Access denied: Only teachers and students can view this page.", 403
-        
-        patient = Patient.query.get_or_404(patient_id)
+def build_asl_pt_data(patient_id):
+    """Assemble the ASL page view-model for a patient (None if missing).
 
-        can_view_asl = patient.can_view_asl()
-        asl_prescriptions = []
-        alr_prescriptions = []
-
-        if can_view_asl:
-            # ASL: show prescriptions written by normal prescribers (not ALR),
-            # excluding fully dispensed items.
-            asl_prescriptions = (
-                db.session.query(Prescription, Prescriber)
-                .join(Prescriber, Prescription.prescriber_id == Prescriber.id)
-                .filter(
-                    Prescription.patient_id == patient_id,
-                    Prescription.DSPID == "asl",  # filter by DSPID
-                    # exclude fully dispensed / zero-repeat items
-                )
-                .all()
+    The result only depends on the patient's rows, not on the viewer, so it is
+    shared through asl_view_cache.
+    """
+    patient = Patient.query.get(patient_id)
+    if patient is None:
+        return None
+
+    can_view_asl = patient.can_view_asl()
+    asl_prescriptions = []
+    alr_prescriptions = []
+
+    if can_view_asl:
+        # ASL: show prescriptions written by normal prescribers (not ALR),
+        # excluding fully dispensed items.
+        asl_prescriptions = (
+            db.session.query(Prescription, Prescriber)
+            .join(Prescriber, Prescription.prescriber_id == Prescriber.id)
+            .filter(
+                Prescription.patient_id == patient_id,
+                Prescription.DSPID == "asl",  # filter by DSPID
+                # exclude fully dispensed / zero-repeat items
             )
+            .all()
+        )
 
-            # ALR: show only prescriptions explicitly moved to ALR (ALR prescriber),
-            # excluding fully dispensed items. This guarantees ASL > ALR priority.
-            alr_prescriptions = (
-                db.session.query(Prescription, Prescriber)
-                .join(Prescriber, Prescription.prescriber_id == Prescriber.id)
-                .filter(
-                    Prescription.patient_id == patient_id,
-                    Prescription.DSPID == "alr",  # filter by DSPID
-                    # exclude fully dispensed / zero-repeat items
-                )
-                .all()
+        # ALR: show only prescriptions explicitly moved to ALR (ALR prescriber),
+        # excluding fully dispensed items. This guarantees ASL > ALR priority.
+        alr_prescriptions = (
+            db.session.query(Prescription, Prescriber)
+            .join(Prescriber, Prescription.prescriber_id == Prescriber.id)
+            .filter(
+                Prescription.patient_id == patient_id,
+                Prescription.DSPID == "alr",  # filter by DSPID
+                # exclude fully dispensed / zero-repeat items
             )
+            .all()
+        )
 
-        # Build template data
-        pt_data = {
-            "medicare": patient.medicare,
-            "pharmaceut-ben-entitlement-no": patient.pharmaceut_ben_entitlement_no,
-            "sfty-net-entitlement-cardholder": patient.sfty_net_entitlement_cardholder,
-            "rpbs-ben-entitlement-cardholder": patient.rpbs_ben_entitlement_cardholder,
-            "name": getattr(patient, "name", None)
-            or f"{patient.given_name or ''} {patient.last_name or ''}".strip(),
-            "dob": patient.dob,
-            "preferred-contact": patient.preferred_contact,
-            "address-1": patient.address or "",
-            "address-2": "",
-            "script-date": patient.script_date,
-            "pbs": patient.pbs,
-            "rpbs": patient.rpbs,
-            "consent-status": {
-                "is-registered": patient.is_registered,
-                "status": patient.get_asl_status().name.replace("_", " ").title(),
-                "last-updated": (
-                    patient.consent_last_updated
-                    if patient.consent_last_updated
-                    else "01/Jan/2000 02:59AM"
-                ),
-            },
-            "asl-data": [],
-            "alr-data": [],
-            "can_view_asl": can_view_asl,
-        }
+    # Build template data
+    pt_data = {
+        "medicare": patient.medicare,
+        "pharmaceut-ben-entitlement-no": patient.pharmaceut_ben_entitlement_no,
+        "sfty-net-entitlement-cardholder": patient.sfty_net_entitlement_cardholder,
+        "rpbs-ben-entitlement-cardholder": patient.rpbs_ben_entitlement_cardholder,
+        "name": getattr(patient, "name", None)
+        or f"{patient.given_name or ''} {patient.last_name or ''}".strip(),
+        "dob": format_date(patient.dob),
+        "preferred-contact": patient.preferred_contact,
+        "address-1": patient.address or "",
+        "address-2": "",
+        "script-date": format_date(patient.script_date),
+        "pbs": patient.pbs,
+        "rpbs": patient.rpbs,
+        "consent-status": {
+            "is-registered": patient.is_registered,
+            "status": patient.get_asl_status().name.replace("_", " ").title(),
+            "last-updated": (
+                format_datetime(patient.consent_last_updated)
+                if patient.consent_last_updated
+                else "01/Jan/2000 02:59AM"
+            ),
+        },
+        "asl-data": [],
+        "alr-data": [],
+        "can_view_asl": can_view_asl,
+    }
 
-        # Populate ASL data
-        for prescription, prescriber in asl_prescriptions:
-            if (
-                hasattr(prescription, "remaining_repeats")
-                and prescription.remaining_repeats == 0
-            ):
-                continue
-            pt_data["asl-data"].append(
-                {
-                    "prescription_id": prescription.id,
-                    "DSPID": "null",
-                    "status": prescription.get_status().name.title(),
-                    "drug-name": prescription.drug_name,
-                    "drug-code": prescription.drug_code,
-                    "dose-instr": prescription.dose_instr,
-                    "dose-qty": prescription.dose_qty,
-                    "dose-rpt": prescription.dose_rpt,
-                    "prescribed-date": prescription.prescribed_date,
-                    "paperless": prescription.paperless,
-                    "brand-sub-not-prmt": prescription.brand_sub_not_prmt,
-                    "prescriber": {
-                        "fname": prescriber.fname,
-                        "lname": prescriber.lname,
-                        "title": prescriber.title,
-                        "address-1": prescriber.address_1,
-                        "address-2": prescriber.address_2,
-                        "id": prescriber.prescriber_id,
-                        "hpii": prescriber.hpii,
-                        "hpio": prescriber.hpio,
-                        "phone": prescriber.phone,
-                        "fax": prescriber.fax,
-                    },
-                }
-            )
+    # Populate ASL data
+    for prescription, prescriber in asl_prescriptions:
+        if (
+            hasattr(prescription, "remaining_repeats")
+            and prescription.remaining_repeats == 0
+        ):
+            continue
+        pt_data["asl-data"].append(
+            {
+                "prescription_id": prescription.id,
+                # Sent back when dispensing so stale selections are rejected
+                "row_version": prescription.row_version,
+                "DSPID": "null",
+                "status": prescription.get_status().name.title(),
+                "drug-name": prescription.drug_name,
+                "drug-code": prescription.drug_code,
+                "dose-instr": prescription.dose_instr,
+                "dose-qty": prescription.dose_qty,
+                "dose-rpt": prescription.dose_rpt,
+                "prescribed-date": format_date(prescription.prescribed_date),
+                "paperless": prescription.paperless,
+                "brand-sub-not-prmt": prescription.brand_sub_not_prmt,
+                "prescriber": {
+                    "fname": prescriber.fname,
+                    "lname": prescriber.lname,
+                    "title": prescriber.title,
+                    "address-1": prescriber.address_1,
+                    "address-2": prescriber.address_2,
+                    "id": prescriber.prescriber_id,
+                    "hpii": prescriber.hpii,
+                    "hpio": prescriber.hpio,
+                    "phone": prescriber.phone,
+                    "fax": prescriber.fax,
+                },
+            }
+        )
 
-        # Populate ALR data
-        for prescription, prescriber in alr_prescriptions:
-            if (
-                hasattr(prescription, "remaining_repeats")
-                and prescription.remaining_repeats == 0
-            ):
-                continue
-            pt_data["alr-data"].append(
-                {
-                    "prescription_id": prescription.id,
-                    "DSPID": "null",
-                    "drug-name": prescription.drug_name,
-                    "drug-code": prescription.drug_code,
-                    "dose-instr": prescription.dose_instr,
-                    "dose-qty": prescription.dose_qty,
-                    "dose-rpt": prescription.dose_rpt,
-                    "prescribed-date": prescription.prescribed_date,
-                    "dispensed-date": prescription.dispensed_date,
-                    "paperless": prescription.paperless,
-                    "brand-sub-not-prmt": prescription.brand_sub_not_prmt,
-                    "remaining-repeats": prescription.remaining_repeats,
-                    "prescriber": {
-                        "fname": prescriber.fname,
-                        "lname": prescriber.lname,
-                        "title": prescriber.title,
-                        "address-1": prescriber.address_1,
-                        "address-2": prescriber.address_2,
-                        "id": prescriber.prescriber_id,
-                        "hpii": prescriber.hpii,
-                        "hpio": prescriber.hpio,
-                        "phone": prescriber.phone,
-                        "fax": prescriber.fax,
-                    },
-                }
-            )
+    # Populate ALR data
+    for prescription, prescriber in alr_prescriptions:
+        if (
+            hasattr(prescription, "remaining_repeats")
+            and prescription.remaining_repeats == 0
+        ):
+            continue
+        pt_data["alr-data"].append(
+            {
+                "prescription_id": prescription.id,
+                "DSPID": "null",
+                "drug-name": prescription.drug_name,
+                "drug-code": prescription.drug_code,
+                "dose-instr": prescription.dose_instr,
+                "dose-qty": prescription.dose_qty,
+                "dose-rpt": prescription.dose_rpt,
+                "prescribed-date": format_date(prescription.prescribed_date),
+                "dispensed-date": format_date(prescription.dispensed_date),
+                "paperless": prescription.paperless,
+                "brand-sub-not-prmt": prescription.brand_sub_not_prmt,
+                "remaining-repeats": prescription.remaining_repeats,
+                "prescriber": {
+                    "fname": prescriber.fname,
+                    "lname": prescriber.lname,
+                    "title": prescriber.title,
+                    "address-1": prescriber.address_1,
+                    "address-2": prescriber.address_2,
+                    "id": prescriber.prescriber_id,
+                    "hpii": prescriber.hpii,
+                    "hpio": prescriber.hpio,
+                    "phone": prescriber.phone,
+                    "fax": prescriber.fax,
+                },
+            }
+        )
 
-        # Carer info and notes
-        from .models import ASL
+    # Carer info and notes
+    from .models import ASL
+
+    asl_record = ASL.query.filter_by(patient_id=patient_id).first()
+    pt_data["carer"] = {
+        "name": asl_record.carer_name if asl_record else "",
+        "relationship": asl_record.carer_relationship if asl_record else "",
+        "mobile": asl_record.carer_mobile if asl_record else "",
+        "email": asl_record.carer_email if asl_record else "",
+    }
+    pt_data["notes"] = asl_record.notes if asl_record else ""
+    asl_names = {a["drug-name"].lower().strip() for a in pt_data["asl-data"]}
+    pt_data["alr-data"] = [
+        a
+        for a in pt_data["alr-data"]
+        if a["drug-name"].lower().strip() not in asl_names
+    ]
+    return pt_data
+
+
+def asl_etag(patient_id, version):
+    """Strong ETag (unquoted) for a patient's ASL data at ``version``"""
+    return f"asl-{patient_id}-{version}"
+
+
+def get_asl_view(patient_id, version=None):
+    """(data_version, pt_data) for a patient, from asl_view_cache when current.
+
+    Returns (None, None) if the patient doesn't exist.
+    """
+    if version is None:
+        version = current_data_version(db.session, patient_id)
+        if version is None:
+            return None, None
+    pt_data = asl_view_cache.get(patient_id, version)
+    if pt_data is None:
+        pt_data = build_asl_pt_data(patient_id)
+        if pt_data is None:
+            return None, None
+        asl_view_cache.put(patient_id, version, pt_data)
+    return version, pt_data
+
+
+@views.route("/asl/<int:patient_id>")
+def asl(patient_id: int):
+    """ASL page — ASL-first display. ALR shows only ALR-prescriber items."""
+    try:
+        # Only allow teachers and students
+        if not (hasattr(current_user, 'role') and current_user.role in ['teacher', 'student']):
+            return "Access denied: Only teachers and students can view this page.", 403
+        
+        version, pt_data = get_asl_view(patient_id)
+        if pt_data is None:
+            return "Patient not found", 404
 
-        asl_record = ASL.query.filter_by(patient_id=patient_id).first()
-        pt_data["carer"] = {
-            "name": asl_record.carer_name if asl_record else "",
-            "relationship": asl_record.carer_relationship if asl_record else "",
-            "mobile": asl_record.carer_mobile if asl_record else "",
-            "email": asl_record.carer_email if asl_record else "",
-        }
-        pt_data["notes"] = asl_record.notes if asl_record else ""
-        asl_names = {a["drug-name"].lower().strip() for a in pt_data["asl-data"]}
-        pt_data["alr-data"] = [
-            a
-            for a in pt_data["alr-data"]
-            if a["drug-name"].lower().strip() not in asl_names
-        ]
         user_role = "teacher" if current_user.is_teacher() else "student"
 
         # Render template and provide both 'patient_id' and legacy 'pt' for compatibility
@@ -2222,12 +2519,41 @@ def asl(patient_id: int):
             pt=patient_id,
             pt_data=pt_data,
             user_role=user_role,
+            # asl.js polls /api/asl/<id> with this as If-None-Match
+            asl_etag=f'"{asl_etag(patient_id, version)}"',
         )
 
     except Exception as e:
         return f"Error loading ASL data: {str(e)}", 500
 
 
+@views.route("/api/asl/<int:patient_id>", methods=["GET"])
+@login_required
+def asl_json(patient_id: int):
+    """pt_data for the ASL page as JSON, with a strong ETag on data_version.
+
+    Clients poll with If-None-Match and get an empty 304 until the patient's
+    ASL/ALR data changes.
+    """
+    if current_user.role not in ["teacher", "student"]:
+        return jsonify({"success": False, "error": "Access denied"}), 403
+
+    version = current_data_version(db.session, patient_id)
+    if version is None:
+        return jsonify({"success": False, "error": "Patient not found"}), 404
+
+    etag = asl_etag(patient_id, version)
+    if request.if_none_match.contains(etag):
+        response = make_response("", 304)
+    else:
+        _, pt_data = get_asl_view(patient_id, version)
+        response = jsonify(pt_data)
+    response.set_etag(etag)
+    # Always revalidate; the ETag makes that a one-row lookup
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
 # API routes with authentication
 @views.route("/api/asl/<int:patient_id>/refresh", methods=["POST"])
 @login_required
@@ -2238,11 +2564,17 @@ def refresh_asl(patient_id: int):
 
         if patient.asl_status == ASLStatus.PENDING.value:
             patient.asl_status = ASLStatus.GRANTED.value
-            patient.consent_last_updated = datetime.now().strftime("%d/%m/%Y %H:%M")
+            patient.consent_last_updated = datetime.now()
 
             updated_count = Prescription.query.filter_by(
                 patient_id=patient_id, status=PrescriptionStatus.PENDING.value
-            ).update({"status": PrescriptionStatus.AVAILABLE.value})
+            ).update(
+                {
+                    "status": PrescriptionStatus.AVAILABLE.value,
+                    # Bulk updates skip version_id_col; bump it by hand
+                    "row_version": Prescription.row_version + 1,
+                }
+            )
 
             db.session.commit()
 
@@ -2257,7 +2589,7 @@ def refresh_asl(patient_id: int):
                         "status": patient.get_asl_status()
                         .name.replace("_", " ")
                         .title(),
-                        "last-updated": patient.consent_last_updated,
+                        "last-updated": format_datetime(patient.consent_last_updated),
                     },
                 }
             )
@@ -2265,7 +2597,13 @@ def refresh_asl(patient_id: int):
         elif patient.asl_status == ASLStatus.GRANTED.value:
             updated_count = Prescription.query.filter_by(
                 patient_id=patient_id, status=PrescriptionStatus.PENDING.value
-            ).update({"status": PrescriptionStatus.AVAILABLE.value})
+            ).update(
+                {
+                    "status": PrescriptionStatus.AVAILABLE.value,
+                    # Bulk updates skip version_id_col; bump it by hand
+                    "row_version": Prescription.row_version + 1,
+                }
+            )
 
             db.session.commit()
 
@@ -2289,6 +2627,9 @@ def refresh_asl(patient_id: int):
                 403,
             )
 
+    except StaleDataError as e:
+        db.session.rollback()
+        return conflict_response(e)
     except Exception as e:
         db.session.rollback()
         return jsonify({"success": False, "error": str(e)}), 500
@@ -2314,7 +2655,7 @@ def request_access(patient_id: int):
             )
 
         patient.asl_status = ASLStatus.PENDING.value
-        patient.consent_last_updated = datetime.now().strftime("%d/%m/%Y %H:%M")
+        patient.consent_last_updated = datetime.now()
 
         db.session.commit()
 
@@ -2325,7 +2666,7 @@ def request_access(patient_id: int):
                 "consent-status": {
                     "is-registered": patient.is_registered,
                     "status": "Pending",
-                    "last-updated": patient.consent_last_updated,
+                    "last-updated": format_datetime(patient.consent_last_updated),
                 },
                 "should_disable_button": True,
             }
@@ -2344,7 +2685,7 @@ def delete_consent(patient_id: int):
         patient = Patient.query.get_or_404(patient_id)
 
         patient.asl_status = ASLStatus.NO_CONSENT.value
-        patient.consent_last_updated = datetime.now().strftime("%d/%m/%Y %H:%M")
+        patient.consent_last_updated = datetime.now()
 
         db.session.commit()
 
@@ -2355,7 +2696,7 @@ def delete_consent(patient_id: int):
                 "consent-status": {
                     "is-registered": patient.is_registered,
                     "status": "No Consent",
-                    "last-updated": patient.consent_last_updated,
+                    "last-updated": format_datetime(patient.consent_last_updated),
                 },
                 "should_reload": True,
             }
@@ -2388,20 +2729,8 @@ def search_asl(patient_id: int):
         if not query:
             return jsonify({"success": False, "error": "Search query required"})
 
-        results = (
-            db.session.query(Prescription, Prescriber)
-            .join(Prescriber, Prescription.prescriber_id == Prescriber.id)
-            .filter(
-                Prescription.patient_id == patient_id,
-                or_(
-                    Prescription.drug_name.ilike(f"%{query}%"),
-                    Prescription.drug_code.ilike(f"%{query}%"),
-                    Prescriber.fname.ilike(f"%{query}%"),
-                    Prescriber.lname.ilike(f"%{query}%"),
-                ),
-            )
-            .all()
-        )
+        # Substring match over this patient's prescriptions (see search.py)
+        results = search_prescriptions(query, patient_id=patient_id)
 
         search_results = []
         for prescription, prescriber in results:
@@ -2412,7 +2741,7 @@ def search_asl(patient_id: int):
                     "drug_code": prescription.drug_code,
                     "prescriber_name": f"{prescriber.lname}, {prescriber.fname}",
                     "status": prescription.get_status().name.title(),
-                    "prescribed_date": prescription.prescribed_date,
+                    "prescribed_date": format_date(prescription.prescribed_date),
                 }
             )
 
@@ -2434,9 +2763,10 @@ def print_selected_prescriptions():
         if not prescription_ids:
             return jsonify({"success": False, "error": "No prescriptions selected"})
 
-        prescriptions = Prescription.query.filter(
-            Prescription.id.in_(prescription_ids)
-        ).all()
+        # Patients and prescribers come back in the same query
+        prescriptions = (
+            db.session.execute(selection_query(prescription_ids)).scalars().all()
+        )
 
         for prescription in prescriptions:
             if not prescription.patient.can_view_asl():
@@ -2450,46 +2780,7 @@ def print_selected_prescriptions():
                     403,
                 )
 
-        print_data = []
-        for prescription in prescriptions:
-            prescriber = prescription.prescriber
-            patient = prescription.patient
-
-            print_item = {
-                "medicare": patient.medicare,
-                "pharmaceut-ben-entitlement-no": patient.pharmaceut_ben_entitlement_no,
-                "sfty-net-entitlement-cardholder": patient.sfty_net_entitlement_cardholder,
-                "rpbs-ben-entitlement-cardholder": patient.rpbs_ben_entitlement_cardholder,
-                "name": patient.name,
-                "dob": patient.dob,
-                "preferred-contact": patient.preferred_contact,
-                "address-1": patient.address or "",
-                "address-2": "",  # Patient model doesn't have address_2
-                "script-date": patient.script_date,
-                "pbs": patient.pbs,
-                "rpbs": patient.rpbs,
-                "prescription_id": prescription.id,
-                "DSPID": "null",
-                "status": prescription.get_status().name.title(),
-                "drug-name": prescription.drug_name,
-                "drug-code": prescription.drug_code,
-                "dose-instr": prescription.dose_instr,
-                "dose-qty": prescription.dose_qty,
-                "dose-rpt": prescription.dose_rpt,
-                "prescribed-date": prescription.prescribed_date,
-                "paperless": prescription.paperless,
-                "brand-sub-not-prmt": prescription.brand_sub_not_prmt,
-                "clinician-name-and-title": f"{prescriber.fname} {prescriber.lname}"
-                + (f" {prescriber.title}" if prescriber.title else ""),
-                "clinician-address-1": prescriber.address_1,
-                "clinician-address-2": prescriber.address_2,
-                "clinician-id": prescriber.prescriber_id,
-                "hpii": prescriber.hpii,
-                "hpio": prescriber.hpio,
-                "clinician-phone": prescriber.phone,
-                "clinician-fax": prescriber.fax,
-            }
-            print_data.append(print_item)
+        print_data = [print_item(prescription) for prescription in prescriptions]
 
         return jsonify(
             {"success": True, "print_data": print_data, "count": len(print_data)}
@@ -2499,6 +2790,58 @@ def print_selected_prescriptions():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+def _stream_print_job(query, title, skipped=0):
+    """Render ``query``'s scripts into one printable page, streamed as it renders"""
+    response = Response(
+        stream_template(
+            "views/prescription/print_job.html",
+            title=title,
+            total=count_scripts(query),
+            skipped=skipped,
+            scripts=iter_print_items(query),
+        ),
+        mimetype="text/html",
+    )
+    # Let reverse proxies pass pages through as they are rendered
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@views.route("/prescriptions/print", methods=["GET"])
+@login_required
+def print_job():
+    """Selected scripts (?ids=1,2,3) as one printable document"""
+    prescription_ids = [
+        int(i) for i in request.args.get("ids", "").split(",") if i.strip().isdigit()
+    ]
+    if not prescription_ids:
+        flash("No prescriptions selected", "error")
+        return redirect(request.referrer or url_for("views.index"))
+
+    blocked = blocked_patient(prescription_ids)
+    if blocked is not None:
+        flash(f"Cannot print - no access to {blocked.name} ASL", "error")
+        return redirect(url_for("views.asl", patient_id=blocked.id))
+
+    return _stream_print_job(selection_query(prescription_ids), "Prescriptions")
+
+
+@views.route("/scenarios/<int:scenario_id>/print", methods=["GET"])
+@teacher_required
+def print_scenario(scenario_id):
+    """Every ASL script of a scenario's patients as one printable document"""
+    scenario = Scenario.query.get_or_404(scenario_id)
+    if scenario.teacher_id != current_user.id:
+        flash("You can only access scenarios you created", "error")
+        return redirect(url_for("views.teacher_dashboard"))
+
+    return _stream_print_job(
+        scenario_query(scenario),
+        f"{scenario.name} - prescriptions",
+        skipped=scenario_patients_without_access(scenario),
+    )
+
+
 @views.route("/api/dispense/<int:patient_id>", methods=["POST"])
 @login_required
 def dispense_prescriptions(patient_id):
@@ -2518,8 +2861,39 @@ def dispense_prescriptions(patient_id):
                 {"success": False, "message": "Dispensed by field is required"}
             )
 
+        try:
+            dispensed_date = parse_date(dispensed_date)
+        except ValueError:
+            return jsonify(
+                {"success": False, "message": "Dispensed date must be DD/MM/YYYY"}
+            )
+
         # Convert prescription IDs to integers
         prescription_ids = [int(pid) for pid in prescription_ids if pid.strip()]
+        # row_version of each selected prescription as the client saw it
+        # (optional; if sent, one per prescription in the same order)
+        versions = [
+            version
+            for version in request.form.get("prescription_versions", "").split(",")
+            if version.strip()
+        ]
+        if versions and len(versions) != len(prescription_ids):
+            return (
+                jsonify(
+                    {
+                        "success": False,
+                        "message": "Send one prescription version per prescription",
+                    }
+                ),
+                400,
+            )
+        expected_versions = dict(zip(prescription_ids, map(parse_version, versions)))
+
+        # Optional whole-patient precondition: If-Match with the ASL ETag
+        if request.if_match:
+            version = current_data_version(db.session, patient_id)
+            if not request.if_match.contains(asl_etag(patient_id, version)):
+                raise VersionConflict(current_version=version)
 
         # Get prescriptions
         prescriptions = Prescription.query.filter(
@@ -2531,102 +2905,70 @@ def dispense_prescriptions(patient_id):
                 {"success": False, "message": "Some prescriptions not found"}
             )
 
-        # Update prescriptions to dispensed status
-        dispensed_count = 0
-
-        # Get ALR prescriber object
-        alr_prescriber = Prescriber.query.filter_by(fname="ALR").first()
-        if not alr_prescriber:
-            alr_prescriber = Prescriber(
-                fname="ALR", lname="System", title="ALR System", prescriber_id="ALR001"
-            )
-            db.session.add(alr_prescriber)
-            db.session.commit()
-
         for prescription in prescriptions:
-            # Check if already dispensed
-            if prescription.status == PrescriptionStatus.DISPENSED.value:
-                continue
-
-            # Update prescription status
-            # Ensure dose_rpt and remaining_repeats are integers (safe coercion)
-            try:
-                dose_rpt = (
-                    int(prescription.dose_rpt)
-                    if prescription.dose_rpt is not None
-                    else 0
-                )
-            except (ValueError, TypeError):
-                dose_rpt = 0
-
-            if prescription.remaining_repeats is None:
-                prescription.remaining_repeats = dose_rpt
+            check_version(
+                prescription.row_version,
+                expected_versions.get(prescription.id),
+                what=f"prescription ({prescription.drug_name})",
+            )
 
-            try:
-                prescription.remaining_repeats = int(prescription.remaining_repeats)
-            except (ValueError, TypeError):
-                prescription.remaining_repeats = 0
+        # Only rows not yet fully dispensed change; the rest are skipped as before
+        to_dispense = [
+            p for p in prescriptions if p.status != PrescriptionStatus.DISPENSED.value
+        ]
 
-            # Decrement remaining repeats safely (never go below zero)
-            if prescription.remaining_repeats > 0:
-                prescription.remaining_repeats = max(
-                    0, prescription.remaining_repeats - 1
-                )
+        # drug_name -> ALR record, for the whole patient in one query
+        existing_alr = {
+            alr.drug_name: alr
+            for alr in Prescription.query.filter_by(patient_id=patient_id, DSPID="alr")
+        }
 
-            # Preserve ALR as an immutable record: if an ALR copy doesn't already exist,
-            # create one now that preserves the original issue info (dose_rpt etc).
+        # Preserve ALR as an immutable record: the first time a drug with
+        # repeats is dispensed, copy its original issue info (dose_rpt etc).
+        # Values come from the rows as read, i.e. before this dispense.
+        for prescription in to_dispense:
             try:
-                original_dose_rpt = (
-                    int(prescription.dose_rpt)
-                    if prescription.dose_rpt is not None
-                    else 0
-                )
+                original_dose_rpt = int(prescription.dose_rpt or 0)
             except (ValueError, TypeError):
                 original_dose_rpt = 0
+            if original_dose_rpt <= 0 or prescription.drug_name in existing_alr:
+                continue
+            alr_copy = Prescription(
+                patient_id=prescription.patient_id,
+                prescriber_id=prescription.prescriber_id,
+                DSPID="alr",
+                status=PrescriptionStatus.DISPENSED.value,
+                brand_sub_not_prmt=prescription.brand_sub_not_prmt,
+                drug_name=prescription.drug_name,
+                drug_code=prescription.drug_code,
+                dose_instr=prescription.dose_instr,
+                dose_qty=prescription.dose_qty,
+                dose_rpt=original_dose_rpt,
+                prescribed_date=prescription.prescribed_date,
+                dispensed_date=prescription.dispensed_date,
+                paperless=prescription.paperless,
+                remaining_repeats=original_dose_rpt,
+                dispensed_at_this_pharmacy=prescription.dispensed_at_this_pharmacy,
+            )
+            db.session.add(alr_copy)
+            existing_alr[prescription.drug_name] = alr_copy
 
-            if original_dose_rpt > 0:
-                # Check whether an ALR copy already exists for this prescription (best-effort)
-                existing_alr = Prescription.query.filter_by(
-                    patient_id=prescription.patient_id,
-                    drug_name=prescription.drug_name,
-                    DSPID="alr",
-                ).first()
-
-                if not existing_alr:
-                    # Create ALR copy preserving original dose_rpt and prescriber
-                    alr_copy = Prescription(
-                        patient_id=prescription.patient_id,
-                        prescriber_id=prescription.prescriber_id,
-                        DSPID="alr",
-                        status=PrescriptionStatus.DISPENSED.value,
-                        brand_sub_not_prmt=prescription.brand_sub_not_prmt,
-                        drug_name=prescription.drug_name,
-                        drug_code=prescription.drug_code,
-                        dose_instr=prescription.dose_instr,
-                        dose_qty=prescription.dose_qty,
-                        dose_rpt=original_dose_rpt,
-                        prescribed_date=prescription.prescribed_date,
-                        dispensed_date=prescription.dispensed_date,
-                        paperless=prescription.paperless,
-                        remaining_repeats=original_dose_rpt,
-                        dispensed_at_this_pharmacy=prescription.dispensed_at_this_pharmacy,
-                    )
-                    db.session.add(alr_copy)
-
-            # Also decrement the stored dose_rpt (the value shown in ASL) so UI updates
-            if original_dose_rpt > 0:
-                prescription.dose_rpt = max(0, original_dose_rpt - 1)
-
-            # If no repeats remain → mark as fully dispensed
-            if prescription.remaining_repeats <= 0:
-                prescription.status = PrescriptionStatus.DISPENSED.value
-
-            prescription.dispensed_date = dispensed_date
-            prescription.dispensed_at_this_pharmacy = True
-            prescription.dispensed_by = dispensed_by
-            prescription.dispensing_notes = dispensing_notes
-
-            dispensed_count += 1
+        dispensed_count = 0
+        if to_dispense:
+            # Ledger entries first, from the values as read
+            record_dispenses(
+                to_dispense,
+                dispensed_date,
+                dispensed_by,
+                dispensing_notes,
+                user_id=current_user.id,
+            )
+            dispensed_count = db.session.execute(
+                dispense_statement(to_dispense, dispensed_date)
+            ).rowcount
+            if dispensed_count != len(to_dispense):
+                # Another request dispensed or edited one of them after we read it
+                raise VersionConflict()
 
         db.session.commit()
 
@@ -2638,6 +2980,10 @@ def dispense_prescriptions(patient_id):
             }
         )
 
+    except (StaleDataError, VersionConflict) as e:
+        # Someone else dispensed or edited one of these since the page loaded
+        db.session.rollback()
+        return conflict_response(e)
     except ValueError as e:
         return jsonify({"success": False, "message": "Invalid prescription IDs"})
     except Exception as e:
@@ -2647,6 +2993,48 @@ def dispense_prescriptions(patient_id):
         )
 
 
+@views.route("/api/dispense/<int:patient_id>/history", methods=["GET"])
+@login_required
+def dispense_history(patient_id):
+    """A page of the patient's dispensing ledger, newest first.
+
+    Query args: ``before`` (cursor from the previous page), ``limit`` (max 200)
+    and optionally ``prescription_id``.
+    """
+    if current_user.role not in ["teacher", "student"]:
+        return jsonify({"success": False, "error": "Access denied"}), 403
+
+    before = request.args.get("before", type=int)
+    limit = min(max(request.args.get("limit", 50, type=int), 1), 200)
+    prescription_id = request.args.get("prescription_id", type=int)
+
+    events, next_before = history_page(
+        patient_id, before=before, limit=limit, prescription_id=prescription_id
+    )
+    return jsonify(
+        {
+            "success": True,
+            "events": [
+                {
+                    "id": e.id,
+                    "prescription_id": e.prescription_id,
+                    "drug_name": e.drug_name,
+                    "dispensed_by": e.dispensed_by,
+                    "dispensing_notes": e.dispensing_notes,
+                    "dispensed_date": format_date(e.dispensed_date),
+                    "recorded_at": format_datetime(e.created_at),
+                    "repeats_before": e.repeats_before,
+                    "repeats_after": e.repeats_after,
+                    "fully_dispensed": e.status_after
+                    == PrescriptionStatus.DISPENSED.value,
+                }
+                for e in events
+            ],
+            "next_before": next_before,
+        }
+    )
+
+
 @views.route("/prescription")
 @login_required
 def prescription():
@@ -2991,34 +3379,108 @@ def unassign_all_students(scenario_id):
     return redirect(url_for("views.scenario_dashboard", scenario_id=scenario_id))
 
 
+# patient_dashboard ?sort= keys -> ORDER BY columns (ties broken by id)
+PATIENT_SORTS = {
+    "name": (Patient.last_name, Patient.given_name),
+    "dob": (Patient.dob,),
+    "medicare": (Patient.medicare,),
+    "status": (Patient.asl_status,),
+}
+
+# patient_dashboard ?status= values
+PATIENT_STATUS_FILTERS = {
+    "granted": ASLStatus.GRANTED,
+    "pending": ASLStatus.PENDING,
+    "rejected": ASLStatus.REJECTED,
+    "no_consent": ASLStatus.NO_CONSENT,
+}
+
+
 @views.route("/patients", methods=["GET"])
 @teacher_required
 def patient_dashboard():
-    patients = Patient.query.all()
+    """One page of patients: ?q=&status=&sort=&dir=&page=&per_page="""
+    search = request.args.get("q", "").strip()
+    status = request.args.get("status", "")
+    status = status if status in PATIENT_STATUS_FILTERS else ""
+    sort = request.args.get("sort", "name")
+    sort = sort if sort in PATIENT_SORTS else "name"
+    direction = "desc" if request.args.get("dir") == "desc" else "asc"
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = min(max(request.args.get("per_page", 50, type=int), 1), 200)
     delete_form = DeleteForm()  # one form instance reused
 
-    # Calculate ASL statistics
-    asl_granted_count = sum(1 for patient in patients if patient.can_view_asl())
-    asl_pending_count = sum(
-        1 for patient in patients if patient.asl_status == ASLStatus.PENDING.value
+    # Calculate ASL statistics in one GROUP BY
+    status_counts = dict(
+        db.session.query(Patient.asl_status, func.count(Patient.id))
+        .group_by(Patient.asl_status)
+        .all()
     )
-    asl_rejected_count = sum(
-        1 for patient in patients if patient.asl_status == ASLStatus.REJECTED.value
+    total_patients = sum(status_counts.values())
+
+    query = select(Patient).options(
+        load_only(
+            Patient.title,
+            Patient.given_name,
+            Patient.last_name,
+            Patient.dob,
+            Patient.medicare,
+            Patient.address,
+            Patient.asl_status,
+        )
     )
-    no_consent_count = sum(
-        1 for patient in patients if patient.asl_status == ASLStatus.NO_CONSENT.value
+    if status:
+        query = query.where(Patient.asl_status == PATIENT_STATUS_FILTERS[status].value)
+    if search:
+        matching = entry_ids(search, "patient")
+        query = query.where(
+            Patient.id.in_(matching) if matching is not None else false()
+        )
+    order = [
+        column.desc() if direction == "desc" else column.asc()
+        for column in PATIENT_SORTS[sort] + (Patient.id,)
+    ]
+
+    # Without a text search the total is already known from the counts
+    patients = db.paginate(
+        query.order_by(*order),
+        page=page,
+        per_page=per_page,
+        error_out=False,
+        count=bool(search),
     )
+    if not search:
+        patients.total = (
+            status_counts.get(PATIENT_STATUS_FILTERS[status].value, 0)
+            if status
+            else total_patients
+        )
+
+    def patients_url(**changes):
+        """This page's URL with some query args changed (None drops one)"""
+        args = {**request.args.to_dict(), **changes}
+        return url_for(
+            "views.patient_dashboard",
+            **{key: value for key, value in args.items() if value not in (None, "")},
+        )
 
     return render_template(
         "views/patient_dash.html",
         patients=patients,
+        patients_url=patients_url,
+        search=search,
+        status=status,
+        sort=sort,
+        direction=direction,
         delete_form=delete_form,
-        asl_granted_count=asl_granted_count,
-        asl_pending_count=asl_pending_count,
-        asl_rejected_count=asl_rejected_count,
-        no_consent_count=no_consent_count,
+        total_patients=total_patients,
+        asl_granted_count=status_counts.get(ASLStatus.GRANTED.value, 0),
+        asl_pending_count=status_counts.get(ASLStatus.PENDING.value, 0),
+        asl_rejected_count=status_counts.get(ASLStatus.REJECTED.value, 0),
+        no_consent_count=status_counts.get(ASLStatus.NO_CONSENT.value, 0),
     )
 
+
 @views.route("/patients/duplicate/<int:patient_id>", methods=["GET", "POST"])
 @teacher_required
 def duplicate_patient(patient_id):
@@ -3057,7 +3519,9 @@ def delete_patient(patient_id):
 
             # Delete related records first to avoid foreign key constraint errors
 
-            # 1. Delete all prescriptions for this patient
+            # 1. Delete all prescriptions for this patient, and their dispensing
+            # history (SQLite doesn't enforce the foreign keys and reuses ids)
+            delete_patient_events(patient_id)
             Prescription.query.filter_by(patient_id=patient_id).delete()
 
             # 2. Delete ASL records for this patient
@@ -3118,7 +3582,9 @@ def bulk_delete_patients():
             try:
                 # Delete related records first to avoid foreign key constraint errors
 
-                # 1. Delete all prescriptions for this patient
+                # 1. Delete all prescriptions for this patient, and their
+                # dispensing history (SQLite doesn't enforce the foreign keys)
+                delete_patient_events(patient.id)
                 Prescription.query.filter_by(patient_id=patient.id).delete()
 
                 # 2. Delete ASL records for this patient
@@ -3395,16 +3861,21 @@ def asl_ingest():
     try:
         pt_data = request.get_json(force=True)
         result = ingest_pt_data_contract(pt_data, db.session, commit=True)
+        return (
+            jsonify({"status": "success", **ingest_summary(result)}),
+            # A resent contract creates nothing
+            200 if result.unchanged else 201,
+        )
+    except ContractValidationError as e:
         return (
             jsonify(
                 {
-                    "status": "success",
-                    "patient_id": result.patient.id,
-                    "created_prescriptions": result.created_prescriptions,
-                    "is_new_patient": result.is_new_patient,
+                    "status": "error",
+                    "message": str(e),
+                    "errors": error_details(e.errors),
                 }
             ),
-            201,
+            400,
         )
     except Exception as e:
         import traceback
@@ -3414,6 +3885,78 @@ def asl_ingest():
         return jsonify({"status": "error", "message": str(e)}), 400
 
 
+@views.route("/asl/ingest/batch", methods=["POST"])
+def asl_ingest_batch():
+    """Ingest many contracts from an NDJSON body, one per line (see ingest.py)"""
+    chunk_size = request.args.get(
+        "chunk_size", current_app.config["INGEST_CHUNK_SIZE"], type=int
+    )
+    results = ingest_ndjson(request.stream, db.session, chunk_size=max(chunk_size, 1))
+    failed = sum(1 for result in results if result["status"] == "error")
+    if not failed:
+        status = "success"
+    elif failed == len(results):
+        status = "error"
+    else:
+        status = "partial"
+    return jsonify(
+        {
+            "status": status,
+            "total": len(results),
+            "succeeded": len(results) - failed,
+            "failed": failed,
+            "results": results,
+        }
+    )
+
+
+@views.route("/asl/ingest/jobs", methods=["POST"])
+def asl_ingest_job():
+    """Queue one contract for background ingest and return its job (see ingest.py)"""
+    pt_data = request.get_json(force=True, silent=True)
+    # Validation is cheap and needs no database, so bad contracts fail now
+    try:
+        validate_pt_data(pt_data)
+    except ContractValidationError as e:
+        return (
+            jsonify(
+                {
+                    "status": "error",
+                    "message": str(e),
+                    "errors": error_details(e.errors),
+                }
+            ),
+            400,
+        )
+
+    job_id = submit_job(pt_data)
+    if job_id is None:
+        response = jsonify(
+            {"status": "error", "message": "Ingest queue is full, try again later"}
+        )
+        response.status_code = 503
+        response.headers["Retry-After"] = str(current_app.config["INGEST_RETRY_AFTER"])
+        return response
+
+    status_url = url_for("views.asl_ingest_job_status", job_id=job_id)
+    response = jsonify(
+        {"status": "accepted", "job_id": job_id, "status_url": status_url}
+    )
+    response.status_code = 202
+    response.headers["Location"] = status_url
+    return response
+
+
+@views.route("/asl/ingest/jobs/<job_id>")
+def asl_ingest_job_status(job_id):
+    """State of a background ingest, with its outcome once finished"""
+    # Teachers' spreadsheet imports are only shown to them (import_patients)
+    job = poll_job(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Ingest job not found"}), 404
+    return jsonify({"status": "success", **job_status(job)})
+
+
 @views.route("/asl/form/<int:patient_id>", methods=["GET", "POST"])
 def asl_form(patient_id):
     """ASL form - pre-populate with patient data"""
@@ -3440,7 +3983,7 @@ def asl_form(patient_id):
                 "status": (
                     patient.get_asl_status().name if patient.get_asl_status() else ""
                 ),
-                "last_updated": patient.consent_last_updated,
+                "last_updated": format_datetime(patient.consent_last_updated),
             },
             "asl_creations": [],
             "alr_creations": [],
@@ -3462,8 +4005,8 @@ def asl_form(patient_id):
                 "prescription_id": prescription.id,
                 "DSPID": prescription.DSPID,
                 "status": prescription.get_status().name,
-                "prescribed_date": prescription.prescribed_date,
-                "dispensed_date": getattr(prescription, "dispensed_date", None),
+                "prescribed_date": format_date(prescription.prescribed_date),
+                "dispensed_date": format_date(prescription.dispensed_date),
                 "drug_name": prescription.drug_name,
                 "drug_code": prescription.drug_code,
                 "dose_instr": prescription.dose_instr,
@@ -3481,17 +4024,30 @@ def asl_form(patient_id):
 
         form = ASL_ALR_CreationForm(data=data)
 
+    conflict = False
     if form.validate_on_submit():
         try:
+            # The form replaces every prescription, so compare the whole-patient
+            # data_version (the ASL ETag version) rather than just the patient row
+            check_version(
+                patient.data_version,
+                parse_version(request.form.get("data_version")),
+                what="patient's ASL",
+            )
+
             # Update patient info
             patient.is_registered = form.consent_status.is_registered.data == "true"
             patient.asl_status = ASLStatus[form.consent_status.status.data].value
-            patient.consent_last_updated = form.consent_status.last_updated.data
+            patient.consent_last_updated = parse_datetime(
+                form.consent_status.last_updated.data
+            )
 
             # Process ASL prescriptions
             from .models import ASL, Prescription, Prescriber
 
             ASL.query.filter_by(patient_id=patient_id).delete()
+            # Dispensing history outlives the rows, but not their ids
+            detach_prescriptions(patient_id)
             Prescription.query.filter_by(patient_id=patient_id).delete()
 
             for subform, presc_type in (
@@ -3517,6 +4073,11 @@ def asl_form(patient_id):
                     if bool_field in presc_data:
                         presc_data[bool_field] = presc_data[bool_field] == "true"
 
+                # DD/MM/YYYY form input -> native dates
+                for date_field in ["prescribed_date", "dispensed_date"]:
+                    if date_field in presc_data:
+                        presc_data[date_field] = parse_date(presc_data[date_field])
+
                 prescription = Prescription(
                     patient_id=patient_id,
                     prescriber_id=prescriber.id,
@@ -3530,6 +4091,14 @@ def asl_form(patient_id):
 
             asls = ASL.query.filter_by(patient_id=patient_id).all()
             return redirect(url_for("views.asl_form", patient_id=patient_id))
+        except (StaleDataError, VersionConflict) as e:
+            db.session.rollback()
+            conflict = True
+            flash(
+                getattr(e, "message", CONFLICT_MESSAGE)
+                + " Saving again will overwrite their changes.",
+                "error",
+            )
         except Exception as e:
             db.session.rollback()
             flash(f"Error saving form: {str(e)}", "error")
@@ -3537,7 +4106,7 @@ def asl_form(patient_id):
     empty_asl_alr_form = ASL_ALR_PrescriptionSubform()
     return render_template(
         "views/asl_form.html", patient=patient, form=form, empty_form=empty_asl_alr_form
-    )
+    ), (409 if conflict else 200)
 
 
 @views.route("/help")
@@ -3682,7 +4251,7 @@ def submit_work(scenario_id, patient_id):
             "patient_data": {
                 "medicare": patient.medicare,
                 "name": patient.name,
-                "dob": patient.dob,
+                "dob": format_date(patient.dob),
                 "address": patient.address,
                 "phone": patient.phone,
                 "asl_status": patient.asl_status,
@@ -3767,6 +4336,7 @@ def submit_work(scenario_id, patient_id):
 
 
 @views.route("/scenarios/<int:scenario_id>/submissions")
+@query_budget(6)
 @teacher_required
 def view_submissions(scenario_id):
     """Teacher views all submissions for a scenario"""
@@ -3782,8 +4352,36 @@ def view_submissions(scenario_id):
     # Optional submission presence filter (submitted, unsubmitted, all)
     submission_filter = request.args.get("submitted")
 
-    # Get all student scenarios with submissions
-    student_scenarios_q = StudentScenario.query.filter_by(scenario_id=scenario_id)
+    # Latest submission per student_scenario (newest first), ranked in SQL so
+    # every student comes back with their latest submission in one statement
+    ranked = (
+        db.session.query(
+            Submission.id.label("submission_id"),
+            Submission.student_scenario_id,
+            func.row_number()
+            .over(
+                partition_by=Submission.student_scenario_id,
+                order_by=(Submission.submitted_at.desc(), Submission.id.desc()),
+            )
+            .label("rn"),
+        )
+        .join(StudentScenario, StudentScenario.id == Submission.student_scenario_id)
+        .filter(StudentScenario.scenario_id == scenario_id)
+        .subquery()
+    )
+
+    # Get all student scenarios with their student and latest submission
+    student_scenarios_q = (
+        db.session.query(StudentScenario, User, Submission)
+        .outerjoin(User, User.id == StudentScenario.student_id)
+        .outerjoin(
+            ranked,
+            and_(ranked.c.student_scenario_id == StudentScenario.id, ranked.c.rn == 1),
+        )
+        .outerjoin(Submission, Submission.id == ranked.c.submission_id)
+        .options(joinedload(Submission.patient))
+        .filter(StudentScenario.scenario_id == scenario_id)
+    )
 
     if status_filter and status_filter != "all":
         if status_filter == "graded":
@@ -3817,30 +4415,27 @@ def view_submissions(scenario_id):
                     | (StudentScenario.grade_published == None)
                 )
 
-    # Evaluate the query
-    student_scenarios = student_scenarios_q.all()
-
-    submissions_data = []
-    for ss in student_scenarios:
-        student = User.query.get(ss.student_id)
-        # Only include the latest submission for teachers (newest first)
-        latest = (
-            Submission.query.filter_by(student_scenario_id=ss.id)
-            .order_by(Submission.submitted_at.desc())
-            .first()
+    # Apply submission presence filter if provided
+    if submission_filter == "submitted":
+        student_scenarios_q = student_scenarios_q.filter(
+            ranked.c.submission_id != None
+        )
+    elif submission_filter == "unsubmitted":
+        student_scenarios_q = student_scenarios_q.filter(
+            ranked.c.submission_id == None
         )
-        submissions = [latest] if latest else []
 
-        # Apply submission presence filter if provided
-        if submission_filter and submission_filter != "all":
-            if submission_filter == "submitted" and not latest:
-                continue
-            if submission_filter == "unsubmitted" and latest:
-                continue
+    # Evaluate the query
+    rows = student_scenarios_q.order_by(StudentScenario.id).all()
 
-        submissions_data.append(
-            {"student_scenario": ss, "student": student, "submissions": submissions}
-        )
+    submissions_data = [
+        {
+            "student_scenario": ss,
+            "student": student,
+            "submissions": [latest] if latest else [],
+        }
+        for ss, student, latest in rows
+    ]
 
     form = EmptyForm()
     return render_template(
@@ -4393,7 +4988,8 @@ def export_scenario_students(scenario_id):
                     student.id,
                     student.get_full_name(),
                     student.email,
-                    student.phone or "",
+                    # User has no phone column; keep the CSV layout stable
+                    getattr(student, "phone", None) or "",
                     student_scenario.status.capitalize(),
                     (
                         student_scenario.assigned_at.strftime("%Y-%m-%d")
@@ -3,57 +3,68 @@
 Database migration script to add student_id and assigned_at columns to scenario_patients table
 """
 
-import sqlite3
 import os
-from datetime import datetime
 
-# Path to the database file
+from sqlalchemy import DateTime, Integer, create_engine, inspect, text
+
+# Path to the default SQLite database file
 DB_PATH = os.path.join(
     os.path.dirname(__file__), "flaskr", "instance", "asl_simulation.db"
 )
 
 
+def get_database_url():
+    """Same backend as the app: DATABASE_URL if set, otherwise the SQLite file"""
+    return os.environ.get("DATABASE_URL") or f"sqlite:///{DB_PATH}"
+
+
 def migrate_database():
-    # print(f"Migrating database at: {DB_PATH}")
+    # print(f"Migrating database at: {get_database_url()}")
 
-    # Connect to the database
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    engine = create_engine(get_database_url())
+    # Column types compiled for whichever backend we are connected to
+    integer_type = Integer().compile(dialect=engine.dialect)
+    datetime_type = DateTime().compile(dialect=engine.dialect)
 
     try:
-        # Check if student_id column exists
-        cursor.execute("PRAGMA table_info(scenario_patients)")
-        columns = [column[1] for column in cursor.fetchall()]
-
-        if "student_id" not in columns:
-            # print("Adding student_id column to scenario_patients table...")
-            cursor.execute(
-                "ALTER TABLE scenario_patients ADD COLUMN student_id INTEGER"
-            )
-            # print("student_id column added")
-        else:
-            pass
-            # print("student_id column already exists")
-
-        if "assigned_at" not in columns:
-            # print("Adding assigned_at column to scenario_patients table...")
-            cursor.execute(
-                "ALTER TABLE scenario_patients ADD COLUMN assigned_at DATETIME"
-            )
-            # print("assigned_at column added")
-        else:
-            pass
-            # print("assigned_at column already exists")
-
-        # Commit the changes
-        conn.commit()
+        with engine.begin() as conn:
+            # Check if student_id column exists
+            columns = [
+                column["name"]
+                for column in inspect(conn).get_columns("scenario_patients")
+            ]
+
+            if "student_id" not in columns:
+                # print("Adding student_id column to scenario_patients table...")
+                conn.execute(
+                    text(
+                        f"ALTER TABLE scenario_patients ADD COLUMN student_id {integer_type}"
+                    )
+                )
+                # print("student_id column added")
+            else:
+                pass
+                # print("student_id column already exists")
+
+            if "assigned_at" not in columns:
+                # print("Adding assigned_at column to scenario_patients table...")
+                conn.execute(
+                    text(
+                        f"ALTER TABLE scenario_patients ADD COLUMN assigned_at {datetime_type}"
+                    )
+                )
+                # print("assigned_at column added")
+            else:
+                pass
+                # print("assigned_at column already exists")
+
         # print("Database migration completed successfully!")
 
     except Exception as e:
         # print(f"Error during migration: {e}")
-        conn.rollback()
+        pass
     finally:
-        conn.close()
+        engine.dispose()
 
 
 if __name__ == "__main__":
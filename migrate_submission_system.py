@@ -2,101 +2,173 @@
 """
 Database migration script to add submission system fields to existing database.
 Run this script to update your database schema for the submission and grading system.
+Works against SQLite (default) or any backend given in DATABASE_URL.
 """
 
-import sqlite3
 import os
-from datetime import datetime
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    create_engine,
+    func,
+    inspect,
+    text,
+)
+from sqlalchemy.exc import SQLAlchemyError
+
+
+def get_database_url():
+    """Same backend as the app: DATABASE_URL if set, otherwise the SQLite file"""
+    if os.environ.get("DATABASE_URL"):
+        return os.environ["DATABASE_URL"]
+    return "sqlite:///" + os.path.join("flaskr", "instance", "asl_simulation.db")
 
 
 def migrate_database():
     """Add new columns for the submission system to existing database"""
 
-    # Path to the database
-    db_path = os.path.join("flaskr", "instance", "asl_simulation.db")
+    database_url = get_database_url()
 
-    if not os.path.exists(db_path):
-        # print(f"Database not found at {db_path}")
+    if database_url.startswith("sqlite:///") and not os.path.exists(
+        database_url[len("sqlite:///") :]
+    ):
+        # print(f"Database not found at {database_url}")
         # print("Make sure you're running this from the project root directory.")
         return False
 
+    engine = create_engine(database_url)
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
-        # print("Starting database migration for submission system...")
-
-        # Check if student_scenarios table exists
-        cursor.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name='student_scenarios';"
-        )
-        if not cursor.fetchone():
-            # print("student_scenarios table not found. Creating tables...")
-            create_missing_tables(cursor)
-        else:
-            # print("student_scenarios table found. Adding missing columns...")
-            add_missing_columns(cursor)
-
-        # Check if submissions table exists
-        cursor.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name='submissions';"
-        )
-        if not cursor.fetchone():
-            # print("Creating submissions table...")
-            cursor.execute(
-                """
-                CREATE TABLE submissions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    student_scenario_id INTEGER NOT NULL,
-                    patient_id INTEGER NOT NULL,
-                    submitted_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    submission_data TEXT,
-                    notes TEXT,
-                    FOREIGN KEY (student_scenario_id) REFERENCES student_scenarios (id),
-                    FOREIGN KEY (patient_id) REFERENCES patients (id)
-                )
-            """
-            )
-            # print("submissions table created")
-
-        conn.commit()
+        with engine.begin() as conn:
+            # print("Starting database migration for submission system...")
+
+            # Check if student_scenarios table exists
+            if not inspect(conn).has_table("student_scenarios"):
+                # print("student_scenarios table not found. Creating tables...")
+                create_missing_tables(conn)
+            else:
+                # print("student_scenarios table found. Adding missing columns...")
+                add_missing_columns(conn)
+
+            # Check if submissions table exists
+            if not inspect(conn).has_table("submissions"):
+                # print("Creating submissions table...")
+                metadata = _reflect_parents(conn)
+                _submissions_table(metadata).create(conn)
+                # print("submissions table created")
+
         # print("Database migration completed successfully!")
         return True
 
-    except sqlite3.Error as e:
+    except SQLAlchemyError as e:
         # print(f"Database error: {e}")
         return False
     except Exception as e:
         # print(f"Unexpected error: {e}")
         return False
     finally:
-        if conn:
-            conn.close()
+        engine.dispose()
+
+
+def _reflect_parents(conn):
+    """Reflect the referenced tables so foreign keys compile on every backend"""
+    existing = set(inspect(conn).get_table_names())
+    metadata = MetaData()
+    metadata.reflect(
+        bind=conn,
+        only=[
+            name
+            for name in ("users", "scenarios", "patients", "student_scenarios")
+            if name in existing
+        ],
+    )
+    return metadata
+
+
+def _student_scenarios_table(metadata):
+    return Table(
+        "student_scenarios",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("student_id", Integer, ForeignKey("users.id"), nullable=False),
+        Column("scenario_id", Integer, ForeignKey("scenarios.id"), nullable=False),
+        Column("assigned_at", DateTime, server_default=func.current_timestamp()),
+        Column("submitted_at", DateTime),
+        Column("completed_at", DateTime),
+        Column("score", Float),
+        Column("feedback", Text),
+        Column("status", String(20), server_default="assigned"),
+    )
+
+
+def _scenario_patients_table(metadata):
+    return Table(
+        "scenario_patients",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("scenario_id", Integer, ForeignKey("scenarios.id"), nullable=False),
+        Column("student_id", Integer, ForeignKey("users.id")),
+        Column("patient_id", Integer, ForeignKey("patients.id"), nullable=False),
+        Column("assigned_at", DateTime, server_default=func.current_timestamp()),
+    )
 
 
-def add_missing_columns(cursor):
+def _submissions_table(metadata):
+    return Table(
+        "submissions",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column(
+            "student_scenario_id",
+            Integer,
+            ForeignKey("student_scenarios.id"),
+            nullable=False,
+        ),
+        Column("patient_id", Integer, ForeignKey("patients.id"), nullable=False),
+        Column("submitted_at", DateTime, server_default=func.current_timestamp()),
+        Column("submission_data", Text),
+        Column("notes", Text),
+    )
+
+
+def add_missing_columns(conn):
     """Add missing columns to existing student_scenarios table"""
 
     # Get current columns
-    cursor.execute("PRAGMA table_info(student_scenarios)")
-    existing_columns = [row[1] for row in cursor.fetchall()]
+    existing_columns = [
+        column["name"] for column in inspect(conn).get_columns("student_scenarios")
+    ]
     # print(f"Existing columns: {existing_columns}")
 
-    # Add missing columns one by one
+    # Add missing columns one by one, with types compiled for the connected backend
     columns_to_add = [
-        ("submitted_at", "DATETIME"),
-        ("feedback", "TEXT"),
-        ("status", "VARCHAR(20) DEFAULT 'assigned'"),
+        ("submitted_at", DateTime().compile(dialect=conn.dialect)),
+        ("feedback", Text().compile(dialect=conn.dialect)),
+        (
+            "status",
+            String(20).compile(dialect=conn.dialect) + " DEFAULT 'assigned'",
+        ),
     ]
 
     for column_name, column_type in columns_to_add:
         if column_name not in existing_columns:
             try:
-                cursor.execute(
-                    f"ALTER TABLE student_scenarios ADD COLUMN {column_name} {column_type}"
-                )
+                # Savepoint so one failed ALTER doesn't abort the transaction
+                with conn.begin_nested():
+                    conn.execute(
+                        text(
+                            f"ALTER TABLE student_scenarios ADD COLUMN {column_name} {column_type}"
+                        )
+                    )
                 # print(f"Added column: {column_name}")
-            except sqlite3.Error as e:
+            except SQLAlchemyError as e:
                 pass
                 # print(f" Could not add {column_name}: {e}")
         else:
@@ -104,55 +176,28 @@ def add_missing_columns(cursor):
             # print(f"Column {column_name} already exists")
 
 
-def create_missing_tables(cursor):
+def create_missing_tables(conn):
     """Create missing tables if they don't exist"""
 
+    metadata = _reflect_parents(conn)
+
     # Create student_scenarios table
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS student_scenarios (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER NOT NULL,
-            scenario_id INTEGER NOT NULL,
-            assigned_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            submitted_at DATETIME,
-            completed_at DATETIME,
-            score REAL,
-            feedback TEXT,
-            status VARCHAR(20) DEFAULT 'assigned',
-            FOREIGN KEY (student_id) REFERENCES users (id),
-            FOREIGN KEY (scenario_id) REFERENCES scenarios (id)
-        )
-    """
-    )
+    _student_scenarios_table(metadata).create(conn, checkfirst=True)
     # print("student_scenarios table created")
 
     # Create scenario_patients table if it doesn't exist
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS scenario_patients (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            scenario_id INTEGER NOT NULL,
-            student_id INTEGER,
-            patient_id INTEGER NOT NULL,
-            assigned_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (scenario_id) REFERENCES scenarios (id),
-            FOREIGN KEY (student_id) REFERENCES users (id),
-            FOREIGN KEY (patient_id) REFERENCES patients (id)
-        )
-    """
-    )
+    _scenario_patients_table(metadata).create(conn, checkfirst=True)
     # print("scenario_patients table created")
 
 
-def verify_migration(cursor):
+def verify_migration(conn):
     """Verify the migration was successful"""
     try:
         # Test the problematic query from the error
-        cursor.execute("SELECT submitted_at FROM student_scenarios LIMIT 1")
+        conn.execute(text("SELECT submitted_at FROM student_scenarios")).first()
         # print("submitted_at column is accessible")
         return True
-    except sqlite3.Error as e:
+    except SQLAlchemyError as e:
         # print(f"Migration verification failed: {e}")
         return False
 